@@ -0,0 +1,168 @@
+"""Every catalog product's healthier alternatives, computed ahead of serving.
+
+A scan of a known product always gets the same alternatives until the
+catalog changes: the ``K`` best-scoring products of its shard with no more
+sugar, fat or sodium (``Catalog.alternatives`` on its own values; an 'other'
+product's shard is the whole catalog), leaving out the product itself,
+which dominates its own values but is no alternative to itself. ``build``
+answers that for every row at once and keeps the answers as one
+``(rows, K)`` array of catalog rows, -1 where there are fewer, so serving
+one is a row read.
+
+Each shard's products are sorted by (score, row), the order the answers
+come in, and checked against a block of queries at a time, so the first
+``K`` a query dominates are found by array comparisons rather than one tree
+search per product. Low scores go with low values, so most queries are
+answered within the first few blocks; the few still short after
+``SCAN_LIMIT`` products (the healthiest ones, which dominate almost
+nothing) are handed to the shard's ``DominanceIndex``.
+
+``update`` reuses an earlier catalog's table when the new catalog is that
+one with rows appended: old rows only need the appended rows they dominate
+merged in, and only the appended rows are computed from scratch.
+"""
+import numpy as np
+
+from dominance import DominanceIndex
+
+# As many as find_alternatives returns
+K = 3
+# Queries compared against one block of products at a time
+QUERY_BLOCK = 4096
+PRODUCT_BLOCK = 256
+# Products scanned in score order before a query falls back to the tree search
+SCAN_LIMIT = 4096
+
+
+def _first_dominated(queries, points, ids, k, fallback=None, ends=None):
+    """``(len(queries), k)`` array: the first ``k`` of ``ids`` whose ``points`` are <= each query, -1 padded.
+
+    ``points``/``ids`` must already be in the order answers are ranked by.
+    Queries still short after ``SCAN_LIMIT`` points go to ``fallback(q, k)``
+    if given; without it every point is scanned. With ``ends``, a query
+    stops once it has passed its first ``ends[i]`` points, and what it
+    found after those may be left out.
+    """
+    table = np.full((len(queries), k), -1, dtype=np.int64)
+    limit = SCAN_LIMIT if fallback is not None else len(points)
+    for q0 in range(0, len(queries), QUERY_BLOCK):
+        chunk = queries[q0:q0 + QUERY_BLOCK]
+        stop = ends[q0:q0 + QUERY_BLOCK] if ends is not None else np.full(len(chunk), len(points))
+        found = np.zeros(len(chunk), dtype=np.int64)
+        active = np.flatnonzero(stop > 0)
+        for p0 in range(0, min(len(points), limit), PRODUCT_BLOCK):
+            block = points[p0:p0 + PRODUCT_BLOCK]
+            q = chunk[active]
+            dominated = ((block[None, :, 0] <= q[:, 0, None]) & (block[None, :, 1] <= q[:, 1, None])
+                         & (block[None, :, 2] <= q[:, 2, None]))
+            # Rank of each dominated point among this query's finds so far; only the first k are kept
+            rank = np.cumsum(dominated, axis=1) - 1 + found[active, None]
+            which, at = np.nonzero(dominated & (rank < k))
+            table[q0 + active[which], rank[which, at]] = ids[p0 + at]
+            found[active] = np.minimum(found[active] + dominated.sum(axis=1), k)
+            active = active[(found[active] < k) & (stop[active] > p0 + PRODUCT_BLOCK)]
+            if not len(active):
+                break
+        if fallback is not None and len(points) > limit:
+            for i in active.tolist():
+                answer = fallback(chunk[i], k)
+                table[q0 + i, :len(answer)] = answer
+    return table
+
+
+def _excluding(found, members, k):
+    """The first ``k`` of each row of ``found`` that isn't that row's own product (``members``)"""
+    order = np.argsort(found == members[:, None], axis=1, kind='stable')[:, :k]
+    return np.take_along_axis(found, order, axis=1)
+
+
+def _ranked(rows, scores):
+    """``rows`` in answer order: by score, then row"""
+    order = np.lexsort((rows, scores))
+    return rows[order], order
+
+
+def _shard_members(catalog, rows, index):
+    """``(rows, features, scores)`` of a shard, in answer order, and a tree search returning catalog rows"""
+    positions = np.searchsorted(catalog.rows, rows)
+    features, scores = catalog.features[positions], catalog.scores[positions]
+    ranked, order = _ranked(rows, scores)
+    return ranked, features[order], scores[order], lambda q, k: rows[index.top_k(q, k)]
+
+
+def _searches(catalog):
+    """``(members, rows, index)``: rows whose scans search ``rows`` with ``index``, i.e. each shard's
+    own rows, then the rows in no shard, which search the whole catalog"""
+    sharded = [rows for rows, _ in catalog.shards.values()]
+    for rows, index in catalog.shards.values():
+        yield rows, rows, index
+    unsharded = np.setdiff1d(catalog.rows, np.concatenate(sharded)) if sharded else catalog.rows
+    if len(unsharded):
+        yield unsharded, catalog.rows, catalog.index
+
+
+def build(catalog, k=K):
+    """``(len(catalog), k)`` int32 table of each row's alternatives within its own shard, itself excluded"""
+    table = np.full((len(catalog), k), -1, dtype=np.int32)
+    for members, rows, index in _searches(catalog):
+        ranked, features, _, fallback = _shard_members(catalog, rows, index)
+        queries = catalog.features[np.searchsorted(catalog.rows, members)]
+        # One extra, as each product finds itself
+        found = _first_dominated(queries, features, ranked, k + 1, fallback)
+        table[members] = _excluding(found, members, k)
+    return table
+
+
+def appended_to(catalog, previous):
+    """True if ``catalog`` is ``previous`` with rows added at the end: same features and type for every old row"""
+    n = len(previous)
+    if len(catalog) < n:
+        return False
+    old = np.searchsorted(catalog.rows, n)
+    if not (np.array_equal(catalog.rows[:old], previous.rows) and np.array_equal(catalog.features[:old], previous.features)):
+        return False
+    old_types = np.asarray(previous.product_types, dtype=object)[previous.type_ids]
+    new_types = np.asarray(catalog.product_types, dtype=object)[catalog.type_ids[:n]]
+    return bool((old_types == new_types).all())
+
+
+def update(catalog, previous, table, k=K):
+    """``catalog``'s table from ``previous``'s ``table``, if ``catalog`` only appends rows; else None"""
+    if table.shape[1] != k or not appended_to(catalog, previous):
+        return None
+    n = len(previous)
+    # Old rows that were scored can be looked up by row; the appended ones are new to every old answer
+    score_of = np.full(len(catalog), np.inf)
+    score_of[catalog.rows] = catalog.scores
+    result = np.full((len(catalog), k), -1, dtype=np.int32)
+    result[:n] = table
+    for members, rows, index in _searches(catalog):
+        old, new = members[members < n], rows[rows >= n]
+        if not len(new):
+            continue
+        ranked, features, _, fallback = _shard_members(catalog, rows, index)
+        new_ranked, new_order = _ranked(new, score_of[new])
+        new_features = catalog.features[np.searchsorted(catalog.rows, new)][new_order]
+
+        if len(old):
+            # Merge the first k appended rows each old row dominates into its stored answer. Only those
+            # scoring below its k-th can get in (on equal scores old rows come first, having lower row
+            # numbers), and appended rows are in score order, so each old row reads a prefix of them
+            appended = None
+            if len(new) > SCAN_LIMIT:
+                new_index = DominanceIndex(new_features, score_of[new_ranked])
+                appended = lambda q, k: new_ranked[new_index.top_k(q, k)]
+            kth = table[old, k - 1].astype(np.int64)
+            ends = np.searchsorted(score_of[new_ranked], np.where(kth >= 0, score_of[kth], np.inf))
+            queries = catalog.features[np.searchsorted(catalog.rows, old)]
+            found = _first_dominated(queries, new_features, new_ranked, k, appended, ends)
+            candidates = np.concatenate([table[old].astype(np.int64), found], axis=1)
+            scores = np.where(candidates >= 0, score_of[candidates], np.inf)
+            order = np.lexsort((np.where(candidates >= 0, candidates, len(catalog)), scores), axis=1)[:, :k]
+            result[old] = np.take_along_axis(candidates, order, axis=1)
+
+        appended_members = members[members >= n]
+        queries = catalog.features[np.searchsorted(catalog.rows, appended_members)]
+        found = _first_dominated(queries, features, ranked, k + 1, fallback)
+        result[appended_members] = _excluding(found, appended_members, k)
+    return result
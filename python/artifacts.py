@@ -0,0 +1,82 @@
+"""Versioned model artifacts.
+
+``train.py`` writes every trained model as a bundle (see bundle.py) in its
+own directory, ``ARTIFACTS_DIR/<version>/``, and then points its profile's
+``ARTIFACTS_DIR/CURRENT-<profile>`` at it. Each service loads whatever its
+own profile's pointer names, so a retrain never touches files a running
+process is reading, training one service's model never changes another's,
+and rolling back is rewriting one line.
+
+A shared ``CURRENT`` from before there was one pointer per profile is still
+read, but only for the profile its bundle was trained as.
+"""
+import json
+import os
+import tempfile
+import time
+
+from bundle import MANIFEST_FILE
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ARTIFACTS_DIR = os.environ.get('MODEL_ARTIFACTS_DIR', os.path.join(HERE, 'artifacts'))
+CURRENT_FILE = 'CURRENT'
+
+# Weights exported before versioned artifacts existed; used when nothing has been trained since
+LEGACY_WEIGHTS_PATH = os.path.join(HERE, 'food_classification_model.npz')
+
+
+def new_version():
+    return time.strftime('%Y%m%d-%H%M%S', time.gmtime())
+
+
+def current_file(profile):
+    return f'{CURRENT_FILE}-{profile}'
+
+
+def _read_pointer(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def _trained_as(root, version):
+    try:
+        with open(os.path.join(root, version, MANIFEST_FILE), encoding='utf-8') as f:
+            return json.load(f).get('profile')
+    except (OSError, ValueError):
+        return None
+
+
+def current_version(profile, root=ARTIFACTS_DIR):
+    """Version named by ``profile``'s CURRENT, or None if nothing has been trained for it"""
+    version = _read_pointer(os.path.join(root, current_file(profile)))
+    if version is None:
+        shared = _read_pointer(os.path.join(root, CURRENT_FILE))
+        if shared and _trained_as(root, shared) == profile:
+            version = shared
+    return version
+
+
+def set_current(version, profile, root=ARTIFACTS_DIR):
+    """Point ``profile``'s CURRENT at ``version`` with an atomic rename"""
+    if not os.path.isdir(os.path.join(root, version)):
+        raise FileNotFoundError(f"No artifact version {version} in {root}")
+    trained_as = _trained_as(root, version)
+    if trained_as != profile:
+        raise ValueError(f"Artifact version {version} was trained as profile {trained_as!r}, not {profile!r}")
+    fd, tmp = tempfile.mkstemp(dir=root, suffix='.tmp')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        f.write(version + '\n')
+    os.replace(tmp, os.path.join(root, current_file(profile)))
+
+
+def model_path(profile, root=ARTIFACTS_DIR):
+    """Bundle directory of ``profile``'s current version, falling back to the legacy export"""
+    version = current_version(profile, root)
+    if version:
+        return os.path.join(root, version)
+    if os.path.exists(LEGACY_WEIGHTS_PATH):
+        return LEGACY_WEIGHTS_PATH
+    raise FileNotFoundError(f"No trained {profile} model in {root}; run `python train.py --profile {profile}` first")
@@ -0,0 +1,165 @@
+"""Text detection for single label images and concurrent batches of them.
+
+``detect_texts`` sends a batch to the Vision client from a thread pool
+shared by the whole process, so however many requests are being served at
+most ``max_in_flight`` Vision calls are outstanding at once, and returns
+results in input order. With ``use_batch_api`` the images are
+grouped into ``batch_annotate_images`` calls of up to VISION_BATCH_LIMIT
+images instead. Anything exposing the two client methods works as
+``client``, including fake_vision.FakeVisionClient.
+
+``vision_client`` builds the real client on first use, so importing a
+service doesn't pay for loading google-cloud-vision and gRPC.
+``detect_texts_async`` is the asyncio counterpart for an async client
+(``vision.ImageAnnotatorAsyncClient`` or fake_vision.AsyncFakeVisionClient),
+limited by one process-wide semaphore in the same way.
+"""
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+MAX_IN_FLIGHT = int(os.environ.get('OCR_MAX_IN_FLIGHT', 8))
+MAX_BATCH_IMAGES = int(os.environ.get('OCR_MAX_BATCH_IMAGES', 32))
+USE_BATCH_API = os.environ.get('OCR_USE_BATCH_API', '0') == '1'
+CREDENTIALS_PATH = os.environ.get('VISION_CREDENTIALS', 'acc.json')
+
+# Vision accepts at most this many images per batch_annotate_images call
+VISION_BATCH_LIMIT = 16
+DOCUMENT_TEXT_DETECTION = 11  # vision.Feature.Type.DOCUMENT_TEXT_DETECTION
+
+
+class OcrError(Exception):
+    """The OCR service answered, but with an error for this image"""
+
+
+_client = None
+_async_client = None
+_client_lock = threading.Lock()
+# max_in_flight -> thread pool, and (event loop, max_in_flight) -> semaphore, shared by every request
+_pools = {}
+_semaphores = {}
+
+
+def vision_client(credentials=CREDENTIALS_PATH):
+    """Process-wide Vision client, created on the first call"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            from google.cloud import vision
+            _client = vision.ImageAnnotatorClient.from_service_account_file(credentials)
+    return _client
+
+
+def vision_async_client(credentials=CREDENTIALS_PATH):
+    """Process-wide asyncio Vision client, created on the first call (inside the serving loop)"""
+    global _async_client
+    with _client_lock:
+        if _async_client is None:
+            from google.cloud import vision
+            _async_client = vision.ImageAnnotatorAsyncClient.from_service_account_file(credentials)
+    return _async_client
+
+
+def reset_clients():
+    """Forget clients and pools inherited from a parent process; a gRPC channel can't be shared across fork"""
+    global _client, _async_client, _client_lock
+    _client = _async_client = None
+    _client_lock = threading.Lock()
+    # A forked child has none of the parent's threads, so its pools would never run anything
+    _pools.clear()
+    _semaphores.clear()
+
+
+def shared_pool(max_in_flight):
+    """Process-wide pool of ``max_in_flight`` OCR threads"""
+    with _client_lock:
+        pool = _pools.get(max_in_flight)
+        if pool is None:
+            pool = _pools[max_in_flight] = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix='ocr')
+    return pool
+
+
+def _semaphore(max_in_flight):
+    key = (asyncio.get_running_loop(), max_in_flight)
+    semaphore = _semaphores.get(key)
+    if semaphore is None:
+        semaphore = _semaphores[key] = asyncio.Semaphore(max_in_flight)
+    return semaphore
+
+
+def _full_text(response):
+    if response.error.message:
+        raise OcrError(response.error.message)
+    return response.full_text_annotation.text
+
+
+def detect_text(client, image_bytes):
+    """Full OCR text of one image"""
+    return _full_text(client.document_text_detection(image={'content': image_bytes}))
+
+
+def _requests(images):
+    """``batch_annotate_images`` requests for document text detection of each image"""
+    return [
+        {'image': {'content': image_bytes}, 'features': [{'type_': DOCUMENT_TEXT_DETECTION}]}
+        for image_bytes in images
+    ]
+
+
+def _detect_chunk(client, chunk):
+    results = []
+    for response in client.batch_annotate_images(requests=_requests(chunk)).responses:
+        try:
+            results.append(_full_text(response))
+        except OcrError as e:
+            results.append(e)
+    return results
+
+
+def detect_texts(client, images, max_in_flight=MAX_IN_FLIGHT, use_batch_api=USE_BATCH_API):
+    """Full text for each image in input order; a failed image gets its exception instead"""
+    if not images:
+        return []
+
+    if use_batch_api:
+        chunks = [images[i:i + VISION_BATCH_LIMIT] for i in range(0, len(images), VISION_BATCH_LIMIT)]
+        job = lambda chunk: _detect_chunk(client, chunk)
+    else:
+        chunks = [[image_bytes] for image_bytes in images]
+        job = lambda chunk: [detect_text(client, chunk[0])]
+
+    pool = shared_pool(max(1, max_in_flight))
+    futures = [pool.submit(job, chunk) for chunk in chunks]
+
+    results = []
+    for future, chunk in zip(futures, chunks):
+        try:
+            results.extend(future.result())
+        except Exception as e:
+            results.extend([e] * len(chunk))
+    return results
+
+
+async def detect_text_async(client, image_bytes):
+    """Full OCR text of one image from an async client.
+
+    ``ImageAnnotatorAsyncClient`` has no ``document_text_detection`` helper
+    (only the sync client does), so this is a one-image batch request.
+    """
+    response = await client.batch_annotate_images(requests=_requests([image_bytes]))
+    return _full_text(response.responses[0])
+
+
+async def detect_texts_async(client, images, max_in_flight=MAX_IN_FLIGHT):
+    """``detect_texts`` on an event loop: at most ``max_in_flight`` awaits outstanding across the loop, no threads"""
+    semaphore = _semaphore(max(1, max_in_flight))
+
+    async def one(image_bytes):
+        async with semaphore:
+            try:
+                return await detect_text_async(client, image_bytes)
+            except Exception as e:
+                return e
+
+    return list(await asyncio.gather(*(one(image_bytes) for image_bytes in images)))
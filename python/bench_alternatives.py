@@ -0,0 +1,75 @@
+"""Benchmark the healthier-alternatives query.
+
+Compares the old per-request pandas path (boolean filter, sort on
+health_score, head) against the DominanceIndex on catalogs scaled up from
+mixed_data.csv, and checks both return the same rows.
+
+    python bench_alternatives.py --sizes 520 10000 100000 1000000
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from catalog import CATALOG_ENCODING, FEATURE_COLUMNS, health_score
+from dominance import DominanceIndex
+
+CSV_PATH = os.path.join(os.path.dirname(__file__), 'mixed_data.csv')
+
+
+def scaled_features(n, seed=0):
+    """Tile the real catalog's feature rows to ``n`` rows with +/-10% jitter"""
+    base = pd.read_csv(CSV_PATH, encoding=CATALOG_ENCODING).dropna(subset=FEATURE_COLUMNS)
+    base = base[FEATURE_COLUMNS].to_numpy(dtype=np.float64)
+    rng = np.random.default_rng(seed)
+    rows = base[rng.integers(0, len(base), n)]
+    if n > len(base):
+        rows = np.round(rows * rng.uniform(0.9, 1.1, rows.shape), 1)
+    return rows
+
+
+def pandas_top_k(df, q, k):
+    items = df[(df["TOTAL SUGARS"] <= q[0]) & (df["TOTAL FAT"] <= q[1]) & (df["SODIUM(mg)"] <= q[2])].copy()
+    items["health_score"] = items["TOTAL SUGARS"] + items["TOTAL FAT"] + (items["SODIUM(mg)"] / 100)
+    return items.sort_values(by="health_score", kind="stable").head(k).index.tolist()
+
+
+def time_queries(fn, queries):
+    start = time.perf_counter()
+    results = [fn(q) for q in queries]
+    return (time.perf_counter() - start) / len(queries), results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[520, 10_000, 100_000, 1_000_000])
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('-k', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'build s':>9} {'pandas ms':>10} {'index ms':>9} {'speedup':>8}")
+    for n in args.sizes:
+        features = scaled_features(n)
+        df = pd.DataFrame(features, columns=FEATURE_COLUMNS)
+        scores = health_score(features[:, 0], features[:, 1], features[:, 2])
+
+        start = time.perf_counter()
+        index = DominanceIndex(features, scores)
+        build = time.perf_counter() - start
+
+        # Scans are of real products, so query with catalog rows
+        rng = np.random.default_rng(1)
+        queries = features[rng.integers(0, n, args.queries)].tolist()
+
+        pandas_s, expected = time_queries(lambda q: pandas_top_k(df, q, args.k), queries)
+        index_s, got = time_queries(lambda q: index.top_k(q, args.k), queries)
+        if got != expected:
+            raise SystemExit(f"index results differ from pandas at {n} rows")
+
+        print(f"{n:>10} {build:>9.2f} {pandas_s * 1e3:>10.3f} {index_s * 1e3:>9.3f} {pandas_s / index_s:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""Benchmark precomputing every product's alternatives, and serving them from the table.
+
+Builds the alternatives table for a catalog (as ``python catalog.py`` does
+when it converts a CSV) and reports build time and size, then checks
+``--queries`` products' stored alternatives against the live query and
+times both ways of answering a known product. Finally it times the
+incremental update for the last ``--append`` rows, against a catalog of
+the rows before them, and checks it matches a full rebuild. Without
+``--csv`` a synthetic catalog of ``--rows`` rows is generated first.
+
+    python bench_alternatives_table.py --rows 1000000 --append 10000
+"""
+import argparse
+import os
+import statistics
+import time
+
+import numpy as np
+
+import alternatives_table
+from catalog import CATALOG_ENCODING, Catalog
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def per_call_us(fn, inputs):
+    seconds = []
+    for args in inputs:
+        start = time.perf_counter()
+        fn(*args)
+        seconds.append(time.perf_counter() - start)
+    seconds.sort()
+    return statistics.median(seconds) * 1e6, seconds[min(len(seconds) - 1, int(len(seconds) * 0.99))] * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--csv', default=None, help="catalog CSV; defaults to a synthetic one of --rows rows")
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--append', type=int, default=10_000, help="rows treated as newly appended")
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    path = args.csv
+    if path is None:
+        path = os.path.join(HERE, 'artifacts', 'synth', f'catalog_{args.rows}.csv')
+        if not os.path.exists(path):
+            import synth
+
+            print(f"Generating {args.rows} synthetic rows -> {path}")
+            synth.write(synth.CatalogModel.fit(), args.rows, path)
+
+    catalog = Catalog.from_csv(path)
+    start = time.perf_counter()
+    table = catalog.top_alternatives()
+    build_s = time.perf_counter() - start
+    print(f"{len(catalog)} products: table built in {build_s:.2f}s ({len(catalog) / build_s:,.0f} products/s),"
+          f" {table.nbytes / 2**20:.1f} MiB")
+
+    rng = np.random.default_rng(args.seed)
+    rows = rng.choice(catalog.rows, min(args.queries, len(catalog.rows)), replace=False).tolist()
+    live = [(*catalog.features[np.searchsorted(catalog.rows, r)], 3, catalog.product_type(r)) for r in rows]
+    # A product is left out of its own stored alternatives, so the live query looks one further
+    wrong = sum([a for a in catalog.alternatives(*q[:3], q[3] + 1, q[4]) if a != r][:q[3]] != catalog.stored_alternatives(r)
+                for q, r in zip(live, rows))
+    print(f"{len(rows)} products checked against the live query: {wrong} differ")
+    print(f"\n{'lookup':<12} {'p50 us':>9} {'p99 us':>9}")
+    print(f"{'live':<12} {'%9.1f %9.1f' % per_call_us(catalog.alternatives, live)}")
+    print(f"{'table':<12} {'%9.1f %9.1f' % per_call_us(catalog.stored_alternatives, [(r,) for r in rows])}")
+
+    # The catalog before the appended rows, parsed from a CSV of just those lines like a real earlier version
+    with open(path, encoding=CATALOG_ENCODING) as f:
+        lines = f.readlines()
+    before = os.path.join(HERE, 'artifacts', 'catalogs', f'bench-alternatives-{os.getpid()}.csv')
+    with open(before, 'w', encoding=CATALOG_ENCODING) as f:
+        f.writelines(lines[:max(1, len(lines) - args.append)])
+    previous = Catalog.from_csv(before)
+    os.remove(before)
+    previous.top_alternatives()
+    start = time.perf_counter()
+    updated = alternatives_table.update(catalog, previous, previous.top_alternatives())
+    update_s = time.perf_counter() - start
+    same = updated is not None and np.array_equal(updated, table)
+    print(f"\n{len(catalog) - len(previous)} appended rows: updated in {update_s:.2f}s vs {build_s:.2f}s to rebuild,"
+          f" {'matches' if same else 'DIFFERS FROM'} the rebuilt table")
+
+
+if __name__ == '__main__':
+    main()
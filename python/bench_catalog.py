@@ -0,0 +1,114 @@
+"""Benchmark catalog loading and per-worker memory: CSV parse vs mapped columns.
+
+Starts ``--workers`` forked processes that each load the same catalog, run
+alternatives queries and scan every column, once parsing the CSV and once
+mapping the columnar copy. Reports load time, each worker's RSS before and
+after loading, and PSS (RSS with shared pages divided among the processes
+sharing them) while all workers are alive, which is what N workers cost in
+physical memory together. Without ``--csv`` a synthetic catalog of
+``--rows`` rows is generated first.
+
+    python bench_catalog.py --rows 1000000 --workers 4
+"""
+import argparse
+import multiprocessing
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+from catalog import Catalog, convert
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def memory_kb():
+    """``{'Rss': kB, 'Pss': kB}`` for this process, from /proc"""
+    usage = {}
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            key, _, rest = line.partition(':')
+            if key in ('Rss', 'Pss'):
+                usage[key] = int(rest.split()[0])
+    return usage
+
+
+def worker(mode, path, queries, barrier, results):
+    before = memory_kb()
+    start = time.perf_counter()
+    catalog = Catalog.from_csv(path) if mode == 'csv' else Catalog.load(path)
+    load_s = time.perf_counter() - start
+
+    # What serving touches: alternatives plus their records, and a pass over every column
+    for q in queries:
+        [catalog.record(i) for i in catalog.alternatives(*q)]
+    for arr in catalog.columns.values():
+        np.nansum(arr)
+    loaded = memory_kb()
+
+    barrier.wait()  # all workers hold the catalog now, so PSS splits the shared pages between them
+    shared = memory_kb()
+    barrier.wait()
+    results.put({'load_s': load_s, 'rss_before': before['Rss'], 'rss_after': loaded['Rss'], 'pss': shared['Pss']})
+
+
+def run(mode, path, queries, workers):
+    ctx = multiprocessing.get_context('fork')
+    barrier = ctx.Barrier(workers)
+    results = ctx.Queue()
+    procs = [ctx.Process(target=worker, args=(mode, path, queries, barrier, results)) for _ in range(workers)]
+    for p in procs:
+        p.start()
+    stats = [results.get() for _ in procs]
+    for p in procs:
+        p.join()
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--csv', default=None, help="catalog CSV; defaults to a synthetic one of --rows rows")
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--queries', type=int, default=200)
+    args = parser.parse_args()
+
+    path = args.csv
+    if path is None:
+        path = os.path.join(HERE, 'artifacts', 'synth', f'catalog_{args.rows}.csv')
+        if not os.path.exists(path):
+            import synth
+
+            print(f"Generating {args.rows} synthetic rows -> {path}")
+            synth.write(synth.CatalogModel.fit(), args.rows, path)
+
+    start = time.perf_counter()
+    # Outside CATALOGS_DIR, so the bench copy never touches the catalogs the service maps
+    scratch = tempfile.mkdtemp(prefix='bench-catalog-')
+    directory = convert(path, os.path.join(scratch, 'columnar'))
+    convert_s = time.perf_counter() - start
+    csv_mib = os.path.getsize(path) / 2**20
+    columnar_mib = sum(os.path.getsize(os.path.join(directory, f)) for f in os.listdir(directory)) / 2**20
+    print(f"CSV {csv_mib:.1f} MiB -> columnar {columnar_mib:.1f} MiB in {convert_s:.1f}s ({directory})")
+
+    probe = Catalog.load(directory)
+    rng = np.random.default_rng(0)
+    queries = [tuple(q) for q in probe.features[rng.integers(0, len(probe.features), args.queries)].tolist()]
+    rows = len(probe)
+    del probe
+
+    print(f"\n{rows} rows, {args.workers} workers (MiB per worker unless noted)")
+    print(f"{'mode':>9} {'load s':>8} {'RSS before':>11} {'RSS after':>10} {'PSS':>8} {'PSS total':>10}")
+    for mode, source in (('csv', path), ('columnar', directory)):
+        stats = run(mode, source, queries, args.workers)
+        mean = lambda key: statistics.mean(s[key] for s in stats) / 1024
+        print(f"{mode:>9} {statistics.mean(s['load_s'] for s in stats):>8.2f} {mean('rss_before'):>11.1f}"
+              f" {mean('rss_after'):>10.1f} {mean('pss'):>8.1f} {sum(s['pss'] for s in stats) / 1024:>10.1f}")
+    shutil.rmtree(scratch)
+
+
+if __name__ == '__main__':
+    main()
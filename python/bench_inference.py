@@ -0,0 +1,78 @@
+"""Benchmark the NumPy inference engine against keras ``model.predict``.
+
+Reports single-row and batched latency for both and checks the NumPy
+engine predicts the same labels (and the same probabilities to float32
+rounding) on the catalog rows. TensorFlow is only imported here; without it
+the script still times the NumPy engine.
+
+    python bench_inference.py --batch-sizes 1 32 1024 65536
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+
+from catalog import Catalog
+from numpy_model import NumpyModel
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def per_call_ms(fn, X, repeat):
+    fn(X)  # warm up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(X)
+    return (time.perf_counter() - start) / repeat * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--weights', default=os.path.join(HERE, 'food_classification_model.npz'))
+    parser.add_argument('--model', default=os.path.join(HERE, 'food_classification_model.h5'))
+    parser.add_argument('--scaler', default=os.path.join(HERE, 'scaler.pkl'))
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 32, 1024, 65536])
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    engine = NumpyModel.load(args.weights)
+    catalog = Catalog.from_csv(os.path.join(HERE, 'mixed_data.csv'))
+    rows = catalog.features
+
+    try:
+        import joblib
+        from tensorflow import keras
+    except ImportError:
+        keras = None
+        print("TensorFlow not installed; timing the NumPy engine only")
+
+    if keras is not None:
+        model = keras.models.load_model(args.model)
+        scaler = joblib.load(args.scaler)
+
+        def keras_predict(X):
+            return model.predict(scaler.transform(X), verbose=0)
+
+        expected = keras_predict(rows)
+        got = engine.predict_proba(rows)
+        if not np.array_equal(expected.argmax(axis=1), got.argmax(axis=1)):
+            raise SystemExit("NumPy engine labels differ from keras")
+        print(f"labels identical on {len(rows)} catalog rows; "
+              f"max |p_keras - p_numpy| = {np.abs(expected - got).max():.2e}")
+
+    rng = np.random.default_rng(0)
+    print(f"{'batch':>7} {'numpy ms':>10} {'keras ms':>10} {'speedup':>8}")
+    for size in args.batch_sizes:
+        X = rows[rng.integers(0, len(rows), size)]
+        repeat = max(3, args.repeat if size <= 1024 else args.repeat // 10)
+        numpy_ms = per_call_ms(engine.predict, X, repeat)
+        if keras is None:
+            print(f"{size:>7} {numpy_ms:>10.4f} {'-':>10} {'-':>8}")
+            continue
+        keras_ms = per_call_ms(keras_predict, X, repeat)
+        print(f"{size:>7} {numpy_ms:>10.4f} {keras_ms:>10.4f} {keras_ms / numpy_ms:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
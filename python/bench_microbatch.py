@@ -0,0 +1,83 @@
+"""Benchmark micro-batched inference against per-request predict calls.
+
+Starts ``--threads`` handler threads that each classify single rows from
+the catalog, once calling the model directly and once through a
+MicroBatcher, and reports predictions per second, per-call latency and the
+batcher's batch-size distribution. Labels from both paths are checked to
+match.
+
+    python bench_microbatch.py --threads 1 8 32 128 --max-wait-ms 0
+"""
+import argparse
+import os
+import statistics
+import threading
+import time
+
+from catalog import Catalog
+from microbatch import MicroBatcher
+from numpy_model import NumpyModel
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def run(predict, rows, threads, calls):
+    """(predictions/s, per-call latencies, labels in row order)"""
+    labels = [None] * (threads * calls)
+    latencies = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(t):
+        mine = []
+        barrier.wait()
+        for c in range(calls):
+            i = t * calls + c
+            start = time.perf_counter()
+            labels[i] = predict(rows[i % len(rows)][None, :])[0]
+            mine.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(mine)
+
+    pool = [threading.Thread(target=worker, args=(t,)) for t in range(threads)]
+    for thread in pool:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in pool:
+        thread.join()
+    return threads * calls / (time.perf_counter() - start), latencies, labels
+
+
+def mean_batch(snapshot):
+    return snapshot['sum'] / snapshot['count'] if snapshot['count'] else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--weights', default=os.path.join(HERE, 'food_classification_model.npz'))
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 8, 32, 128])
+    parser.add_argument('--calls', type=int, default=2000, help="total predictions per run")
+    parser.add_argument('--max-batch', type=int, default=64)
+    parser.add_argument('--max-wait-ms', type=float, default=0.0)
+    args = parser.parse_args()
+
+    model = NumpyModel.load(args.weights)
+    rows = Catalog.from_csv(os.path.join(HERE, 'mixed_data.csv')).features
+
+    print(f"{'threads':>7} {'direct/s':>10} {'p99 us':>8} {'batched/s':>10} {'p99 us':>8} {'mean batch':>11} match")
+    for threads in args.threads:
+        calls = max(1, args.calls // threads)
+        direct_rate, direct_lat, direct_labels = run(model.predict, rows, threads, calls)
+
+        batcher = MicroBatcher(model.predict, args.max_batch, args.max_wait_ms / 1000).start()
+        batched_rate, batched_lat, batched_labels = run(batcher.predict, rows, threads, calls)
+        batcher.stop()
+
+        p99 = lambda lat: statistics.quantiles(lat, n=100)[98] * 1e6 if len(lat) > 1 else lat[0] * 1e6
+        print(f"{threads:>7} {direct_rate:>10.0f} {p99(direct_lat):>8.0f} {batched_rate:>10.0f} {p99(batched_lat):>8.0f}"
+              f" {mean_batch(batcher.batch_size.snapshot()):>11.1f} {direct_labels == batched_labels}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""Micro-benchmark nutrient extraction from label text.
+
+Times the legacy per-key regex loop the /ocr handlers used against the
+compiled single-pass NutritionParser on a handful of label transcriptions,
+and checks both produce the same nutrition data.
+
+    python bench_parser.py --repeat 2000
+"""
+import argparse
+import contextlib
+import io
+import re
+import time
+
+from nutrition_parser import NUTRITION_KEYS, NutritionParser, clean_text
+
+# Transcriptions in the shape Vision returns for Indian biscuit/namkeen packs
+LABEL_TEXTS = [
+    """NUTRITIONAL INFORMATION (Approx.)
+    Per 100 g of product
+    Energy 454 kcal
+    Protein 6.9 g
+    Carbohydrate 77.3 g
+    Total Sugars 25.5 g
+    Added Sugars 25 g
+    Total Fat 13 g
+    Saturated Fat 6 g
+    Trans Fat 0 g
+    Cholesterol 0 mg
+    Sodium 296 mg""",
+    """INGREDIENTS: Refined Wheat Flour (Maida), Sugar, Edible Vegetable Oil (Palm),
+    Invert Sugar Syrup, Leavening Agents [503(ii), 500(ii)], Milk Solids, Iodised Salt,
+    Emulsifiers [322(i), 471]. CONTAINS WHEAT, MILK.
+    NUTRITION INFORMATION PER 100g  PER SERVING (25g)  %RDA*
+    Energy (kcal) 488 122 6.1%  Protein (g) 6.2 1.6  Carbohydrate (g) 68.4 17.1
+    of which Sugars (g) 22.1 5.5  Fat (g) 21.0 5.3  Saturated Fat (g) 10.2 2.6
+    Trans Fat (g) 0.1 0.0  Sodium (mg) 365 91 4.6%
+    *Based on 2000 kcal diet. Best before 6 months from manufacture.""",
+    """Nutrition Facts Serving size 30g Calories 150 Total Fat 8g 10% Saturated Fat 3.5g
+    Trans Fat 0g Monounsaturated fatty acids 2.8g Polyunsaturated fatty acids 1.1g
+    Cholesterol 0mg 0% Sodium 220mg 10% Total Carbohydrate 18g 7% Dietary Fiber 1g 4%
+    Total Sugars 9g Includes 8g Added Sugars 16% Protein 2g""",
+    """MASALA MUNCH  NET WT 70g  MRP Rs.20  PKD 04/24
+    Nutritional Value per 100g: Energy 542kcal, Protein 7.1g, Carbohydrate 56.2g,
+    Total Sugar 3.4g, Fat 32.0g, Saturates 14.1g, Fibre 2.3g, Sodium 812mg
+    Manufactured by: ITC Limited, Virginia House, 37 J.L. Nehru Road, Kolkata 700071""",
+]
+
+
+def legacy_parse(text):
+    nutrition_data = {}
+    for key in NUTRITION_KEYS:
+        pattern = rf'{key}[^\d]*([\d.]+)\s*(kcal|g|mg|kJ|%)?'
+        match = re.search(pattern, text, re.IGNORECASE)
+        if match:
+            value_str = match.group(1)
+            try:
+                value = float(value_str)
+                unit = match.group(2) if match.group(2) else ''
+                nutrition_data[key] = {'value': value, 'unit': unit.strip()}
+            except ValueError:
+                print(f"Warning: Could not convert value '{value_str}' for {key} to float.")
+    return nutrition_data
+
+
+def per_call_us(fn, texts, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text in texts:
+            fn(text)
+    return (time.perf_counter() - start) / (repeat * len(texts)) * 1e6
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument('--repeat', type=int, default=2000)
+    args = arg_parser.parse_args()
+
+    texts = [clean_text(t) for t in LABEL_TEXTS]
+    exact = NutritionParser(aliases={})
+    with contextlib.redirect_stdout(io.StringIO()):
+        for text in texts:
+            if exact.parse(text) != legacy_parse(text):
+                raise SystemExit(f"parser output differs from legacy loop on: {text[:60]}...")
+
+        parser = NutritionParser()
+        legacy_us = per_call_us(legacy_parse, texts, args.repeat)
+
+        def uncached(text):
+            re.purge()
+            return legacy_parse(text)
+
+        uncached_us = per_call_us(uncached, texts, max(1, args.repeat // 20))
+        parser_us = per_call_us(parser.parse, texts, args.repeat)
+
+    print(f"legacy loop (re cache warm)  {legacy_us:8.1f} us/label")
+    print(f"legacy loop (re cache cold)  {uncached_us:8.1f} us/label")
+    print(f"NutritionParser              {parser_us:8.1f} us/label  ({legacy_us / parser_us:.1f}x vs warm)")
+
+
+if __name__ == '__main__':
+    main()
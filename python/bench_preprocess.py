@@ -0,0 +1,136 @@
+"""Benchmark label image preprocessing.
+
+Runs preprocess.preprocess over a fixture set of label photos and reports
+bytes in/out and time per image. With an OCR engine selected it also reads
+every photo raw and preprocessed and reports how many of the expected
+nutrient values the parser recovers from each, so a downscale that costs
+accuracy shows up next to the bytes it saves.
+
+A fixture directory holds the photos plus ``expected.json`` mapping each
+file name to the label's transcription. Without ``--fixtures`` a synthetic
+set is rendered from bench_parser.LABEL_TEXTS as 12 MP phone-style JPEGs
+with sensor noise and an EXIF rotation.
+
+    python bench_preprocess.py --max-side 1600 --ocr vision
+    python bench_preprocess.py --fixtures label_photos/ --ocr tesseract
+"""
+import argparse
+import io
+import json
+import os
+import time
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+from bench_parser import LABEL_TEXTS
+from nutrition_parser import clean_text, parser
+from preprocess import JPEG_QUALITY, MAX_SIDE, preprocess
+
+FONT_PATHS = ('/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf', 'DejaVuSans.ttf', 'arial.ttf')
+EXIF_ORIENTATION = 0x0112
+
+
+def _font(size):
+    for path in FONT_PATHS:
+        try:
+            return ImageFont.truetype(path, size)
+        except OSError:
+            continue
+    return ImageFont.load_default()
+
+
+def render_label(text, size=(4032, 3024), seed=0):
+    """JPEG bytes of ``text`` photographed sideways: pixels rotated, EXIF orientation 6 to undo it"""
+    width, height = size[1], size[0]
+    canvas = Image.new('RGB', (width, height), (246, 243, 235))
+    draw = ImageDraw.Draw(canvas)
+    font = _font(width // 30)
+    y = height // 12
+    for line in text.splitlines():
+        draw.text((width // 14, y), line.strip(), fill=(25, 25, 25), font=font)
+        y += int(font.size * 1.6)
+
+    rng = np.random.default_rng(seed)
+    pixels = np.asarray(canvas, dtype=np.int16) + rng.normal(0, 9, (height, width, 3)).astype(np.int16)
+    photo = Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)).transpose(Image.ROTATE_90)
+
+    exif = Image.Exif()
+    exif[EXIF_ORIENTATION] = 6
+    out = io.BytesIO()
+    photo.save(out, format='JPEG', quality=95, exif=exif)
+    return out.getvalue()
+
+
+def synthetic_fixtures():
+    return [(f'label_{i}.jpg', render_label(text, seed=i), text) for i, text in enumerate(LABEL_TEXTS)]
+
+
+def load_fixtures(directory):
+    with open(os.path.join(directory, 'expected.json'), encoding='utf-8') as f:
+        expected = json.load(f)
+    fixtures = []
+    for name, text in sorted(expected.items()):
+        with open(os.path.join(directory, name), 'rb') as f:
+            fixtures.append((name, f.read(), text))
+    return fixtures
+
+
+def ocr_engine(name):
+    """Function from image bytes to OCR text, or None for ``none``"""
+    if name == 'none':
+        return None
+    from ocr_backends import create_backend
+    return create_backend(name, record_file=None).detect_text
+
+
+def recovered(expected_text, ocr_text):
+    """(values matched, values expected) for the nutrients in a label's transcription"""
+    expected = parser.parse(clean_text(expected_text))
+    found = parser.parse(clean_text(ocr_text))
+    matched = sum(1 for key, v in expected.items() if key in found and abs(found[key]['value'] - v['value']) < 1e-6)
+    return matched, len(expected)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument('--fixtures', default=None, help="directory of photos plus expected.json")
+    arg_parser.add_argument('--max-side', type=int, default=MAX_SIDE)
+    arg_parser.add_argument('--quality', type=int, default=JPEG_QUALITY)
+    arg_parser.add_argument('--ocr', choices=['none', 'vision', 'tesseract', 'replay'], default='none')
+    arg_parser.add_argument('--repeat', type=int, default=3)
+    args = arg_parser.parse_args()
+
+    fixtures = load_fixtures(args.fixtures) if args.fixtures else synthetic_fixtures()
+    ocr = ocr_engine(args.ocr)
+
+    totals = {'in': 0, 'out': 0, 'raw': [0, 0], 'pre': [0, 0]}
+    print(f"{'image':>16} {'raw KB':>9} {'out KB':>8} {'saved':>7} {'ms':>7}" + ('  raw acc  pre acc' if ocr else ''))
+    for name, image_bytes, text in fixtures:
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            processed = preprocess(image_bytes, args.max_side, args.quality)
+        ms = (time.perf_counter() - start) / args.repeat * 1e3
+        totals['in'] += len(image_bytes)
+        totals['out'] += len(processed)
+        line = (f"{name:>16} {len(image_bytes) / 1024:>9.0f} {len(processed) / 1024:>8.0f}"
+                f" {1 - len(processed) / len(image_bytes):>7.1%} {ms:>7.1f}")
+        if ocr:
+            raw = recovered(text, ocr(image_bytes))
+            pre = recovered(text, ocr(processed))
+            for key, (hit, total) in (('raw', raw), ('pre', pre)):
+                totals[key][0] += hit
+                totals[key][1] += total
+            line += f"  {raw[0]:>3}/{raw[1]:<3}  {pre[0]:>3}/{pre[1]:<3}"
+        print(line)
+
+    print(f"\n{len(fixtures)} images: {totals['in'] / 1024:.0f} KB -> {totals['out'] / 1024:.0f} KB"
+          f" ({1 - totals['out'] / totals['in']:.1%} saved)")
+    if ocr:
+        for key, label in (('raw', 'raw'), ('pre', 'preprocessed')):
+            hit, total = totals[key]
+            print(f"values recovered from {label} images: {hit}/{total} ({hit / total:.1%})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""Benchmark the vectorised RuleSet against row-wise classify_food.
+
+Runs both threshold schemes (ocr.py's ratio rules and ocr2.py's exceedance
+rules) over synthetic catalogs of up to millions of rows, checks the codes
+match the original per-row functions, and times DataFrame.apply(axis=1)
+against one RuleSet.evaluate call.
+
+    python bench_rules.py --sizes 10000 1000000 5000000
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from rules import CATEGORIES, EXCEEDANCE_RULES, FEATURES, RATIO_RULES, RuleSet
+
+RATIO_LIMITS = {"TOTAL SUGARS": 10, "TOTAL FAT": 17, "SODIUM(mg)": 600}
+EXCEEDANCE_LIMITS = {"TOTAL SUGARS": 22.5, "TOTAL FAT": 17, "SODIUM(mg)": 600}
+
+# Row-wise apply is far too slow to run on millions of rows; time it on a
+# sample this size and extrapolate linearly.
+APPLY_SAMPLE = 20_000
+
+
+def legacy_ratio(row):
+    sugar, fat, sodium = row["TOTAL SUGARS"], row["TOTAL FAT"], row["SODIUM(mg)"]
+    sodium_ratio = sodium / RATIO_LIMITS["SODIUM(mg)"]
+    fat_ratio = fat / RATIO_LIMITS["TOTAL FAT"]
+    sugar_ratio = sugar / RATIO_LIMITS["TOTAL SUGARS"]
+    if sodium_ratio > 3 or fat_ratio > 3 or sugar_ratio > 3:
+        return "Very Harmful"
+    harmful_factors = 0
+    if sodium_ratio > 2:
+        harmful_factors += 1
+    if fat_ratio > 2:
+        harmful_factors += 1
+    if sugar_ratio > 2:
+        harmful_factors += 1
+    if harmful_factors >= 2:
+        return "Harmful"
+    if harmful_factors == 1:
+        return "OK"
+    return "Safe"
+
+
+def legacy_exceedance(row):
+    exceedances = []
+    for col in FEATURES:
+        limit = EXCEEDANCE_LIMITS[col]
+        exceedances.append((row[col] - limit) / limit if row[col] > limit else 0)
+    exceed_count = sum(e > 0 for e in exceedances)
+    high_exceed_count = sum(e > 0.3 for e in exceedances)
+    if exceed_count == 0:
+        return "Safe"
+    elif exceed_count == 1:
+        return "OK"
+    elif exceed_count >= 2 and high_exceed_count < 2:
+        return "Harmful"
+    return "Very Harmful"
+
+
+def synthetic(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "TOTAL SUGARS": np.round(rng.gamma(2.0, 12.0, n), 1),
+        "TOTAL FAT": np.round(rng.gamma(3.0, 7.0, n), 1),
+        "SODIUM(mg)": np.round(rng.gamma(2.0, 250.0, n)),
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 1_000_000, 5_000_000])
+    args = parser.parse_args()
+
+    schemes = [
+        ("ratio", RuleSet(RATIO_LIMITS, "ratio", RATIO_RULES), legacy_ratio),
+        ("exceedance", RuleSet(EXCEEDANCE_LIMITS, "exceedance", EXCEEDANCE_RULES), legacy_exceedance),
+    ]
+
+    print(f"{'scheme':>11} {'rows':>9} {'apply s':>9} {'vector s':>9} {'Mrows/s':>8} {'speedup':>8}")
+    for n in args.sizes:
+        df = synthetic(n)
+        sample = df.iloc[:APPLY_SAMPLE]
+        for name, ruleset, legacy in schemes:
+            start = time.perf_counter()
+            expected = sample.apply(legacy, axis=1)
+            apply_s = (time.perf_counter() - start) * n / len(sample)
+
+            start = time.perf_counter()
+            codes, _ = ruleset.evaluate(df["TOTAL SUGARS"].to_numpy(), df["TOTAL FAT"].to_numpy(), df["SODIUM(mg)"].to_numpy())
+            vector_s = time.perf_counter() - start
+
+            got = [CATEGORIES[c] for c in codes[:len(sample)]]
+            if got != expected.tolist():
+                raise SystemExit(f"{name} rules disagree with the row-wise function")
+            print(f"{name:>11} {n:>9} {apply_s:>9.2f} {vector_s:>9.3f} {n / vector_s / 1e6:>8.1f} {apply_s / vector_s:>7.0f}x")
+
+
+if __name__ == '__main__':
+    main()
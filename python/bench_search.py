@@ -0,0 +1,119 @@
+"""Benchmark brand-name fuzzy search and autocomplete on a large catalog.
+
+Builds the catalog's name index (as ``python catalog.py`` does when it
+converts a CSV), maps it back the way the servers do and times
+``--queries`` lookups of each kind: fuzzy searches for catalog names with
+one or two typos, and autocomplete for 1-8 character prefixes of their
+words. Reports build time, index size, latency percentiles and, for the
+typo'd searches, how often the intended name came back first. Without
+``--csv`` a synthetic catalog of ``--rows`` rows is generated first;
+``--unique-names`` numbers every row's name so each product is its own
+index entry, a worst case: each name then has dozens of near-duplicates.
+
+    python bench_search.py --rows 1000000
+    python bench_search.py --rows 1000000 --unique-names
+"""
+import argparse
+import os
+import random
+import shutil
+import statistics
+import time
+
+import numpy as np
+
+from catalog import Catalog
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+LETTERS = 'abcdefghijklmnopqrstuvwxyz'
+
+
+def typo(text, rng):
+    """``text`` with one character dropped, doubled, swapped or replaced"""
+    i = rng.randrange(len(text))
+    kind = rng.choice('drop double swap replace'.split())
+    if kind == 'drop':
+        return text[:i] + text[i + 1:]
+    if kind == 'double':
+        return text[:i] + text[i] + text[i:]
+    if kind == 'swap' and i + 1 < len(text):
+        return text[:i] + text[i + 1] + text[i] + text[i + 2:]
+    return text[:i] + rng.choice(LETTERS) + text[i + 1:]
+
+
+def percentiles(seconds):
+    seconds = sorted(seconds)
+    at = lambda p: seconds[min(len(seconds) - 1, int(len(seconds) * p))] * 1e6
+    return f"{statistics.median(seconds) * 1e6:>9.1f} {at(0.99):>9.1f} {max(seconds) * 1e6:>9.1f}"
+
+
+def timed(fn, inputs):
+    results, seconds = [], []
+    for args in inputs:
+        start = time.perf_counter()
+        results.append(fn(*args))
+        seconds.append(time.perf_counter() - start)
+    return results, seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--csv', default=None, help="catalog CSV; defaults to a synthetic one of --rows rows")
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--unique-names', action='store_true', help="make every row's brand name distinct")
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--limit', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    path = args.csv
+    if path is None:
+        path = os.path.join(HERE, 'artifacts', 'synth', f'catalog_{args.rows}.csv')
+        if not os.path.exists(path):
+            import synth
+
+            print(f"Generating {args.rows} synthetic rows -> {path}")
+            synth.write(synth.CatalogModel.fit(), args.rows, path)
+
+    catalog = Catalog.from_csv(path)
+    if args.unique_names:
+        catalog = Catalog([f"{name} {i}" for i, name in enumerate(catalog.names)], catalog.columns,
+                          product_types=[catalog.product_type(i) for i in range(len(catalog))])
+    directory = os.path.join(HERE, 'artifacts', 'catalogs', f'bench-search-{os.getpid()}')
+    start = time.perf_counter()
+    index = catalog.names_index()
+    build_s = time.perf_counter() - start
+    catalog.save(directory)
+    size_mib = sum(os.path.getsize(os.path.join(directory, f)) for f in os.listdir(directory) if f.startswith('search_')) / 2**20
+    index = Catalog.load(directory).names_index()
+    print(f"{len(catalog)} products, {len(index)} distinct names: index built in {build_s:.1f}s, {size_mib:.1f} MiB on disk")
+
+    rng = random.Random(args.seed)
+    picks = np.random.default_rng(args.seed).integers(0, len(index), args.queries).tolist()
+    names = [index.normalized(j) for j in picks]
+    exact = [(name, args.limit) for name in names]
+    typos = [(typo(name, rng), args.limit) for name in names]
+    typos2 = [(typo(typo(name, rng), rng), args.limit) for name in names]
+    prefixes = []
+    for name in names:
+        words = name.split()
+        word = rng.randrange(len(words))
+        prefixes.append((' '.join(words[word:])[:rng.randint(1, 8)], args.limit))
+
+    # Warm the mapping, as a serving worker would be after its first few requests
+    timed(index.search, exact[:100])
+    timed(index.complete, prefixes[:100])
+
+    print(f"\n{'query':<22} {'p50 us':>9} {'p99 us':>9} {'max us':>9} {'top-1 hit':>10}")
+    for label, inputs in (('search exact', exact), ('search 1 typo', typos), ('search 2 typos', typos2)):
+        results, seconds = timed(index.search, inputs)
+        # Several distinct names can normalize alike (or tie on score), so a hit is any top result naming the same text
+        hits = sum(bool(r) and names[i] == index.normalized(r[0][0]) for i, r in enumerate(results))
+        print(f"{label:<22} {percentiles(seconds)} {hits / len(inputs):>10.1%}")
+    _, seconds = timed(index.complete, prefixes)
+    print(f"{'autocomplete':<22} {percentiles(seconds)}")
+    shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+"""Benchmark the Flask, asyncio and pre-fork servers for ocr2 under the same load.
+
+Starts each server as a subprocess on the replay OCR backend (fixed
+simulated OCR latency, no credentials or network), fires ``--requests``
+POST /ocr uploads from ``--concurrency`` client threads, and reports
+throughput, p50/p99 latency, errors and the server's peak thread count
+(summed over its worker processes). Every upload has unique bytes, so the
+caches never short-circuit a scan. The gunicorn server (gunicorn.conf.py)
+runs once per ``--workers`` count; with ``--latency 0`` the work is all
+CPU, which is where more workers pay off.
+
+    python bench_serving.py --concurrency 8 64 256 --latency 0.2
+    python bench_serving.py --servers gunicorn --workers 1 2 4 8 --latency 0 --concurrency 64
+"""
+import argparse
+import http.client
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+LABEL_TEXT = "Nutrition Information per 100g Energy 488 kcal Total Sugars 22.1 g Total Fat 21.0 g Sodium 365 mg"
+
+SERVERS = {
+    'flask': lambda port, workers: [sys.executable, '-c', f"import ocr2; ocr2.app.run(port={port}, threaded=True)"],
+    'asgi': lambda port, workers: [sys.executable, '-m', 'uvicorn', 'ocr2_async:app', '--port', str(port),
+                                   '--log-level', 'warning', '--no-access-log'],
+    'gunicorn': lambda port, workers: [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--bind',
+                                       f'127.0.0.1:{port}', '--workers', str(workers), 'ocr2:app'],
+}
+# Servers whose process count --workers sets
+PREFORK = {'gunicorn'}
+
+
+def server_env(latency):
+    env = dict(os.environ)
+    env.update({
+        'OCR_BACKEND': 'replay',
+        'OCR_REPLAY_LATENCY': str(latency),
+        'OCR_REPLAY_DEFAULT_TEXT': LABEL_TEXT,
+        'OCR_CACHE_DIR': '',
+        'OCR_PREPROCESS': '0',
+        'OCR_MAX_IN_FLIGHT': '1024',
+    })
+    return env
+
+
+def multipart(image_bytes):
+    boundary = uuid.uuid4().hex
+    body = (
+        f'--{boundary}\r\nContent-Disposition: form-data; name="image"; filename="label.jpg"\r\n'
+        f'Content-Type: image/jpeg\r\n\r\n'
+    ).encode() + image_bytes + f'\r\n--{boundary}--\r\n'.encode()
+    return body, f'multipart/form-data; boundary={boundary}'
+
+
+def request(port, method, path, body=None, content_type=None, timeout=60):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=timeout)
+    try:
+        headers = {'Content-Type': content_type} if content_type else {}
+        conn.request(method, path, body=body, headers=headers)
+        response = conn.getresponse()
+        response.read()
+        return response.status
+    finally:
+        conn.close()
+
+
+def wait_ready(port, proc, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"server exited with code {proc.returncode}")
+        try:
+            if request(port, 'GET', '/model', timeout=1) == 200:
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("server did not become ready")
+
+
+def thread_count(pid):
+    """Threads in ``pid`` and its child processes"""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            threads = next(int(line.split()[1]) for line in f if line.startswith('Threads:'))
+        with open(f'/proc/{pid}/task/{pid}/children') as f:
+            children = [int(c) for c in f.read().split()]
+    except (OSError, StopIteration):
+        return None
+    return threads + sum(thread_count(child) or 0 for child in children)
+
+
+def run_load(port, pid, total, concurrency):
+    """(wall seconds, latencies, errors, peak server threads)"""
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+    peak = [thread_count(pid) or 0]
+    done = threading.Event()
+
+    def sample_threads():
+        while not done.wait(0.05):
+            peak[0] = max(peak[0], thread_count(pid) or 0)
+
+    def one(_):
+        nonlocal errors
+        body, content_type = multipart(os.urandom(2048))
+        start = time.perf_counter()
+        try:
+            ok = request(port, 'POST', '/ocr', body, content_type) == 200
+        except OSError:
+            ok = False
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            errors += not ok
+
+    sampler = threading.Thread(target=sample_threads, daemon=True)
+    sampler.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(total)))
+    wall = time.perf_counter() - start
+    done.set()
+    return wall, latencies, errors, peak[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--servers', nargs='+', choices=sorted(SERVERS), default=['flask', 'asgi'])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1], help="worker processes for pre-fork servers")
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[8, 64, 256])
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--latency', type=float, default=0.2, help="simulated OCR seconds per call")
+    parser.add_argument('--port', type=int, default=5101)
+    args = parser.parse_args()
+
+    print(f"{'server':>8} {'workers':>7} {'conc':>5} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7} {'threads':>8}")
+    runs = [(name, workers) for name in args.servers for workers in (args.workers if name in PREFORK else [1])]
+    for name, workers in runs:
+        proc = subprocess.Popen(SERVERS[name](args.port, workers), cwd=HERE, env=server_env(args.latency),
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_ready(args.port, proc)
+            for concurrency in args.concurrency:
+                run_load(args.port, proc.pid, min(args.requests, concurrency * 2), concurrency)  # warm up
+                wall, latencies, errors, threads = run_load(args.port, proc.pid, args.requests, concurrency)
+                latencies.sort()
+                p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+                print(f"{name:>8} {workers:>7} {concurrency:>5} {len(latencies) / wall:>8.1f}"
+                      f" {statistics.median(latencies) * 1e3:>8.0f} {p99 * 1e3:>8.0f} {errors:>7} {threads:>8}")
+        finally:
+            proc.terminate()
+            proc.wait()
+
+
+if __name__ == '__main__':
+    main()
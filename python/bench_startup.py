@@ -0,0 +1,65 @@
+"""Benchmark cold start of the serving modules.
+
+Imports each module in a fresh interpreter several times and reports the
+import time (model load, catalog parse and Flask app setup included) and
+the whole process wall time, plus which heavy libraries the import pulled
+in. A service that still imports TensorFlow or the Vision client at
+startup shows up in the last column.
+
+    python bench_startup.py --modules ocr2 ocr --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+HEAVY_MODULES = ('tensorflow', 'sklearn', 'pandas', 'joblib', 'google.cloud.vision', 'grpc')
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+heavy = [m for m in {heavy!r} if m in sys.modules]
+print('STARTUP ' + json.dumps({{'import_s': elapsed, 'heavy': heavy}}))
+"""
+
+
+def probe(module):
+    """(import seconds, process wall seconds, heavy modules loaded) for one fresh import"""
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, '-c', PROBE.format(module=module, heavy=HEAVY_MODULES)],
+        cwd=HERE, capture_output=True, text=True,
+    )
+    wall = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(f"importing {module} failed:\n{proc.stderr}")
+    line = next(l for l in proc.stdout.splitlines() if l.startswith('STARTUP '))
+    result = json.loads(line[len('STARTUP '):])
+    return result['import_s'], wall, result['heavy']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--modules', nargs='+', default=['ocr2', 'ocr'])
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'module':>10} {'import ms':>20} {'process ms':>20}  heavy imports")
+    for module in args.modules:
+        probe(module)  # warm the OS file cache and __pycache__
+        runs = [probe(module) for _ in range(args.runs)]
+        imports = [r[0] * 1e3 for r in runs]
+        walls = [r[1] * 1e3 for r in runs]
+        heavy = ', '.join(runs[-1][2]) or '-'
+        print(f"{module:>10} {statistics.median(imports):>9.0f} (min {min(imports):>5.0f})"
+              f" {statistics.median(walls):>9.0f} (min {min(walls):>5.0f})  {heavy}")
+
+
+if __name__ == '__main__':
+    main()
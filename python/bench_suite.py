@@ -0,0 +1,251 @@
+"""Benchmark suite for the scan pipeline's hot paths, with stored baselines.
+
+Times the stages behind ``/ocr`` on the real ocr2 code: nutrient
+extraction from label text, ``classify_food``, model inference (and the
+lattice when one is built), matching label text to catalog products for
+the OCR-free fast path, the alternatives query (over the whole catalog and
+within each product type's shard, and read from the precomputed table for
+a known product) and building the JSON response. The catalog-dependent
+cases run at each ``--sizes`` row count, on catalogs scaled up from
+mixed_data.csv. Each case reports the median and best per-call time over
+``--rounds`` rounds.
+
+A run given ``--baseline`` is compared against it and exits non-zero if
+any case's best time is slower by more than ``--tolerance``; ``--save``
+writes a run as a new baseline. Best rather than median times are
+compared, as other load on the host only ever slows a round down.
+``--runs`` repeats the whole suite and keeps each case's best, for
+baselines and for comparisons on busy hosts. Baselines are
+machine-specific and only mean something on the host that recorded them,
+so nothing is compared unless one is named: record one on the host that
+runs the comparison, and re-record it when the pipeline gets faster on
+purpose. The committed bench_baseline.json is one such recording, with
+its host in ``environment``.
+
+    python bench_suite.py
+    python bench_suite.py --runs 3 --only predict alternatives
+    python bench_suite.py --runs 3 --save my_baseline.json
+    python bench_suite.py --runs 3 --baseline my_baseline.json
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from bench_parser import LABEL_TEXTS
+from catalog import FEATURE_COLUMNS, Catalog
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CSV_PATH = os.path.join(HERE, 'mixed_data.csv')
+BASELINE_FORMAT = 1
+
+
+def scaled_catalog(base, n, seed=0):
+    """``base`` resampled to ``n`` rows, with +/-10% jitter on the features once it's bigger than the original"""
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(0, len(base), n) if n != len(base) else np.arange(n)
+    columns = {col: arr[picks] for col, arr in base.columns.items()}
+    if n > len(base):
+        for col in FEATURE_COLUMNS:
+            columns[col] = np.round(columns[col] * rng.uniform(0.9, 1.1, n), 1)
+    names = [f"{base.names[i]} #{j}" for j, i in enumerate(picks.tolist())] if n != len(base) else list(base.names)
+    return Catalog(names, columns, product_types=[base.product_types[t] for t in base.type_ids[picks].tolist()])
+
+
+def measure(fn, inputs, rounds, min_time):
+    """Per-call seconds for each round; calls per round are sized so a round takes about ``min_time``"""
+    fn(*inputs[0])
+    start = time.perf_counter()
+    fn(*inputs[0])
+    once = max(time.perf_counter() - start, 1e-7)
+    number = max(1, int(min_time / once))
+
+    per_call = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for i in range(number):
+            fn(*inputs[i % len(inputs)])
+        per_call.append((time.perf_counter() - start) / number)
+    return per_call, number
+
+
+def build_cases(sizes, seed):
+    """``[(name, fn, inputs)]``: ``fn(*inputs[i])`` is one call of the stage being timed"""
+    import ocr2
+    from label_match import identify
+    from lattice import LatticeModel
+    from nutrition_parser import clean_text, nutrient_features, parser
+
+    texts = [clean_text(t) for t in LABEL_TEXTS]
+    parsed = [parser.parse(t) for t in texts]
+    rows = [nutrient_features(d) for d in parsed]
+    row_dicts = [dict(zip(FEATURE_COLUMNS, r)) for r in rows]
+    single = [(np.array([r], dtype=np.float64),) for r in rows]
+
+    cases = [
+        ('text_cleanup', clean_text, [(t,) for t in LABEL_TEXTS]),
+        ('nutrient_parse', parser.parse, [(t,) for t in texts]),
+        ('classify_food', ocr2.classify_food, [(r,) for r in row_dicts]),
+        ('predict.model.row', ocr2.model.predict, single),
+    ]
+    if isinstance(ocr2.classifier, LatticeModel):
+        cases.append(('predict.lattice.row', ocr2.classifier.predict, single))
+
+    base = Catalog.from_csv(CSV_PATH)
+    # Labels that print a catalog product's name; matched on the real names, as scaled catalogs number theirs
+    index = base.names_index()
+    named = [base.names[int(index.first_rows[j])] for j in np.flatnonzero(index.row_counts == 1).tolist()]
+    cases.append(('label_match', identify, [(base, f"{name} {texts[k % len(texts)]}") for k, name in enumerate(named)]))
+
+    rng = np.random.default_rng(seed)
+    for n in sizes:
+        catalog = scaled_catalog(base, n, seed)
+        # Scans are of real products, so query and classify with catalog rows
+        queries = [tuple(q) for q in catalog.features[rng.integers(0, len(catalog.features), 64)].tolist()]
+        batch = catalog.features[rng.integers(0, len(catalog.features), min(n, 1024))]
+        results = [(catalog, d, 'Very Harmful') for d in parsed]
+
+        def respond(catalog, nutrition_data, label):
+            with ocr2.app.app_context():
+                return ocr2.jsonify(ocr2.build_result(catalog, nutrition_data, label))
+
+        cases.append((f'classify_food.vector[n={n}]', lambda f=catalog.features: ocr2.food_rules.evaluate(f[:, 0], f[:, 1], f[:, 2]), [()]))
+        # The batch is capped, so bigger catalogs would only repeat the same case under the same name
+        if all(name != f'predict.model.batch[n={len(batch)}]' for name, _, _ in cases):
+            cases.append((f'predict.model.batch[n={len(batch)}]', ocr2.model.predict, [(batch,)]))
+        cases += [
+            (f'alternatives[n={n}]', lambda q, c=catalog: ocr2.find_alternatives(c, *q), [(q,) for q in queries]),
+        ]
+        # Each shard is queried with its own products, the way a scan of a known type would be
+        for name, (shard_rows, _) in catalog.shards.items():
+            picks = rng.integers(0, len(shard_rows), 64)
+            positions = np.searchsorted(catalog.rows, shard_rows[picks])
+            shard_queries = [(tuple(q), name) for q in catalog.features[positions].tolist()]
+            cases.append((f'alternatives.shard[{name}, n={len(shard_rows)}]',
+                          lambda q, t, c=catalog: ocr2.find_alternatives(c, *q, product_type=t), shard_queries))
+        # Known products read theirs from the table, built here rather than inside the timing
+        catalog.top_alternatives()
+        known = np.random.default_rng(seed).choice(catalog.rows, 64).tolist()
+        cases += [
+            (f'alternatives.table[n={n}]',
+             lambda r, c=catalog: ocr2.find_alternatives(c, None, None, None, positions=c.stored_alternatives(r)),
+             [(r,) for r in known]),
+            (f'build_result+json[n={n}]', respond, results),
+        ]
+    return cases
+
+
+def run(cases, rounds, min_time, only=None):
+    results = {}
+    for name, fn, inputs in cases:
+        if only and not any(o in name for o in only):
+            continue
+        per_call, number = measure(fn, inputs, rounds, min_time)
+        results[name] = {
+            'median_us': statistics.median(per_call) * 1e6,
+            'min_us': min(per_call) * 1e6,
+            'rounds': rounds,
+            'calls_per_round': number,
+        }
+        print(f"{name:<44} {results[name]['median_us']:>12.2f} {results[name]['min_us']:>12.2f}")
+    return results
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=HERE, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'created': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'commit': commit,
+        'host': platform.node(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+    }
+
+
+def merge(runs):
+    """One result per case from repeated runs: the best time seen and the median of the runs' medians"""
+    merged = {}
+    for name in runs[0]:
+        results = [r[name] for r in runs]
+        merged[name] = dict(results[0], median_us=statistics.median(r['median_us'] for r in results),
+                            min_us=min(r['min_us'] for r in results), runs=len(results))
+    return merged
+
+
+def compare(results, baseline, tolerance):
+    """Names of cases whose best time regressed by more than ``tolerance`` against ``baseline``"""
+    regressions = []
+    print(f"\n{'case':<44} {'baseline us':>12} {'best us':>12} {'change':>8}")
+    for name, result in results.items():
+        before = baseline['results'].get(name)
+        if before is None:
+            print(f"{name:<44} {'-':>12} {result['min_us']:>12.2f}      new")
+            continue
+        change = result['min_us'] / before['min_us'] - 1
+        flag = ''
+        if change > tolerance:
+            regressions.append(name)
+            flag = '  REGRESSION'
+        print(f"{name:<44} {before['min_us']:>12.2f} {result['min_us']:>12.2f} {change:>+7.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[520, 100_000, 1_000_000])
+    parser.add_argument('--rounds', type=int, default=7)
+    parser.add_argument('--runs', type=int, default=1, help="repeat the suite, keeping each case's best")
+    parser.add_argument('--min-time', type=float, default=0.05, help="target seconds per round")
+    parser.add_argument('--only', nargs='+', help="run only cases whose name contains one of these")
+    parser.add_argument('--save', help="write results to this JSON baseline")
+    parser.add_argument('--baseline', help="compare against this JSON baseline, recorded on this host")
+    parser.add_argument('--tolerance', type=float, default=0.15, help="allowed slowdown of the best time, as a fraction")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('format') != BASELINE_FORMAT:
+            raise SystemExit(f"{args.baseline} is not a format {BASELINE_FORMAT} baseline")
+
+    cases = build_cases(args.sizes, args.seed)
+    runs = []
+    for i in range(args.runs):
+        print(f"{'case':<44} {'median us':>12} {'best us':>12}" + (f"   run {i + 1}/{args.runs}" if args.runs > 1 else ''))
+        runs.append(run(cases, args.rounds, args.min_time, args.only))
+    results = merge(runs)
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump({'format': BASELINE_FORMAT, 'environment': environment(), 'tolerance': args.tolerance,
+                       'results': results}, f, indent=2)
+            f.write('\n')
+        print(f"Saved baseline to {args.save}")
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.tolerance)
+        if baseline['environment'].get('host') != platform.node():
+            print(f"Note: baseline was recorded on {baseline['environment'].get('host')}")
+        if regressions:
+            print(f"{len(regressions)} case(s) slower than baseline by more than {args.tolerance:.0%}")
+            sys.exit(1)
+        print(f"No regressions beyond {args.tolerance:.0%}")
+
+
+if __name__ == '__main__':
+    main()
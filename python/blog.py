@@ -1,12 +1,20 @@
 import datetime
 import os
 import json
+import logging
 import random
 from flask import Flask, jsonify, request
 from flask_cors import CORS
 
+from logs import setup
+from metrics import instrument_flask, span
+
+setup('blog')
+log = logging.getLogger('blog')
+
 app = Flask(__name__)
 CORS(app)
+instrument_flask(app, 'blog')
 
 # File to store blogs data
 BLOGS_FILE = 'blogs_data.json'
@@ -214,7 +222,7 @@ def load_stored_blogs():
 
 def save_stored_blogs(blogs_data):
     """Save blogs data to JSON file"""
-    with open(BLOGS_FILE, 'w') as f:
+    with span('storage_write'), open(BLOGS_FILE, 'w') as f:
         json.dump(blogs_data, f, indent=2)
 
 # Initialize stored_blogs from file
@@ -224,11 +232,11 @@ stored_blogs = load_stored_blogs()
 def get_blogs():
     """API endpoint to get blog posts"""
     global stored_blogs
-    print("Received request for blogs")
+    log.debug("Received request for blogs")
     
     # If no blogs exist, generate initial set
     if not stored_blogs:
-        print("No existing blogs, generating initial set...")
+        log.info("No existing blogs, generating initial set...")
         current_date = datetime.date.today()
         for i in range(5):
             title, snippet, content, image = get_next_blog()
@@ -255,8 +263,10 @@ def get_blogs():
         if blog_id in stored_blogs:
             sorted_blogs.append(stored_blogs[blog_id])
     
-    print(f"Sending response with {len(sorted_blogs)} blogs in ascending order")
-    return jsonify(sorted_blogs)
+    log.debug("Sending response with %d blogs in ascending order", len(sorted_blogs))
+    with span('serialize'):
+        response = jsonify(sorted_blogs)
+    return response
 
 @app.route('/blogs/generate', methods=['POST'])
 def generate_single_blog():
@@ -288,7 +298,7 @@ def generate_single_blog():
     stored_blogs['1'] = new_blog
     save_stored_blogs(stored_blogs)
     
-    print("Generated new blog at position 1, shifted existing blogs down")
+    log.info("Generated new blog at position 1, shifted existing blogs down")
     return jsonify(new_blog)
 
 @app.route('/blogs/<int:blog_id>/like', methods=['POST'])
@@ -334,7 +344,7 @@ def get_debug_info():
     return jsonify(debug_info)
 
 if __name__ == "__main__":
-    print("Blog server starting...")
-    print(f"Blogs data will be stored in: {os.path.abspath(BLOGS_FILE)}")
-    print("Debug endpoint available at: http://127.0.0.1:5002/blogs/debug")
+    log.info("Blog server starting...")
+    log.info("Blogs data will be stored in: %s", os.path.abspath(BLOGS_FILE))
+    log.info("Debug endpoint available at: http://127.0.0.1:5002/blogs/debug")
     app.run(host='0.0.0.0', port=5002)
\ No newline at end of file
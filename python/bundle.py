@@ -0,0 +1,73 @@
+"""Self-describing model bundle: one directory, one manifest.
+
+A bundle holds every array the NumPy forward pass needs as its own ``.npy``
+file next to a ``manifest.json`` that records the feature order, class
+order, layer activations, the rule table and thresholds used for labelling,
+the training dataset's hash, training metrics and the SHA-256 of each array
+file. ``read_bundle`` memory-maps the arrays and checks them against the
+manifest, so a worker either serves exactly the bundle the manifest
+describes or refuses to start.
+"""
+import hashlib
+import json
+import os
+
+import numpy as np
+
+BUNDLE_FORMAT = 1
+MANIFEST_FILE = 'manifest.json'
+
+
+class BundleError(Exception):
+    """A bundle is missing, malformed, or doesn't match its manifest"""
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def write_bundle(directory, arrays, manifest):
+    """Write ``arrays`` as .npy files plus a manifest listing their checksums"""
+    os.makedirs(directory, exist_ok=True)
+    files = {}
+    for name, array in arrays.items():
+        filename = f'{name}.npy'
+        np.save(os.path.join(directory, filename), np.ascontiguousarray(array), allow_pickle=False)
+        files[filename] = file_sha256(os.path.join(directory, filename))
+
+    manifest = dict(manifest, format=BUNDLE_FORMAT, files=files)
+    with open(os.path.join(directory, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+        f.write('\n')
+    return manifest
+
+
+def bundle_id(directory):
+    """SHA-256 of the manifest, which pins every file in the bundle"""
+    return file_sha256(os.path.join(directory, MANIFEST_FILE))
+
+
+def read_bundle(directory, verify=True):
+    """``(manifest, arrays)`` with each array memory-mapped read-only"""
+    try:
+        with open(os.path.join(directory, MANIFEST_FILE), encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        raise BundleError(f"Cannot read manifest in {directory}: {e}")
+    if manifest.get('format') != BUNDLE_FORMAT:
+        raise BundleError(f"Unsupported bundle format {manifest.get('format')!r} in {directory}")
+
+    arrays = {}
+    for filename, expected in manifest['files'].items():
+        path = os.path.join(directory, filename)
+        if not os.path.exists(path):
+            raise BundleError(f"{path} is listed in the manifest but missing")
+        if verify and file_sha256(path) != expected:
+            raise BundleError(f"Checksum mismatch for {path}")
+        # Plain ndarray view of the mapping: no copy, and no memmap subclass riding along in matmuls
+        arrays[filename[:-len('.npy')]] = np.asarray(np.load(path, mmap_mode='r', allow_pickle=False))
+    return manifest, arrays
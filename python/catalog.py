@@ -0,0 +1,430 @@
+"""The product catalog as typed NumPy columns, optionally memory-mapped.
+
+``Catalog.from_csv`` parses the CSV; ``Catalog.save`` writes the parsed
+catalog as a columnar bundle (float32 nutrient columns with NaN for blanks,
+brand names in their own table, plus the alternatives index) and
+``Catalog.load`` maps it back read-only. ``open_catalog`` keeps one
+columnar copy per CSV version under ``artifacts/catalogs/<csv sha256>-v<layout>/``,
+so every worker process serving the same CSV maps the same pages instead
+of holding a private copy. Once a new copy is in place, the copies of the
+same CSV's earlier contents or layouts are deleted.
+
+Rows are partitioned by product type (a ``Product Type`` column, or
+inferred from the brand name by product_types.py), and each type gets its
+own alternatives index, so a scan of crackers only searches crackers.
+Products of no known type ('other') get no shard of their own: they are
+too mixed a bag for their alternatives to come from among themselves, so
+a scan of one searches the whole catalog. The
+bundle also carries the brand-name search index (name_index.py) and every
+product's own alternatives, worked out ahead of time (alternatives_table.py);
+when the CSV only gains rows, the catalog replacing it updates the previous
+table rather than recomputing it.
+
+    python catalog.py mixed_data.csv            # convert ahead of deploy
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from array import array
+
+import numpy as np
+
+import alternatives_table
+import artifacts
+from bundle import MANIFEST_FILE, BundleError, file_sha256, read_bundle, write_bundle
+from dominance import DominanceIndex
+from name_index import NameIndex
+from product_types import OTHER, PRODUCT_TYPE_COLUMN, infer, normalize
+
+log = logging.getLogger(__name__)
+
+CATALOG_ENCODING = 'ISO-8859-1'
+NAME_COLUMN = 'Brand Name'
+FEATURE_COLUMNS = ["TOTAL SUGARS", "TOTAL FAT", "SODIUM(mg)"]
+
+CATALOGS_DIR = os.path.join(artifacts.ARTIFACTS_DIR, 'catalogs')
+# Bumped whenever saved catalogs gain or change arrays, or product_types.RULES changes the inferred
+# types they store, so older copies are rebuilt instead of read
+CATALOG_LAYOUT = 7
+COLUMNAR = os.environ.get('CATALOG_COLUMNAR', '1') == '1'
+
+
+def health_score(sugar, fat, sodium):
+    """Lower is healthier; same weighting the alternatives ranking has always used"""
+    return sugar + fat + (sodium / 100)
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except ValueError:
+        return np.nan
+
+
+class BrandTable:
+    """Per-row brand names stored once each: row -> id -> UTF-8 bytes in one buffer"""
+
+    def __init__(self, ids, offsets, data):
+        self.ids = ids
+        self.offsets = offsets
+        self.data = data
+
+    @classmethod
+    def from_names(cls, names):
+        distinct = {}
+        ids = np.fromiter((distinct.setdefault(n, len(distinct)) for n in names), dtype=np.uint32, count=len(names))
+        encoded = [n.encode('utf-8') for n in distinct]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        return cls(ids, offsets, np.frombuffer(b''.join(encoded), dtype=np.uint8))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        return self.name(int(self.ids[i]))
+
+    def distinct(self):
+        return len(self.offsets) - 1
+
+    def name(self, j):
+        """The name with id ``j``"""
+        return self.data[self.offsets[j]:self.offsets[j + 1]].tobytes().decode('utf-8')
+
+
+class Catalog:
+    """Read-only snapshot of the product catalog held as typed NumPy columns.
+
+    Nutrient columns are float32 with NaN for blank cells. Rows missing any
+    of the three model features are kept for lookups by position but
+    excluded from the alternatives search, matching the old
+    ``dropna(subset=...)`` behaviour. The search itself runs on float64
+    features taken from the parsed CSV, so a product matches a query at
+    exactly the values printed on its row.
+
+    ``product_types`` gives each row's type (None or blank: inferred from
+    its name). ``shards`` maps each type but 'other' to its searchable rows
+    and their own ``DominanceIndex``; ``index`` still covers every row, for
+    scans of 'other' products and of types that aren't known.
+    """
+
+    def __init__(self, names, columns, mtime=None, derived=None, product_types=None, names_index=None,
+                 top_alternatives=None):
+        self.names = names
+        self.mtime = mtime
+        self._names_index = names_index
+        self._top_alternatives = top_alternatives
+
+        if derived is None:
+            features = np.column_stack([np.asarray(columns[c], dtype=np.float64) for c in FEATURE_COLUMNS])
+            rows = np.flatnonzero(~np.isnan(features).any(axis=1))
+            features = np.ascontiguousarray(features[rows])
+            scores = health_score(features[:, 0], features[:, 1], features[:, 2])
+            type_names, type_ids = _type_ids(names, product_types)
+            shards = {}
+            for code, name in enumerate(type_names):
+                members = np.flatnonzero(type_ids[rows] == code)
+                if len(members) and name != OTHER:
+                    shards[name] = (rows[members], DominanceIndex(features[members], scores[members]))
+            derived = rows, features, scores, DominanceIndex(features, scores), type_names, type_ids, shards
+        self.rows, self.features, self.scores, self.index, self.product_types, self.type_ids, self.shards = derived
+        self.columns = {col: np.asarray(arr, dtype=np.float32) for col, arr in columns.items()}
+
+    @classmethod
+    def from_csv(cls, path):
+        """Parse the catalog CSV once into typed columns (blank cells become NaN)"""
+        mtime = os.stat(path).st_mtime
+        with open(path, newline='', encoding=CATALOG_ENCODING) as f:
+            reader = csv.reader(f)
+            header = next(reader)
+            name_at = header.index(NAME_COLUMN)
+            type_at = header.index(PRODUCT_TYPE_COLUMN) if PRODUCT_TYPE_COLUMN in header else None
+            names = []
+            product_types = [] if type_at is not None else None
+            values = [(j, array('d')) for j, col in enumerate(header) if j not in (name_at, type_at)]
+            for record in reader:
+                if not record:
+                    continue
+                record = record + [''] * (len(header) - len(record))
+                names.append(record[name_at])
+                if product_types is not None:
+                    product_types.append(record[type_at])
+                for j, vals in values:
+                    cell = record[j]
+                    vals.append(_to_float(cell) if cell.strip() else np.nan)
+
+        columns = {header[j]: np.frombuffer(vals, dtype=np.float64) for j, vals in values}
+        return cls(names, columns, mtime, product_types=product_types)
+
+    def save(self, directory, source=None):
+        """Write the catalog as a columnar bundle that ``load`` can memory-map"""
+        brands = self.brands()
+        arrays = {f'column_{j:02d}': arr for j, arr in enumerate(self.columns.values())}
+        arrays.update(brand_ids=brands.ids, brand_offsets=brands.offsets, brand_data=brands.data,
+                      rows=self.rows, features=self.features, scores=self.scores)
+        arrays.update({f'index_{name}': arr for name, arr in self.index.arrays().items()})
+        arrays['type_ids'] = self.type_ids
+        for j, (rows, index) in enumerate(self.shards.values()):
+            arrays[f'shard_{j:02d}_rows'] = rows
+            arrays.update({f'shard_{j:02d}_index_{name}': arr for name, arr in index.arrays().items()})
+        arrays.update({f'search_{name}': arr for name, arr in self.names_index(brands).arrays().items()})
+        arrays['top_alternatives'] = self.top_alternatives()
+        manifest = {'kind': 'catalog', 'layout': CATALOG_LAYOUT, 'columns': list(self.columns), 'rows': len(self),
+                    'product_types': self.product_types, 'shards': list(self.shards), 'source': source}
+        return write_bundle(directory, arrays, manifest)
+
+    @classmethod
+    def load(cls, directory, verify=False):
+        """Map a saved catalog read-only; nothing is copied until a page is touched"""
+        manifest, arrays = read_bundle(directory, verify)
+        if manifest.get('kind') != 'catalog':
+            raise BundleError(f"{directory} is not a catalog bundle")
+        if manifest.get('layout') != CATALOG_LAYOUT:
+            raise BundleError(f"{directory} has catalog layout {manifest.get('layout')!r}, expected {CATALOG_LAYOUT}")
+        names = BrandTable(arrays['brand_ids'], arrays['brand_offsets'], arrays['brand_data'])
+        columns = {col: arrays[f'column_{j:02d}'] for j, col in enumerate(manifest['columns'])}
+        index = DominanceIndex.from_arrays(_prefixed(arrays, 'index_'))
+        shards = {name: (arrays[f'shard_{j:02d}_rows'], DominanceIndex.from_arrays(_prefixed(arrays, f'shard_{j:02d}_index_')))
+                  for j, name in enumerate(manifest['shards'])}
+        return cls(names, columns, derived=(arrays['rows'], arrays['features'], arrays['scores'], index,
+                                            manifest['product_types'], arrays['type_ids'], shards),
+                   names_index=NameIndex.from_arrays(_prefixed(arrays, 'search_')),
+                   top_alternatives=arrays['top_alternatives'])
+
+    def __len__(self):
+        return len(self.names)
+
+    def brands(self):
+        return self.names if isinstance(self.names, BrandTable) else BrandTable.from_names(self.names)
+
+    def names_index(self, brands=None):
+        """Brand-name search index: mapped with a saved catalog, otherwise built on first use"""
+        if self._names_index is None:
+            self._names_index = NameIndex.build(brands or self.brands())
+        return self._names_index
+
+    def top_alternatives(self):
+        """Every row's alternatives within its own shard: mapped with a saved catalog, otherwise computed on first use"""
+        if self._top_alternatives is None:
+            self._top_alternatives = alternatives_table.build(self)
+        return self._top_alternatives
+
+    def inherit_alternatives(self, previous):
+        """Take over ``previous``'s alternatives, updated for rows appended since; False if other rows changed"""
+        if previous._top_alternatives is None:
+            return False
+        table = alternatives_table.update(self, previous, previous._top_alternatives)
+        if table is None:
+            return False
+        self._top_alternatives = table
+        return True
+
+    def stored_alternatives(self, i):
+        """Row positions of row ``i``'s alternatives within its own shard (never ``i``), read from the precomputed table"""
+        return [r for r in self.top_alternatives()[i].tolist() if r >= 0]
+
+    def product_type(self, i):
+        return self.product_types[self.type_ids[i]]
+
+    def record(self, i):
+        """Return row ``i`` as a plain dict of column name to value"""
+        rec = {NAME_COLUMN: self.names[i], PRODUCT_TYPE_COLUMN: self.product_type(i)}
+        for col, arr in self.columns.items():
+            # str() gives the shortest decimal for a float32, i.e. the value as written in the CSV
+            rec[col] = float(str(arr[i]))
+        return rec
+
+    def shard(self, product_type):
+        """Name of the shard a scan of ``product_type`` searches: its own, or 'all' for 'other' and types the catalog has none of"""
+        product_type = normalize(product_type)
+        return product_type if product_type in self.shards else 'all'
+
+    def alternatives(self, sugar, fat, sodium, k=3, product_type=None):
+        """Row positions of the ``k`` best-scoring products dominated by the given values.
+
+        With a ``product_type`` the catalog has, only that type's rows are searched.
+        """
+        shard = self.shard(product_type)
+        rows, index = self.shards[shard] if shard != 'all' else (self.rows, self.index)
+        positions = index.top_k((sugar, fat, sodium), k)
+        return rows[positions].tolist()
+
+    def shard_sizes(self):
+        """Searchable rows in each product type's shard"""
+        return {name: len(rows) for name, (rows, _) in self.shards.items()}
+
+
+def _type_ids(names, product_types=None):
+    """``(type names, per-row uint16 codes into them)``, inferring types missing from ``product_types``"""
+    distinct = {}
+    inferred = {}
+    ids = np.empty(len(names), dtype=np.uint16)
+    for i in range(len(names)):
+        product_type = normalize(product_types[i]) if product_types is not None else None
+        if product_type is None:
+            name = names[i]
+            product_type = inferred.get(name)
+            if product_type is None:
+                product_type = inferred[name] = infer(name)
+        ids[i] = distinct.setdefault(product_type, len(distinct))
+    return list(distinct), ids
+
+
+def _prefixed(arrays, prefix):
+    return {k[len(prefix):]: v for k, v in arrays.items() if k.startswith(prefix)}
+
+
+def columnar_dir(csv_path):
+    return os.path.join(CATALOGS_DIR, f'{file_sha256(csv_path)}-v{CATALOG_LAYOUT}')
+
+
+def _source_path(directory):
+    try:
+        with open(os.path.join(directory, MANIFEST_FILE), encoding='utf-8') as f:
+            return json.load(f).get('source', {}).get('path')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def prune_stale(csv_path, keep, root=CATALOGS_DIR):
+    """Delete ``csv_path``'s columnar copies in ``root`` other than ``keep``; returns how many.
+
+    Processes still mapping one keep their pages until they unmap them, and
+    copies in progress (``*.tmp``) are left alone.
+    """
+    source = os.path.abspath(csv_path)
+    pruned = 0
+    for entry in os.listdir(root):
+        directory = os.path.join(root, entry)
+        if entry.endswith('.tmp') or os.path.abspath(directory) == os.path.abspath(keep) or _source_path(directory) != source:
+            continue
+        shutil.rmtree(directory, ignore_errors=True)
+        pruned += 1
+    return pruned
+
+
+def convert(csv_path, directory=None, previous=None):
+    """Parse ``csv_path`` and save it as a columnar catalog; returns the directory.
+
+    ``previous`` is the catalog this one replaces; if the CSV has only had
+    rows appended since, its alternatives table is updated instead of rebuilt.
+    Only a conversion into the CSV's own ``columnar_dir`` deletes its older
+    copies; any other ``directory`` is a one-off that leaves them alone.
+    """
+    own_dir = columnar_dir(csv_path)
+    directory = directory or own_dir
+    catalog = Catalog.from_csv(csv_path)
+    if previous is not None and catalog.inherit_alternatives(previous):
+        log.info("Updated precomputed alternatives for %d appended rows", len(catalog) - len(previous))
+    tmp = f'{directory}.{os.getpid()}.tmp'
+    catalog.save(tmp, source={'path': os.path.abspath(csv_path), 'sha256': file_sha256(csv_path)})
+    try:
+        os.rename(tmp, directory)
+    except OSError:
+        # Another worker converted the same CSV first; its copy is identical
+        shutil.rmtree(tmp, ignore_errors=True)
+        if not os.path.exists(os.path.join(directory, MANIFEST_FILE)):
+            raise
+    if os.path.abspath(directory) == os.path.abspath(own_dir):
+        pruned = prune_stale(csv_path, directory)
+        if pruned:
+            log.info("Removed %d stale columnar catalog(s) of %s", pruned, csv_path)
+    return directory
+
+
+def open_catalog(csv_path, columnar=COLUMNAR, previous=None):
+    """The catalog in ``csv_path``, mapped from its columnar copy (converted on first use) if ``columnar``.
+
+    ``previous``, the catalog being replaced, lets precomputed alternatives
+    carry over when the CSV has only gained rows.
+    """
+    if not columnar:
+        catalog = Catalog.from_csv(csv_path)
+        if previous is not None:
+            catalog.inherit_alternatives(previous)
+        return catalog
+    mtime = os.stat(csv_path).st_mtime
+    try:
+        directory = columnar_dir(csv_path)
+        if not os.path.exists(os.path.join(directory, MANIFEST_FILE)):
+            convert(csv_path, directory, previous)
+        catalog = Catalog.load(directory)
+    except (OSError, BundleError) as e:
+        log.warning("Columnar catalog for %s unavailable, parsing the CSV: %s", csv_path, e)
+        return Catalog.from_csv(csv_path)
+    catalog.mtime = mtime
+    return catalog
+
+
+class CatalogStore:
+    """Holds the current ``Catalog`` and swaps in a fresh one when the CSV changes.
+
+    The file is only ever read by the watcher thread, so request handlers
+    calling ``get()`` never touch disk.
+    """
+
+    def __init__(self, path, poll_interval=5.0):
+        self.path = path
+        self.poll_interval = poll_interval
+        self._catalog = open_catalog(path)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def get(self):
+        return self._catalog
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._watch, name='catalog-watcher', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def reload_if_changed(self):
+        """Re-parse the CSV if its mtime moved; returns True when a new snapshot was installed"""
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError as e:
+            log.warning("Catalog %s unavailable: %s", self.path, e)
+            return False
+        if mtime == self._catalog.mtime:
+            return False
+        try:
+            self._catalog = open_catalog(self.path, previous=self._catalog)
+        except Exception as e:
+            log.warning("Failed to reload catalog %s, keeping previous snapshot: %s", self.path, e)
+            return False
+        log.info("Reloaded catalog from %s (%d rows)", self.path, len(self._catalog))
+        return True
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_interval):
+            self.reload_if_changed()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert a catalog CSV to the memory-mapped columnar format")
+    parser.add_argument('csv', nargs='?', default=os.path.join(artifacts.HERE, 'mixed_data.csv'))
+    parser.add_argument('--out', default=None, help="defaults to artifacts/catalogs/<csv sha256>-v<layout>")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    directory = convert(args.csv, args.out)
+    size = sum(os.path.getsize(os.path.join(directory, f)) for f in os.listdir(directory))
+    print(f"Converted {args.csv} in {time.perf_counter() - start:.1f}s -> {directory} ({size / 2**20:.1f} MiB)")
+    for name, rows in Catalog.load(directory).shard_sizes().items():
+        print(f"  {name:<16} {rows:>10} rows")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,16 +1,24 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 import base64
+import logging
 import os
 from dotenv import load_dotenv
 from google import genai
 from google.genai import types
 
+from logs import payload, setup
+from metrics import instrument_flask, span
+
 # Load API key from .env
 load_dotenv()
 
+setup('chat')
+log = logging.getLogger('chat')
+
 app = Flask(__name__)
 CORS(app)
+instrument_flask(app, 'chat')
 
 # Initialize Gemini client
 client = genai.Client(api_key=os.environ.get("GEMINI_API_KEY"))
@@ -204,15 +212,14 @@ def chat():
     data = request.get_json()
     user_input = data.get("message", "")
 
-    print("\n" + "="*50)
-    print("User Question:", user_input)
-    print("="*50)
+    payload(log, "User Question: %s", user_input)
 
     if not user_input:
         return jsonify({"reply": "No message received"}), 400
 
     # Find relevant sample QA pairs
-    relevant_samples = find_relevant_samples(user_input)
+    with span('sample_lookup'):
+        relevant_samples = find_relevant_samples(user_input)
     
     # Create context examples from relevant samples
     sample_context = ""
@@ -279,28 +286,29 @@ Keep responses concise but informative."""
         config = types.GenerateContentConfig(response_mime_type="text/plain")
 
         reply = []
-        for chunk in client.models.generate_content_stream(
-            model=model,
-            contents=contents,
-            config=config
-        ):
-            if chunk.text is not None:
-                reply.append(chunk.text)
+        with span('llm_call'):
+            for chunk in client.models.generate_content_stream(
+                model=model,
+                contents=contents,
+                config=config
+            ):
+                if chunk.text is not None:
+                    reply.append(chunk.text)
 
         final_reply = "".join(reply).strip()
         if not final_reply:
             return jsonify({"reply": "I apologize, but I couldn't generate a response. Please try again."}), 500
 
-        print("\nRelevant samples found:", len(relevant_samples))
-        #print("\nAI Model Response:", final_reply)
-        print("Number of sentences:", len(final_reply.split('. ')))
-        print("="*50 + "\n")
-        
-        return jsonify({"reply": final_reply})
+        log.debug("Relevant samples found: %d", len(relevant_samples))
+        payload(log, "AI Model Response: %s", final_reply)
+        log.debug("Number of sentences: %d", len(final_reply.split('. ')))
+
+        with span('serialize'):
+            response = jsonify({"reply": final_reply})
+        return response
 
     except Exception as e:
-        print(f"\nError in chat endpoint: {str(e)}")
-        print("="*50 + "\n")
+        log.exception("Error in chat endpoint")
         return jsonify({"reply": f"Error: {str(e)}"}), 500
 
 if __name__ == "__main__":
@@ -0,0 +1,126 @@
+import heapq
+
+import numpy as np
+
+
+class DominanceIndex:
+    """k-d tree answering "best k points dominated by q" queries.
+
+    Each node keeps the lower corner of its bounding box and the lowest
+    score beneath it. A best-first search over those summaries only opens
+    nodes whose box can contain dominated points and whose best score can
+    still make the top k, so a query touches a small slice of the tree
+    instead of filtering and sorting every row.
+
+    Results come back ordered by (score, position), i.e. the same order a
+    stable sort on score would give.
+
+    ``arrays``/``from_arrays`` round-trip a built tree through plain arrays,
+    so it can be saved once and memory-mapped by every worker. Per-point
+    data stays in those arrays; only the per-node summaries (about one node
+    per 16 points) become Python lists.
+    """
+
+    def __init__(self, points, scores, leaf_size=32):
+        points = np.asarray(points, dtype=np.float64)
+        scores = np.asarray(scores, dtype=np.float64)
+        n, dims = points.shape
+        self.dims = dims
+
+        perm = np.arange(n)
+        starts, ends, lefts, rights = [], [], [], []
+        stack = [(0, n, -1, False)]
+        while stack:
+            start, end, parent, is_right = stack.pop()
+            node = len(starts)
+            starts.append(start)
+            ends.append(end)
+            lefts.append(-1)
+            rights.append(-1)
+            if parent >= 0:
+                (rights if is_right else lefts)[parent] = node
+
+            if end - start > leaf_size:
+                idx = perm[start:end]
+                spread = points[idx].max(axis=0) - points[idx].min(axis=0)
+                dim = int(np.argmax(spread))
+                if spread[dim] > 0:
+                    mid = (end - start) // 2
+                    part = np.argpartition(points[idx, dim], mid)
+                    perm[start:end] = idx[part]
+                    stack.append((start + mid, end, node, True))
+                    stack.append((start, start + mid, node, False))
+
+        points = np.ascontiguousarray(points[perm])
+        scores = scores[perm]
+        lo = np.empty((len(starts), dims))
+        best = np.empty(len(starts))
+        for node, (start, end) in enumerate(zip(starts, ends)):
+            if end > start:
+                lo[node] = points[start:end].min(axis=0)
+                best[node] = scores[start:end].min()
+            else:
+                lo[node] = np.inf
+                best[node] = np.inf
+        self._setup(perm, points, scores, np.array([starts, ends, lefts, rights], dtype=np.int64).T, lo, best)
+
+    def _setup(self, ids, points, scores, nodes, lo, best):
+        self.dims = points.shape[1]
+        self.ids = ids
+        self.points = points
+        self.scores = scores
+        self.nodes = nodes
+        self.lo = lo
+        self.best = best
+
+        # Per-node summaries, kept as plain lists for cheap scalar access while traversing
+        self._start, self._end, self._left, self._right = (col.tolist() for col in np.asarray(nodes).T)
+        self._lo = [tuple(row) for row in lo.tolist()]
+        self._best = best.tolist()
+
+    def arrays(self):
+        return {'ids': self.ids, 'points': self.points, 'scores': self.scores,
+                'nodes': self.nodes, 'lo': self.lo, 'best': self.best}
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        """An index over arrays written by ``arrays()``, used in place (e.g. memory-mapped)"""
+        index = cls.__new__(cls)
+        index._setup(arrays['ids'], arrays['points'], arrays['scores'], arrays['nodes'], arrays['lo'], arrays['best'])
+        return index
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _reachable(self, node, q):
+        return all(l <= v for l, v in zip(self._lo[node], q))
+
+    def top_k(self, q, k):
+        """Positions of the ``k`` lowest-score points ``p`` with ``p <= q`` in every dimension"""
+        q = tuple(float(v) for v in q)
+        result = []
+        if not len(self.ids) or k <= 0 or not self._reachable(0, q):
+            return result
+
+        q_arr = np.asarray(q)
+        # Nodes are keyed (best, -1, node) and points (score, id, -1); a node
+        # therefore always opens before any point with an equal score is emitted.
+        heap = [(self._best[0], -1, 0)]
+        while heap and len(result) < k:
+            score, pid, node = heapq.heappop(heap)
+            if node < 0:
+                result.append(pid)
+                continue
+
+            left = self._left[node]
+            if left < 0:
+                start, end = self._start[node], self._end[node]
+                hits = np.flatnonzero((self.points[start:end] <= q_arr).all(axis=1)) + start
+                for point in zip(self.scores[hits].tolist(), self.ids[hits].tolist()):
+                    heapq.heappush(heap, point + (-1,))
+                continue
+
+            for child in (left, self._right[node]):
+                if self._reachable(child, q):
+                    heapq.heappush(heap, (self._best[child], -1, child))
+        return result
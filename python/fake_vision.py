@@ -0,0 +1,96 @@
+"""In-process stand-in for ``vision.ImageAnnotatorClient``.
+
+Returns canned label text with an optional artificial latency and records
+how many calls were in flight at once, which is what the batch endpoint and
+load tests need to exercise the OCR path without credentials or network.
+``AsyncFakeVisionClient`` does the same for ``vision.ImageAnnotatorAsyncClient``.
+"""
+import asyncio
+import hashlib
+import threading
+import time
+from types import SimpleNamespace
+
+
+def _response(text='', error=''):
+    return SimpleNamespace(
+        error=SimpleNamespace(message=error),
+        full_text_annotation=SimpleNamespace(text=text),
+    )
+
+
+class _FakeVision:
+    """Canned answers and in-flight accounting shared by the sync and async fakes"""
+
+    def __init__(self, texts=None, default_text='', latency=0.0, errors=None):
+        self.texts = dict(texts or {})
+        self.default_text = default_text
+        self.latency = latency
+        self.errors = dict(errors or {})
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def _annotate(self, content):
+        key = hashlib.sha256(content).hexdigest()
+        if key in self.errors:
+            return _response(error=self.errors[key])
+        return _response(text=self.texts.get(key, self.default_text))
+
+    def _annotate_all(self, requests):
+        responses = []
+        for req in requests:
+            image = req['image'] if isinstance(req, dict) else req.image
+            responses.append(self._annotate(image['content'] if isinstance(image, dict) else image.content))
+        return SimpleNamespace(responses=responses)
+
+    def _enter(self):
+        with self._lock:
+            self.calls += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def _leave(self):
+        with self._lock:
+            self.in_flight -= 1
+
+
+class FakeVisionClient(_FakeVision):
+    """Answers text detection from ``texts`` (sha256 of image bytes -> text) or ``default_text``"""
+
+    def document_text_detection(self, image, **kwargs):
+        self._enter()
+        try:
+            if self.latency:
+                time.sleep(self.latency)
+            content = image['content'] if isinstance(image, dict) else image.content
+            return self._annotate(content)
+        finally:
+            self._leave()
+
+    def batch_annotate_images(self, requests, **kwargs):
+        self._enter()
+        try:
+            if self.latency:
+                time.sleep(self.latency)
+            return self._annotate_all(requests)
+        finally:
+            self._leave()
+
+
+class AsyncFakeVisionClient(_FakeVision):
+    """Coroutine version of FakeVisionClient; latency is an ``asyncio.sleep``, not a blocked thread.
+
+    Like ``ImageAnnotatorAsyncClient`` it only has ``batch_annotate_images``:
+    the single-image helpers exist on the sync client alone.
+    """
+
+    async def batch_annotate_images(self, requests, **kwargs):
+        self._enter()
+        try:
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            return self._annotate_all(requests)
+        finally:
+            self._leave()
@@ -0,0 +1,45 @@
+"""Production serving for ocr2: gunicorn, with the app loaded once before forking.
+
+    gunicorn -c gunicorn.conf.py ocr2:app
+
+``preload_app`` makes the master import ocr2 (model, prediction lattice,
+catalog mapping, rule tables) a single time; workers are forked from it and
+share those pages instead of each loading its own copy, and there is no
+debug reloader importing the module twice. Threads don't survive fork and
+gRPC channels must not cross it, so ``post_fork`` has each worker restart
+ocr2's background threads and drop any inherited Vision client; a worker
+creates its own client on its first OCR call.
+
+Each worker keeps its own counters. ``/metrics`` adds up every worker's
+histograms through PROMETHEUS_MULTIPROC_DIR (a fresh temporary directory
+unless set, emptied when the server starts). The JSON stats endpoints
+(``/ocr/cache/stats``, ``/model/batching/stats``, ``/ocr/fastpath/stats``
+and the rest) are not aggregated: each describes only the worker that
+answered, so read them per worker or use ``/metrics``.
+"""
+import glob
+import os
+import tempfile
+
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', tempfile.mkdtemp(prefix='ocr2-metrics-'))
+
+bind = os.environ.get('OCR2_BIND', '0.0.0.0:5001')
+workers = int(os.environ.get('WEB_CONCURRENCY', os.cpu_count() or 1))
+# OCR requests mostly wait on the network, so each worker also runs a few handler threads
+worker_class = 'gthread'
+threads = int(os.environ.get('OCR2_THREADS', 8))
+preload_app = True
+timeout = 60
+graceful_timeout = 30
+
+
+def on_starting(server):
+    # Counts left by an earlier run of the server would otherwise be added to this one's
+    for path in glob.glob(os.path.join(os.environ['PROMETHEUS_MULTIPROC_DIR'], 'metrics-*.json')):
+        os.remove(path)
+
+
+def post_fork(server, worker):
+    import ocr2
+
+    ocr2.after_fork()
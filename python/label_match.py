@@ -0,0 +1,153 @@
+"""Recognising a scanned label as a product the catalog already has.
+
+Many scans are of packs that are in the catalog. When a label's OCR text
+contains a catalog brand name, or the client names the product, the
+catalog row answers the scan: its stored nutrient values, the model's
+category for them and its alternatives, built once per product and reused,
+with no nutrient parsing, model call or alternatives search per scan.
+
+Only confident matches are used. Nearly all of the name's trigrams must be
+in the text (``MATCH_COVERAGE``, which lets a misread letter through), and
+the name must be long enough not to turn up by chance and belong to a
+single catalog row. Among the names found, one printed whole as a phrase
+wins, as long as any other phrase is a shorter form of it ("Good Day"
+inside "Britannia Good Day Cashew Cookies"): an ingredient list mentioning
+butter doesn't make a cashew cookie "Butter Cookies". Without such a
+phrase, every other name found must be a shorter form of the best covered
+one. A label still naming two products is scanned the usual way.
+"""
+import math
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from catalog import FEATURE_COLUMNS
+from name_index import normalize, trigrams
+
+ENABLED = os.environ.get('OCR_FAST_PATH', '1') == '1'
+MATCH_COVERAGE = float(os.environ.get('OCR_FAST_PATH_COVERAGE', 0.9))
+MAX_PRODUCTS = int(os.environ.get('OCR_FAST_PATH_MAX_PRODUCTS', 10000))
+# Names with fewer trigrams than this ("Oreo" has 5) are too easily found in unrelated text
+MIN_NAME_GRAMS = 8
+# More names than this in one label and it's a list of products, not a pack
+MAX_CANDIDATES = 256
+
+# Catalog column -> (nutrition_data key, unit), as NutritionParser reports them
+NUTRIENT_COLUMNS = {
+    "ENERGY(kcal)": ("Energy", "kcal"),
+    "PROTEIN": ("Protein", "g"),
+    "CARBOHYDRATE": ("Carbohydrate", "g"),
+    "TOTAL SUGARS": ("Sugars", "g"),
+    "ADDED SUGARS": ("Added Sugars", "g"),
+    "TOTAL FAT": ("Total Fat", "g"),
+    "SATURATED FAT": ("Saturated Fat", "g"),
+    "TRANS FAT": ("Trans Fat", "g"),
+    "CHOLESTEROL(mg)": ("Cholesterol", "mg"),
+    "SODIUM(mg)": ("Sodium", "mg"),
+    "Dietary Fiber": ("Dietary Fiber", "g"),
+    "Mono Unsaturated Fatty Acids": ("Monounsaturated fatty acids", "g"),
+    "Poly Unsaturated Fatty Acids": ("Polyunsaturated fatty acids", "g"),
+}
+
+
+def stored_nutrition(record):
+    """A catalog record's nutrient values as nutrition_data, leaving out blank cells"""
+    return {key: {'value': record[col], 'unit': unit} for col, (key, unit) in NUTRIENT_COLUMNS.items()
+            if col in record and not math.isnan(record[col])}
+
+
+def _only(candidates, names):
+    """The first of ``candidates`` if every other is a shorter form of it, else None"""
+    words = set(names[candidates[0]].split())
+    return candidates[0] if all(set(names[j].split()) <= words for j in candidates[1:]) else None
+
+
+def identify(catalog, text, coverage=MATCH_COVERAGE, whole=False):
+    """``(row, ambiguous)``: the catalog row whose brand name ``text`` contains, if exactly one does.
+
+    With ``whole`` the text is a product name rather than a label, so it
+    must also be nearly all brand name, not a longer description.
+    """
+    index = catalog.names_index()
+    ids, shared = index.covered(text, coverage)
+    if whole:
+        keep = shared >= coverage * len(trigrams(normalize(text))) - 1e-9
+    else:
+        keep = index.gram_counts[ids] >= MIN_NAME_GRAMS
+    ids, shared = ids[keep], shared[keep]
+    if not len(ids):
+        return None, False
+    if len(ids) > MAX_CANDIDATES:
+        return None, True
+    candidates = ids[np.lexsort((ids, -shared))].tolist()
+    names = {j: index.normalized(j) for j in candidates}
+    padded = f' {normalize(text)} '
+    phrases = [j for j in candidates if f' {names[j]} ' in padded]
+    best = _only(phrases or candidates, names)
+    if best is None or index.row_counts[best] != 1:
+        return None, True
+    row = int(index.first_rows[best])
+    # Without the model's features on file the label is better read than guessed
+    if any(math.isnan(catalog.columns[col][row]) for col in FEATURE_COLUMNS):
+        return None, False
+    return row, False
+
+
+class LabelMatcher:
+    """Matches labels to catalog rows and keeps each matched product's scan result"""
+
+    def __init__(self, coverage=MATCH_COVERAGE, max_products=MAX_PRODUCTS, enabled=ENABLED):
+        self.coverage = coverage
+        self.max_products = max_products
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._catalog = None
+        self._results = OrderedDict()
+        self.checked = {'text': 0, 'name': 0}
+        self.matched = {'text': 0, 'name': 0}
+        self.ambiguous = 0
+
+    def match(self, catalog, text, source='text'):
+        """Catalog row that label ``text`` (or, with ``source='name'``, a product name) is of, or None"""
+        if not self.enabled or not text:
+            return None
+        row, ambiguous = identify(catalog, text, self.coverage, whole=source == 'name')
+        with self._lock:
+            self.checked[source] += 1
+            self.matched[source] += row is not None
+            self.ambiguous += ambiguous
+        return row
+
+    def result(self, catalog, key, build):
+        """``build()`` for ``key`` (a matched row and the scan's options), made once per catalog version"""
+        with self._lock:
+            if catalog is not self._catalog:
+                self._catalog = catalog
+                self._results.clear()
+            found = self._results.get(key)
+            if found is not None:
+                self._results.move_to_end(key)
+                return found
+        found = build()
+        with self._lock:
+            if catalog is self._catalog:
+                self._results[key] = found
+                if len(self._results) > self.max_products:
+                    self._results.popitem(last=False)
+        return found
+
+    def stats(self):
+        with self._lock:
+            checked = sum(self.checked.values())
+            matched = sum(self.matched.values())
+            return {
+                'enabled': self.enabled,
+                'checked': dict(self.checked),
+                'matched': dict(self.matched),
+                'ambiguous': self.ambiguous,
+                'fast_path_rate': matched / checked if checked else 0.0,
+                'products': len(self._results),
+                'coverage': self.coverage,
+            }
@@ -0,0 +1,240 @@
+"""Precomputed classifier output over a quantized (sugar, fat, sodium) grid.
+
+The model only ever sees three features, so its whole input space can be
+tabulated once: ``Lattice.build`` evaluates the model at every point of a
+uniform grid and stores the winning class index as one uint8 per cell.
+Serving then classifies a row from the eight grid points around it, in the
+array ``Lattice.load`` memory-maps so workers share the pages. When all
+eight agree the row gets their class; when they don't, the row is near a
+decision boundary and snapping it to a grid point could change its label, so
+it goes to the model itself, as do rows outside the grid.
+
+A lattice is stored as ``lattice.npy`` plus ``lattice.json`` (axes, class
+order and the id of the model it was built from) under
+``artifacts/lattices/<model id>/``, so a retrained model never picks up a
+stale grid.
+
+    python lattice.py                       # build for the current ocr2 model
+    python lattice.py --profile ocr
+    python lattice.py --report --sample 200000
+"""
+import argparse
+import json
+import logging
+import os
+import time
+
+import numpy as np
+
+import artifacts
+from bundle import bundle_id, file_sha256
+from rules import FEATURES
+
+log = logging.getLogger(__name__)
+
+LATTICE_FILE = 'lattice.npy'
+META_FILE = 'lattice.json'
+LATTICES_DIR = os.path.join(artifacts.ARTIFACTS_DIR, 'lattices')
+
+# (start, step, points) per feature in FEATURES order: 0-100 g in 0.5 g, 0-4000 mg in 5 mg
+DEFAULT_AXES = ((0.0, 0.5, 201), (0.0, 0.5, 201), (0.0, 5.0, 801))
+
+
+def model_id(path):
+    """Stable id of a model artifact: the bundle's manifest hash or the weights file's SHA-256"""
+    return bundle_id(path) if os.path.isdir(path) else file_sha256(path)
+
+
+def default_dir(path):
+    return os.path.join(LATTICES_DIR, model_id(path))
+
+
+class Lattice:
+    """uint8 class-index grid plus the axes it was sampled on"""
+
+    def __init__(self, grid, axes, classes, source=None):
+        self.grid = grid
+        self.axes = [tuple(axis) for axis in axes]
+        self.start = np.array([a[0] for a in self.axes])
+        self.step = np.array([a[1] for a in self.axes])
+        self.shape = np.array([a[2] for a in self.axes])
+        self.classes = list(classes)
+        self.source = source
+
+    @classmethod
+    def build(cls, model, axes=DEFAULT_AXES, source=None):
+        """Evaluate ``model`` (a NumpyModel) at every grid point, one sugar plane at a time"""
+        values = [start + step * np.arange(points) for start, step, points in axes]
+        grid = np.empty([points for _, _, points in axes], dtype=np.uint8)
+        fat, sodium = np.meshgrid(values[1], values[2], indexing='ij')
+        plane = np.column_stack([np.zeros(fat.size), fat.ravel(), sodium.ravel()])
+        for i, sugar in enumerate(values[0]):
+            plane[:, 0] = sugar
+            grid[i] = np.argmax(model.predict_proba(plane), axis=1).reshape(fat.shape)
+        return cls(grid, axes, model.classes, source)
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, LATTICE_FILE), self.grid, allow_pickle=False)
+        meta = {'features': list(FEATURES), 'axes': self.axes, 'classes': self.classes, 'source': self.source}
+        with open(os.path.join(directory, META_FILE), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, indent=2)
+            f.write('\n')
+
+    @classmethod
+    def load(cls, directory):
+        with open(os.path.join(directory, META_FILE), encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta['features'] != list(FEATURES):
+            raise ValueError(f"Lattice in {directory} was built for features {meta['features']}")
+        grid = np.load(os.path.join(directory, LATTICE_FILE), mmap_mode='r', allow_pickle=False)
+        return cls(np.asarray(grid), meta['axes'], meta['classes'], meta['source'])
+
+    def lookup(self, X):
+        """``(codes, known)``: class index per row, valid where ``known`` (on the grid, and its cell's corners agree)"""
+        X = np.asarray(X, dtype=np.float64).reshape(-1, len(self.axes))
+        with np.errstate(invalid='ignore'):
+            position = (X - self.start) / self.step
+            inside = ((position >= 0) & (position <= self.shape - 1)).all(axis=1)
+        codes = np.zeros(len(X), dtype=np.uint8)
+        known = np.zeros(len(X), dtype=bool)
+        if inside.any():
+            lo = np.floor(position[inside]).astype(np.intp)
+            hi = np.minimum(lo + 1, self.shape - 1)
+            first = self.grid[lo[:, 0], lo[:, 1], lo[:, 2]]
+            agree = np.ones(len(lo), dtype=bool)
+            for corner in range(1, 8):
+                i = [(hi if corner >> axis & 1 else lo)[:, axis] for axis in range(3)]
+                agree &= self.grid[i[0], i[1], i[2]] == first
+            codes[inside] = first
+            known[inside] = agree
+        return codes, known
+
+    def lookup_one(self, row):
+        """``lookup`` for a single row, None where it isn't known; plain-Python arithmetic, no array temporaries"""
+        lo = []
+        for x, (start, step, points) in zip(row, self.axes):
+            position = (x - start) / step if x == x else -1
+            if not 0 <= position <= points - 1:
+                return None
+            lo.append(int(position))
+        a, b, c = lo
+        # The cell's corners (fewer on the grid's upper faces) as one small copy
+        corners = self.grid[a:a + 2, b:b + 2, c:c + 2].tobytes()
+        return corners[0] if corners.count(corners[0]) == len(corners) else None
+
+    @property
+    def nbytes(self):
+        return self.grid.nbytes
+
+
+class LatticeModel:
+    """NumpyModel interface answered from a lattice, with the model for rows it can't decide"""
+
+    def __init__(self, model, lattice):
+        if list(lattice.classes) != list(model.classes):
+            raise ValueError("Lattice class order doesn't match the model")
+        self.model = model
+        self.lattice = lattice
+        self.classes = model.classes
+
+    def predict_codes(self, X):
+        X = np.asarray(X, dtype=np.float64).reshape(-1, len(FEATURES))
+        codes, known = self.lattice.lookup(X)
+        if not known.all():
+            codes[~known] = np.argmax(self.model.predict_proba(X[~known]), axis=1)
+        return codes
+
+    def predict(self, X):
+        X = np.asarray(X, dtype=np.float64).reshape(-1, len(FEATURES))
+        if len(X) == 1:
+            code = self.lattice.lookup_one(X[0].tolist())
+            if code is None:
+                return self.model.predict(X)
+            return [self.classes[code]]
+        return [self.classes[i] for i in self.predict_codes(X)]
+
+
+def load_for(path, model):
+    """LatticeModel for the model at ``path`` if a matching lattice has been built, else None"""
+    directory = default_dir(path)
+    if not os.path.exists(os.path.join(directory, META_FILE)):
+        return None
+    try:
+        lattice = Lattice.load(directory)
+        if lattice.source != model_id(path):
+            raise ValueError("it was built from another model")
+        return LatticeModel(model, lattice)
+    except (OSError, ValueError) as e:
+        log.warning("Ignoring lattice in %s: %s", directory, e)
+        return None
+
+
+def _rss_kb():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+
+
+def report(path, lattice_dir, sample, seed=0):
+    from catalog import Catalog
+    from numpy_model import NumpyModel
+
+    model = NumpyModel.load(path)
+    rss_before = _rss_kb()
+    lattice = Lattice.load(lattice_dir)
+    fast = LatticeModel(model, lattice)
+    rss_mapped = _rss_kb()
+
+    rng = np.random.default_rng(seed)
+    upper = lattice.start + lattice.step * (lattice.shape - 1)
+    sets = {
+        'catalog': Catalog.from_csv(os.path.join(artifacts.HERE, 'mixed_data.csv')).features,
+        'uniform sample': rng.uniform(lattice.start, upper, (sample, len(FEATURES))),
+    }
+    print(f"lattice {tuple(int(s) for s in lattice.shape)} = {lattice.nbytes / 2**20:.1f} MiB on disk")
+    for name, X in sets.items():
+        expected = np.argmax(model.predict_proba(X), axis=1)
+        got = fast.predict_codes(X)
+        _, known = lattice.lookup(X)
+        print(f"{name:>15}: {np.mean(expected == got):.4%} agreement over {len(X)} rows, "
+              f"{np.mean(~known):.2%} sent to the model")
+
+    row = sets['catalog'][:1]
+    for label, fn in (('model', model.predict), ('lattice', fast.predict)):
+        start = time.perf_counter()
+        for _ in range(2000):
+            fn(row)
+        print(f"{label:>15}: {(time.perf_counter() - start) / 2000 * 1e6:.1f} us per single-row predict")
+    if rss_before is not None:
+        print(f"RSS: +{(rss_mapped - rss_before) / 1024:.1f} MiB after mapping, "
+              f"{(_rss_kb() - rss_before) / 1024:.1f} MiB after the accuracy pass touched pages")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--profile', default='ocr2', help="whose current model to build for")
+    parser.add_argument('--model', default=None, help="bundle directory or .npz; defaults to the profile's current model")
+    parser.add_argument('--out', default=None, help="defaults to artifacts/lattices/<model id>")
+    parser.add_argument('--report', action='store_true', help="report accuracy, size and memory of an existing lattice")
+    parser.add_argument('--sample', type=int, default=100000)
+    args = parser.parse_args()
+
+    from numpy_model import NumpyModel
+
+    path = args.model or artifacts.model_path(args.profile)
+    out = args.out or default_dir(path)
+    if not args.report:
+        start = time.perf_counter()
+        lattice = Lattice.build(NumpyModel.load(path), source=model_id(path))
+        lattice.save(out)
+        print(f"Built {lattice.nbytes / 2**20:.1f} MiB lattice in {time.perf_counter() - start:.1f}s -> {out}")
+    report(path, out, args.sample)
+
+
+if __name__ == '__main__':
+    main()
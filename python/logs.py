@@ -0,0 +1,121 @@
+"""Leveled, non-blocking logging for the Flask services.
+
+``setup`` routes every logger through a ``QueueHandler``: request threads
+only append the record to an in-process queue, and a ``QueueListener``
+thread formats and writes it to stderr. Messages use %-style arguments so
+nothing is rendered unless the level is enabled, and the rendering that is
+needed happens on the listener thread. Objects passed as arguments are
+formatted later, so don't log something the caller is about to mutate.
+
+Verbose per-request payloads (OCR text, parsed nutrition, alternatives) go
+through ``payload``: debug level only, and only for a ``LOG_SAMPLE_RATE``
+fraction of requests.
+
+    LOG_LEVEL=DEBUG LOG_SAMPLE_RATE=0.1 LOG_FORMAT=json python ocr2.py
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import threading
+
+LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+SAMPLE_RATE = float(os.environ.get('LOG_SAMPLE_RATE', 1.0))
+FORMAT = os.environ.get('LOG_FORMAT', 'text')
+
+TEXT_FORMAT = '%(asctime)s %(levelname)s [%(service)s] %(name)s: %(message)s'
+# Third-party loggers that are too chatty at DEBUG (e.g. Pillow logs every plugin import)
+QUIET_LOGGERS = ('PIL', 'urllib3', 'google', 'grpc', 'httpx', 'httpcore', 'asyncio')
+
+_lock = threading.Lock()
+_listener = None
+_service = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, for log shippers"""
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'service': getattr(record, 'service', None),
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class _ServiceFilter(logging.Filter):
+    def filter(self, record):
+        record.service = _service
+        return True
+
+
+class _LazyQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves formatting to the listener thread"""
+
+    def prepare(self, record):
+        # The stock prepare() renders the message here, on the request thread.
+        # The queue never leaves the process, so the record can go as it is.
+        return record
+
+
+def setup(service, level=LEVEL, fmt=FORMAT):
+    """Send all logging through a background writer thread, tagged with ``service``"""
+    global _listener, _service
+    with _lock:
+        _service = service
+        if _listener is not None:
+            return
+        stream = logging.StreamHandler()
+        stream.setFormatter(JsonFormatter() if fmt == 'json' else logging.Formatter(TEXT_FORMAT))
+        stream.addFilter(_ServiceFilter())
+
+        records = queue.SimpleQueue()
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(_LazyQueueHandler(records))
+        root.setLevel(level)
+        for name in QUIET_LOGGERS:
+            logging.getLogger(name).setLevel(max(logging.INFO, root.level))
+
+        _listener = logging.handlers.QueueListener(records, stream, respect_handler_level=True)
+        _listener.start()
+    atexit.register(stop)
+
+
+def restart():
+    """Start a fresh writer thread, e.g. in a worker forked after ``setup`` ran in the parent"""
+    with _lock:
+        if _listener is None:
+            return
+        # The parent's thread doesn't exist in the child; start a new one on the same queue
+        _listener._thread = None
+        _listener.start()
+
+
+def stop():
+    """Flush queued records and stop the writer thread"""
+    global _listener
+    with _lock:
+        listener, _listener = _listener, None
+    if listener is not None:
+        listener.stop()
+
+
+def sampled(rate=None):
+    rate = SAMPLE_RATE if rate is None else rate
+    return rate >= 1 or random.random() < rate
+
+
+def payload(logger, msg, *args):
+    """Debug-log a verbose payload for a sample of requests; free when debug is off"""
+    if logger.isEnabledFor(logging.DEBUG) and sampled():
+        logger.debug(msg, *args)
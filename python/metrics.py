@@ -0,0 +1,230 @@
+"""Thread-safe histograms for service internals, exported in Prometheus format.
+
+Buckets are cumulative upper bounds in the Prometheus style (each count
+includes every observation less than or equal to its bound, with a final
++Inf bucket). Histograms registered in ``REGISTRY`` are rendered by
+``exposition`` for a ``/metrics`` endpoint; ``span`` times a block of code
+into a per-stage histogram, and ``instrument_flask`` adds request timing
+and the endpoint itself to a Flask app.
+
+Under a pre-fork server each worker process counts its own requests, and a
+scrape reaches just one of them. With PROMETHEUS_MULTIPROC_DIR set (as
+gunicorn.conf.py does), ``Registry.share`` has every worker write its
+histograms to ``<dir>/metrics-<pid>.json`` every METRICS_FLUSH_SECONDS, and
+``exposition`` adds up all the files, so ``/metrics`` covers every worker:
+the answering one exactly, the others as of their last write. Files of
+workers that have exited are kept, so totals never go backwards.
+"""
+import bisect
+import glob
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+log = logging.getLogger(__name__)
+
+MULTIPROC_DIR = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+FLUSH_SECONDS = float(os.environ.get('METRICS_FLUSH_SECONDS', 5))
+
+# Powers of two up to 256, for batch sizes
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+# 50 us to 1 s, for in-process waits
+WAIT_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.002, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+# 100 us to 30 s, for request stages from a dict lookup up to a slow OCR or LLM call
+LATENCY_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class Histogram:
+    """Counts of observations per bucket, plus their total and sum"""
+
+    def __init__(self, name, buckets, help='', labels=None):
+        self.name = name
+        self.help = help
+        self.labels = dict(labels or {})
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[i] += 1
+            self._sum += value
+
+    def snapshot(self):
+        """``{'buckets': [[bound, cumulative count], ...], 'count': n, 'sum': total}``, bounds ascending"""
+        with self._lock:
+            counts = list(self._counts)
+            total = self._sum
+        cumulative = []
+        running = 0
+        for bound, count in zip(self.buckets + ('+Inf',), counts):
+            running += count
+            cumulative.append([bound, running])
+        return {'buckets': cumulative, 'count': running, 'sum': total}
+
+    def reset(self):
+        with self._lock:
+            self._counts = [0] * (len(self.buckets) + 1)
+            self._sum = 0.0
+
+
+def _label_text(labels, extra=None):
+    pairs = list(labels.items()) + list((extra or {}).items())
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+def _number(value):
+    return '+Inf' if value == '+Inf' else repr(float(value))
+
+
+class Registry:
+    """Named, labelled histograms for one process"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self.directory = None
+
+    def histogram(self, name, buckets=LATENCY_BUCKETS, help='', **labels):
+        """The histogram for ``name`` and ``labels``, created on first use"""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            metric = self._metrics.get(key)
+            if metric is None:
+                metric = self._metrics[key] = Histogram(name, buckets, help, labels)
+        return metric
+
+    def register(self, histogram):
+        """Export a histogram created elsewhere (e.g. by MicroBatcher)"""
+        with self._lock:
+            self._metrics[(histogram.name, tuple(sorted(histogram.labels.items())))] = histogram
+        return histogram
+
+    def snapshots(self):
+        """``[{'name', 'help', 'labels', 'buckets', 'count', 'sum'}]`` for every histogram"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return [dict(metric.snapshot(), name=metric.name, help=metric.help, labels=metric.labels) for metric in metrics]
+
+    def share(self, directory=MULTIPROC_DIR, interval=FLUSH_SECONDS):
+        """Publish this process's histograms in ``directory`` and include every process's in ``exposition``.
+
+        Call it in each worker after fork: counts inherited from the parent
+        are dropped, so they aren't counted again by every worker.
+        """
+        if not directory:
+            return self
+        os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            metric.reset()
+        self.directory = directory
+        threading.Thread(target=self._flush_every, args=(interval,), name='metrics-flush', daemon=True).start()
+        return self
+
+    def _flush_every(self, interval):
+        while True:
+            time.sleep(interval)
+            self.flush()
+
+    def flush(self):
+        """Write this process's snapshots to its file in ``directory``"""
+        try:
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(self.snapshots(), f)
+            os.replace(tmp, os.path.join(self.directory, f'metrics-{os.getpid()}.json'))
+        except OSError as e:
+            log.warning("Could not write metrics to %s: %s", self.directory, e)
+
+    def _shared_snapshots(self):
+        """Every process's snapshots summed per histogram, this one's up to date"""
+        self.flush()
+        merged = {}
+        for path in glob.glob(os.path.join(self.directory, 'metrics-*.json')):
+            try:
+                with open(path, encoding='utf-8') as f:
+                    snapshots = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for snapshot in snapshots:
+                key = (snapshot['name'], tuple(sorted(snapshot['labels'].items())))
+                total = merged.get(key)
+                if total is None:
+                    merged[key] = snapshot
+                    continue
+                for bucket, (_, count) in zip(total['buckets'], snapshot['buckets']):
+                    bucket[1] += count
+                total['count'] += snapshot['count']
+                total['sum'] += snapshot['sum']
+        return list(merged.values())
+
+    def exposition(self):
+        """All histograms in the Prometheus text format, across processes once ``share`` has been called"""
+        snapshots = self._shared_snapshots() if self.directory else self.snapshots()
+        lines = []
+        seen = set()
+        for snapshot in sorted(snapshots, key=lambda s: (s['name'], sorted(s['labels'].items()))):
+            name, labels = snapshot['name'], snapshot['labels']
+            if name not in seen:
+                seen.add(name)
+                if snapshot['help']:
+                    lines.append(f'# HELP {name} {snapshot["help"]}')
+                lines.append(f'# TYPE {name} histogram')
+            for bound, count in snapshot['buckets']:
+                lines.append(f'{name}_bucket{_label_text(labels, {"le": _number(bound)})} {count}')
+            lines.append(f'{name}_sum{_label_text(labels)} {snapshot["sum"]!r}')
+            lines.append(f'{name}_count{_label_text(labels)} {snapshot["count"]}')
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+@contextmanager
+def span(stage, metric='stage_seconds', registry=REGISTRY, **labels):
+    """Time the enclosed block into ``metric{stage=...}``"""
+    histogram = registry.histogram(metric, LATENCY_BUCKETS, "Time spent in each request stage", stage=stage, **labels)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.observe(time.perf_counter() - start)
+
+
+def instrument_flask(app, service, registry=REGISTRY):
+    """Time every request by endpoint and status, and serve ``registry`` at /metrics"""
+    from flask import g, request
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_start = time.perf_counter()
+
+    @app.after_request
+    def _observe(response):
+        start = g.pop('metrics_start', None)
+        if start is not None and request.endpoint != 'metrics':
+            registry.histogram(
+                'http_request_seconds', LATENCY_BUCKETS, "Request latency by endpoint",
+                service=service, endpoint=request.endpoint or 'unknown', method=request.method,
+                status=str(response.status_code),
+            ).observe(time.perf_counter() - start)
+        return response
+
+    @app.route('/metrics', methods=['GET'], endpoint='metrics')
+    def _metrics():
+        return app.response_class(registry.exposition(), mimetype=None, content_type=CONTENT_TYPE)
+
+    return app
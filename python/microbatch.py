@@ -0,0 +1,122 @@
+"""Dynamic micro-batching of model inference across concurrent requests.
+
+A single-row forward pass costs almost as much as a 64-row one, so paying
+it once per request wastes most of the work under load. ``MicroBatcher``
+queues prediction requests from any number of handler threads (or event
+loop tasks), and a single worker thread flushes whatever is queued as one
+batched call, up to ``max_batch`` rows. By default it doesn't wait for more:
+requests that arrive while a batch is being predicted queue up and make the
+next batch, so batches grow with load and a lone request is answered at
+once. A ``max_wait`` above zero holds each batch open that many seconds for
+stragglers. Each caller gets back exactly its own rows' results.
+"""
+import asyncio
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+from metrics import SIZE_BUCKETS, WAIT_BUCKETS, Histogram
+
+MAX_BATCH = int(os.environ.get('INFERENCE_MAX_BATCH', 64))
+MAX_WAIT = float(os.environ.get('INFERENCE_MAX_WAIT_MS', 0)) / 1000
+
+
+class MicroBatcher:
+    """Coalesces ``predict_fn`` calls; ``predict_fn`` maps an (n, k) array to n results"""
+
+    def __init__(self, predict_fn, max_batch=MAX_BATCH, max_wait=MAX_WAIT):
+        self.predict_fn = predict_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._thread = None
+        self.batch_size = Histogram('inference_batch_rows', SIZE_BUCKETS, "Rows per batched forward pass")
+        self.queue_wait = Histogram('inference_queue_wait_seconds', WAIT_BUCKETS, "Time a request waited to be flushed")
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='microbatch', daemon=True)
+            self._thread.start()
+        return self
+
+    def restart(self):
+        """Start a fresh worker thread and queue, e.g. in a process forked after ``start``"""
+        self._queue = queue.Queue()
+        self._thread = None
+        return self.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def submit(self, rows):
+        """Future for the results of ``rows`` (an (n, k) array-like)"""
+        future = Future()
+        rows = np.asarray(rows, dtype=np.float64)
+        if len(rows) == 0:
+            future.set_result([])
+        else:
+            self._queue.put((rows, future, time.perf_counter()))
+        return future
+
+    def predict(self, rows):
+        return self.submit(rows).result()
+
+    async def predict_async(self, rows):
+        return await asyncio.wrap_future(self.submit(rows))
+
+    def _collect(self, first):
+        """The first request plus whatever else is queued, or arrives before max_wait runs out, up to max_batch rows"""
+        batch = [first]
+        rows = len(first[0])
+        deadline = first[2] + self.max_wait
+        while rows < self.max_batch:
+            timeout = deadline - time.perf_counter()
+            try:
+                item = self._queue.get_nowait() if timeout <= 0 else self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)  # let the main loop see the stop request after this flush
+                break
+            batch.append(item)
+            rows += len(item[0])
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = self._collect(first)
+
+            flushed = time.perf_counter()
+            for _, _, enqueued in batch:
+                self.queue_wait.observe(flushed - enqueued)
+            X = batch[0][0] if len(batch) == 1 else np.concatenate([rows for rows, _, _ in batch])
+            self.batch_size.observe(len(X))
+
+            try:
+                results = self.predict_fn(X)
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            offset = 0
+            for rows, future, _ in batch:
+                future.set_result(results[offset:offset + len(rows)])
+                offset += len(rows)
+
+    def stats(self):
+        return {
+            'max_batch': self.max_batch,
+            'max_wait_ms': self.max_wait * 1000,
+            'batch_size': self.batch_size.snapshot(),
+            'queue_wait_seconds': self.queue_wait.snapshot(),
+        }
@@ -13,25 +13,19 @@ import tensorflow as tf
 from tensorflow import keras
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler, OneHotEncoder
-import re
 import requests
 from flask import Flask, request, jsonify
-from google.cloud import vision
 
 from flask import Flask, request, jsonify
 from flask_cors import CORS
+from batch_ocr import OcrError
+from nutrition_parser import parser, clean_text
+from ocr_backends import ocr_backend
 
 app = Flask(__name__)
-client = vision.ImageAnnotatorClient.from_service_account_file('acc.json')
 CORS(app)  # Enable CORS for localhost frontend
 
 
-nutrition_keys = [
-    "Energy", "Calories", "Protein", "Carbohydrate", "Of which Sugar", "Total Carbohydrate",
-    "Fat", "Total Fat", "Saturated Fat", "Trans Fat", "Cholesterol", "Sodium",
-    "Sugars", "Added Sugars", "Dietary Fiber", "Fiber",
-    "Monounsaturated fatty acids", "Polyunsaturated fatty acids"
-]
 def load_dataset(): 
     csv_path = os.path.join('D:/Desktop/Final_Proj/flask', 'data', 'BiscuitData.csv') 
     df = pd.read_csv(csv_path) 
@@ -143,22 +137,17 @@ def newFun():
     except Exception as e:
         return jsonify({'error': f'Failed to fetch image from URL: {str(e)}'}), 500
 
-    image = vision.Image(content=image_bytes)
-    response = client.document_text_detection(image=image)
-
-    if response.error.message:
-        return jsonify({'error': response.error.message}), 500
+    try:
+        full_text = ocr_backend().detect_text(image_bytes)
+    except OcrError as e:
+        return jsonify({'error': str(e)}), 500
 
-    full_text = response.full_text_annotation.text
-    cleaned_text = re.sub(r'[\s]{2,}', ' ', full_text).strip()
+    cleaned_text = clean_text(full_text)
 
-    nutrition_data = {}
-    for key in nutrition_keys:
-        pattern = rf'{key}[^\d]*([\d.]+)\s*(kcal|g|mg|kJ|%)?'
-        match = re.search(pattern, cleaned_text, re.IGNORECASE)
-        if match:
-            value = match.group(1) + (f" {match.group(2)}" if match.group(2) else '')
-            nutrition_data[key] = value
+    nutrition_data = {
+        key: value + (f" {unit}" if unit else '')
+        for key, (value, unit) in parser.find(cleaned_text).items()
+    }
    
    
     sugar = nutrition_data.get("Sugars")
@@ -0,0 +1,251 @@
+"""Trigram index over catalog brand names, for fuzzy search and autocomplete.
+
+Names are normalized (lowercase, runs of anything but letters and digits
+become one space) and indexed once per distinct name:
+
+- every trigram of each word, padded as ``"  <word> "``, has a posting
+  list of the names that contain it (in name order), and every name keeps
+  its own trigram list, so a query scores only the names sharing its
+  rarer trigrams instead of comparing against every product;
+- every word start of every name is kept in one sorted list of suffixes,
+  so a prefix is found by binary search and matches at any word
+  ("good d" finds "Britannia Good Day Cashew Cookies").
+
+All of it is plain arrays (``arrays``/``from_arrays``), saved with the
+catalog and memory-mapped by every worker.
+"""
+import bisect
+import math
+import re
+
+import numpy as np
+
+ALPHABET = ' abcdefghijklmnopqrstuvwxyz0123456789'
+_CODES = np.zeros(256, dtype=np.int64)
+_CODES[np.frombuffer(ALPHABET.encode('ascii'), dtype=np.uint8)] = np.arange(len(ALPHABET))
+GRAMS = len(ALPHABET) ** 3
+
+# Least share of a query's trigrams a name must contain to count as a fuzzy match
+MIN_SIMILARITY = 0.4
+# Searches try these stricter cut-offs first: the higher one is, the fewer posting lists need reading
+SIMILARITY_STEPS = (0.8, 0.6)
+# Candidates few enough to score from their own trigram lists in one pass instead of list by list
+DIRECT_SCORING = 256
+# Suffixes examined per autocomplete query; ranks the first of these when a prefix is very common
+MAX_PREFIX_SCAN = 2000
+
+ARRAYS = ('norm_offsets', 'norm_data', 'gram_offsets', 'postings', 'gram_counts', 'name_gram_offsets', 'name_grams',
+          'first_rows', 'row_counts', 'suffix_ids', 'suffix_starts')
+
+
+def normalize(text):
+    return ' '.join(re.findall(r'[a-z0-9]+', text.lower()))
+
+
+def trigrams(normalized):
+    """Distinct trigram codes of the words of an already normalized string, as a sorted array"""
+    k = len(ALPHABET)
+    codes = _CODES[np.frombuffer(''.join(f'  {word} ' for word in normalized.split()).encode('ascii'), dtype=np.uint8)]
+    first, second, third = codes[:-2], codes[1:-1], codes[2:]
+    # Windows spanning two padded words are the ones ending in two spaces, which no word's own trigram does
+    grams = np.sort(((first * k + second) * k + third)[(second != 0) | (third != 0)])
+    return grams[np.concatenate(([True], grams[1:] != grams[:-1]))[:len(grams)]]
+
+
+def _ranges(starts, lengths):
+    """Positions ``starts[i]`` up to ``starts[i] + lengths[i]`` for every ``i``, concatenated"""
+    ends = np.cumsum(lengths)
+    return np.arange(ends[-1]) + np.repeat(starts - ends + lengths, lengths)
+
+
+class NameIndex:
+    """Fuzzy and prefix lookup of distinct brand names.
+
+    Results are name ids (as in ``BrandTable``); ``first_rows`` and
+    ``row_counts`` give the first catalog row with each name and how many
+    rows have it. Equal scores are ranked shorter name (fewer trigrams)
+    first, then by that count, then by name id.
+    """
+
+    def __init__(self, norm_offsets, norm_data, gram_offsets, postings, gram_counts, name_gram_offsets, name_grams,
+                 first_rows, row_counts, suffix_ids, suffix_starts):
+        self.norm_offsets = norm_offsets
+        self.norm_data = norm_data
+        self.gram_offsets = gram_offsets
+        self.postings = postings
+        self.gram_counts = gram_counts
+        self.name_gram_offsets = name_gram_offsets
+        self.name_grams = name_grams
+        self.first_rows = first_rows
+        self.row_counts = row_counts
+        self.suffix_ids = suffix_ids
+        self.suffix_starts = suffix_starts
+
+    @classmethod
+    def build(cls, brands):
+        """Index the distinct names of a ``BrandTable``"""
+        normalized = [normalize(brands.name(j)) for j in range(brands.distinct())]
+        encoded = [n.encode('ascii') for n in normalized]
+        norm_offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=norm_offsets[1:])
+        norm_data = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+
+        grams = [trigrams(n) for n in normalized]
+        gram_counts = np.array([len(g) for g in grams], dtype=np.uint16)
+        name_gram_offsets = np.zeros(len(grams) + 1, dtype=np.int64)
+        np.cumsum(gram_counts, out=name_gram_offsets[1:])
+        flat = np.concatenate([np.zeros(0, dtype=np.int64)] + grams).astype(np.uint16)
+        owners = np.repeat(np.arange(len(grams), dtype=np.uint32), gram_counts)
+        # Stable, so each posting list stays in name-id order for the binary searches in ``search``
+        order = np.argsort(flat, kind='stable')
+        postings = owners[order]
+        gram_offsets = np.zeros(GRAMS + 1, dtype=np.int64)
+        np.cumsum(np.bincount(flat, minlength=GRAMS), out=gram_offsets[1:])
+
+        ids = np.asarray(brands.ids)
+        distinct, first_rows, row_counts = np.unique(ids, return_index=True, return_counts=True)
+        first = np.zeros(len(encoded), dtype=np.int64)
+        counts = np.zeros(len(encoded), dtype=np.uint32)
+        first[distinct] = first_rows
+        counts[distinct] = row_counts
+
+        suffixes = [(b[start:], j, int(norm_offsets[j]) + start)
+                    for j, b in enumerate(encoded)
+                    for start in [0] + [m.end() for m in re.finditer(rb' ', b)]]
+        suffixes.sort()
+        suffix_ids = np.array([j for _, j, _ in suffixes], dtype=np.uint32)
+        suffix_starts = np.array([s for _, _, s in suffixes], dtype=np.int64)
+        return cls(norm_offsets, norm_data, gram_offsets, postings, gram_counts, name_gram_offsets, flat, first, counts,
+                   suffix_ids, suffix_starts)
+
+    def arrays(self):
+        return {name: getattr(self, name) for name in ARRAYS}
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        """An index over arrays written by ``arrays()``, used in place (e.g. memory-mapped)"""
+        return cls(*(arrays[name] for name in ARRAYS))
+
+    def __len__(self):
+        return len(self.gram_counts)
+
+    def normalized(self, j):
+        """Name ``j`` as indexed: normalized, in ASCII"""
+        return self.norm_data[self.norm_offsets[j]:self.norm_offsets[j + 1]].tobytes().decode('ascii')
+
+    def _shared(self, candidates, member):
+        """How many of the trigrams flagged in ``member`` each candidate name has"""
+        lengths = self.gram_counts[candidates].astype(np.int64)
+        at = _ranges(self.name_gram_offsets[candidates], lengths)
+        return np.add.reduceat(member[self.name_grams[at]], np.cumsum(lengths) - lengths, dtype=np.int64)
+
+    def _rank(self, ids, scores, limit):
+        """``[(id, score)]`` for the best ``limit`` of ``ids``"""
+        if len(ids) > limit:
+            # Everything tied with the limit-th score stays in, so the tie-breaks decide between them
+            cutoff = np.partition(scores, len(scores) - limit)[len(scores) - limit]
+            keep = scores >= cutoff
+            ids, scores = ids[keep], scores[keep]
+        order = np.lexsort((ids, -self.row_counts[ids].astype(np.int64), self.gram_counts[ids], -scores))[:limit]
+        return list(zip(ids[order].tolist(), scores[order].tolist()))
+
+    def search(self, query, limit=10, min_similarity=MIN_SIMILARITY):
+        """``[(name id, similarity)]`` for names sharing enough trigrams with ``query``, best first.
+
+        Similarity is the share of the query's trigrams found in the name,
+        so a short query ("oreo") matches a long name containing it; among
+        equal shares the shorter name is the closer match. A name with at
+        least ``needed`` of the ``n`` query trigrams contains one of the
+        rarest ``n - needed + 1``, so only their posting lists are read to
+        find candidates. While there are many, the other lists, rarest
+        first, are binary-searched for the candidates still in the running,
+        dropping each as soon as it can no longer reach ``needed`` or the
+        count ``limit`` others already have; the last ``DIRECT_SCORING`` or
+        fewer are scored from their own trigram lists in one pass. The
+        search starts at the stricter ``SIMILARITY_STEPS``, which read fewer
+        lists, and only relaxes towards ``min_similarity`` while it has fewer
+        than ``limit`` matches; every name above a cut-off is found at that
+        cut-off, so the top ``limit`` are the same as a full search's.
+        """
+        grams = trigrams(normalize(query))
+        if not len(grams) or not len(self):
+            return []
+        starts, ends = self.gram_offsets[grams], self.gram_offsets[grams + 1]
+        by_rarity = np.argsort(ends - starts, kind='stable')
+        starts, ends = starts[by_rarity].tolist(), ends[by_rarity].tolist()
+        member = np.zeros(GRAMS, dtype=np.uint8)
+        member[grams] = 1
+
+        steps = [t for t in SIMILARITY_STEPS if t > min_similarity] + [min_similarity]
+        for cutoff in steps:
+            needed = max(1, math.ceil(cutoff * len(grams) - 1e-9))
+            probe = len(grams) - needed + 1
+            # Sorting and counting runs beats np.unique's hashing here; a name is once per list, so a run is lists holding it
+            ids = np.sort(np.concatenate([self.postings[s:e] for s, e in zip(starts[:probe], ends[:probe])]))
+            bounds = np.flatnonzero(np.concatenate(([True], ids[1:] != ids[:-1], [True])))[:len(ids) + 1]
+            candidates, shared = ids[bounds[:-1]], np.diff(bounds)
+            floor = needed
+            for k in range(probe, len(grams)):
+                if len(candidates) <= DIRECT_SCORING:
+                    if len(candidates):
+                        shared = self._shared(candidates, member)
+                    break
+                # Once ``limit`` candidates share ``floor`` trigrams, a name that can't reach ``floor`` can't make the
+                # top; the floor only rises, so it is refreshed every few lists rather than paid for on each
+                if len(shared) > limit and (k - probe) % 4 == 0:
+                    floor = max(floor, np.partition(shared, len(shared) - limit)[len(shared) - limit])
+                alive = shared + (len(grams) - k) >= floor
+                if not alive.all():
+                    candidates, shared = candidates[alive], shared[alive]
+                posting = self.postings[starts[k]:ends[k]]
+                if not len(candidates) or not len(posting):
+                    continue
+                at = np.minimum(np.searchsorted(posting, candidates), len(posting) - 1)
+                shared += posting[at] == candidates
+            hits = np.flatnonzero(shared >= needed)
+            if len(hits) >= limit or cutoff == steps[-1]:
+                return self._rank(candidates[hits], shared[hits] / len(grams), limit)
+
+    def covered(self, text, min_coverage):
+        """``(name ids, shared trigrams)`` of the names with at least ``min_coverage`` of their trigrams in ``text``.
+
+        The converse of ``search``, for finding known names inside a longer
+        text such as a label's OCR output: the text's posting lists are
+        counted once, so the cost is what those lists hold.
+        """
+        grams = trigrams(normalize(text))
+        if not len(grams) or not len(self):
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        starts = self.gram_offsets[grams]
+        at = _ranges(starts, self.gram_offsets[grams + 1] - starts)
+        shared = np.bincount(self.postings[at], minlength=len(self))
+        hits = np.flatnonzero((shared > 0) & (shared >= np.ceil(min_coverage * self.gram_counts - 1e-9)))
+        return hits, shared[hits]
+
+    def _suffix(self, e, length=None):
+        start = self.suffix_starts[e]
+        end = self.norm_offsets[self.suffix_ids[e] + 1]
+        if length is not None:
+            end = min(end, start + length)
+        return self.norm_data[start:end].tobytes()
+
+    def complete(self, prefix, limit=10):
+        """``[(name id, 1.0 if the name starts with prefix else 0.5)]`` for names with a word starting with ``prefix``"""
+        prefix = normalize(prefix).encode('ascii')
+        if not prefix:
+            return []
+        # Suffixes cut to the prefix's length sort as the prefix itself exactly where they start with it
+        entries = range(len(self.suffix_ids))
+        lo = bisect.bisect_left(entries, prefix, key=lambda e: self._suffix(e, len(prefix)))
+        hi = bisect.bisect_right(entries, prefix, lo=lo, key=lambda e: self._suffix(e, len(prefix)))
+        if lo == hi:
+            return []
+        hi = min(hi, lo + MAX_PREFIX_SCAN)
+        ids = self.suffix_ids[lo:hi].astype(np.int64)
+        scores = np.where(self.suffix_starts[lo:hi] == self.norm_offsets[ids], 1.0, 0.5)
+        # A name can have several words with the prefix; keep its best score
+        order = np.lexsort((-scores, ids))
+        ids, scores = ids[order], scores[order]
+        first = np.ones(len(ids), dtype=bool)
+        first[1:] = ids[1:] != ids[:-1]
+        return self._rank(ids[first], scores[first], limit)
@@ -0,0 +1,182 @@
+"""Pure-NumPy forward pass for the food classification model.
+
+``export_model`` reads the Keras .h5 file (through h5py, no TensorFlow),
+the fitted StandardScaler and the OneHotEncoder and writes everything the
+forward pass needs into one .npz file; ``export_bundle`` writes the same
+arrays as a versioned bundle (see bundle.py). ``NumpyModel`` then serves
+predictions from either with nothing heavier than NumPy imported.
+
+The arithmetic mirrors Keras on CPU: StandardScaler in float64, then each
+Dense layer as a float32 ``x @ kernel + bias`` followed by its activation.
+"""
+import json
+import os
+
+import numpy as np
+
+from bundle import BundleError, bundle_id, read_bundle, write_bundle
+
+SUPPORTED_ACTIVATIONS = ("linear", "relu", "softmax")
+
+
+def _relu(x):
+    return np.maximum(x, 0)
+
+
+def _softmax(x):
+    e = np.exp(x - x.max(axis=-1, keepdims=True))
+    return e / e.sum(axis=-1, keepdims=True)
+
+
+_ACTIVATIONS = {"linear": lambda x: x, "relu": _relu, "softmax": _softmax}
+
+
+def _dense_layers(h5_path):
+    """(kernel, bias, activation) for each Dense layer of a saved Sequential model"""
+    import h5py
+
+    with h5py.File(h5_path, 'r') as f:
+        config = json.loads(f.attrs['model_config'])
+        layers = []
+        for layer in config['config']['layers']:
+            kind, cfg = layer['class_name'], layer['config']
+            if kind in ('InputLayer', 'Dropout'):
+                continue  # no-ops at inference time
+            if kind != 'Dense':
+                raise ValueError(f"Unsupported layer type for NumPy export: {kind}")
+            if cfg['activation'] not in SUPPORTED_ACTIVATIONS:
+                raise ValueError(f"Unsupported activation for NumPy export: {cfg['activation']}")
+
+            group = f['model_weights'][cfg['name']]
+            weights = {}
+
+            def collect(name, obj):
+                if isinstance(obj, h5py.Dataset):
+                    weights[name.rsplit('/', 1)[-1]] = obj[()]
+
+            group.visititems(collect)
+            bias = weights['bias'] if cfg.get('use_bias', True) else np.zeros(cfg['units'], np.float32)
+            layers.append((weights['kernel'].astype(np.float32), bias.astype(np.float32), cfg['activation']))
+    return layers
+
+
+def model_arrays(h5_path, scaler_path, encoder_path):
+    """``(arrays, classes, activations)`` for the model, scaler and encoder on disk"""
+    import joblib
+
+    scaler = joblib.load(scaler_path)
+    encoder = joblib.load(encoder_path)
+    layers = _dense_layers(h5_path)
+
+    arrays = {
+        'scaler_mean': np.asarray(scaler.mean_, dtype=np.float64),
+        'scaler_scale': np.asarray(scaler.scale_, dtype=np.float64),
+    }
+    for i, (kernel, bias, _) in enumerate(layers):
+        arrays[f'kernel_{i}'] = kernel
+        arrays[f'bias_{i}'] = bias
+    classes = [str(c) for c in encoder.categories_[0]]
+    return arrays, classes, [act for _, _, act in layers]
+
+
+def export_model(h5_path, scaler_path, encoder_path, out_path):
+    """Write the model, scaler and encoder into a single NumPy weights file"""
+    arrays, classes, activations = model_arrays(h5_path, scaler_path, encoder_path)
+    arrays['classes'] = np.asarray(classes, dtype=str)
+    arrays['activations'] = np.asarray(activations, dtype=str)
+
+    with open(out_path, 'wb') as f:
+        np.savez(f, **arrays)
+    print(f"Exported NumPy model weights to {out_path}")
+
+
+def export_bundle(h5_path, scaler_path, encoder_path, out_dir, manifest):
+    """Write the model, scaler and encoder as a bundle; ``manifest`` adds the training metadata"""
+    arrays, classes, activations = model_arrays(h5_path, scaler_path, encoder_path)
+    manifest = dict(manifest, classes=classes, activations=activations)
+    written = write_bundle(out_dir, arrays, manifest)
+    print(f"Exported model bundle to {out_dir}")
+    return written
+
+
+class NumpyModel:
+    """Scaler + dense network + label decoding, evaluated with NumPy only"""
+
+    def __init__(self, mean, scale, layers, classes, manifest=None, bundle_id=None):
+        self.mean = mean
+        self.scale = scale
+        self.layers = layers
+        self.classes = classes
+        self.manifest = manifest
+        self.bundle_id = bundle_id
+
+    @classmethod
+    def load(cls, path, verify=True):
+        """Load a bundle directory or a legacy .npz weights file"""
+        if os.path.isdir(path):
+            manifest, data = read_bundle(path, verify=verify)
+            layers = [
+                (data[f'kernel_{i}'], data[f'bias_{i}'], _ACTIVATIONS[act])
+                for i, act in enumerate(manifest['activations'])
+            ]
+            return cls(data['scaler_mean'], data['scaler_scale'], layers, list(manifest['classes']),
+                       manifest, bundle_id(path))
+
+        with np.load(path) as data:
+            activations = [str(a) for a in data['activations']]
+            layers = [
+                (data[f'kernel_{i}'], data[f'bias_{i}'], _ACTIVATIONS[act])
+                for i, act in enumerate(activations)
+            ]
+            return cls(data['scaler_mean'], data['scaler_scale'], layers, [str(c) for c in data['classes']])
+
+    def check(self, features, limits, profile=None):
+        """Refuse a bundle trained for another service: other profile, feature order or labelling limits"""
+        if self.manifest is None:
+            return
+        if profile is not None and self.manifest['profile'] != profile:
+            raise BundleError(f"Model {self.manifest['version']} was trained as profile {self.manifest['profile']!r}, "
+                              f"service is {profile!r}")
+        if list(self.manifest['features']) != list(features):
+            raise BundleError(f"Model expects features {self.manifest['features']}, service sends {list(features)}")
+        trained_limits = self.manifest['rules']['limits']
+        if any(trained_limits.get(f) != limits.get(f) for f in features):
+            raise BundleError(f"Model {self.manifest['version']} was labelled with limits {trained_limits}, "
+                              f"service uses {limits}")
+
+    def describe(self):
+        """Version details a deploy can compare across workers"""
+        if self.manifest is None:
+            return {'version': None, 'bundle_id': None}
+        return {
+            'version': self.manifest['version'],
+            'bundle_id': self.bundle_id,
+            'profile': self.manifest['profile'],
+            'created': self.manifest['created'],
+            'dataset': self.manifest['dataset'],
+            'metrics': self.manifest['metrics'],
+        }
+
+    def predict_proba(self, X):
+        """Class probabilities for raw (sugar, fat, sodium) rows"""
+        x = ((np.asarray(X, dtype=np.float64) - self.mean) / self.scale).astype(np.float32)
+        for kernel, bias, activation in self.layers:
+            x = activation(x @ kernel + bias)
+        return x
+
+    def predict(self, X):
+        """Predicted category label for each row"""
+        indices = np.argmax(self.predict_proba(X), axis=1)
+        return [self.classes[i] for i in indices]
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export the Keras model, scaler and encoder to a NumPy weights file")
+    parser.add_argument('--model', default='food_classification_model.h5')
+    parser.add_argument('--scaler', default='scaler.pkl')
+    parser.add_argument('--encoder', default='encoder.pkl')
+    parser.add_argument('--out', default='food_classification_model.npz')
+    args = parser.parse_args()
+    export_model(args.model, args.scaler, args.encoder, args.out)
@@ -0,0 +1,130 @@
+"""Single-pass extraction of nutrient values from OCR'd label text.
+
+The services used to loop over every nutrient name, build an f-string regex
+and search the whole text with it. ``NutritionParser`` compiles all names
+(plus aliases) into one alternation instead, so a single left-to-right scan
+finds the first mention of every nutrient, and each nutrient then takes the
+first number after that mention - the same answer the per-key searches gave,
+including names found inside longer ones ("Fat" inside "Total Fat").
+"""
+import logging
+import re
+
+log = logging.getLogger(__name__)
+
+NUTRITION_KEYS = [
+    "Energy", "Calories", "Protein", "Carbohydrate", "Of which Sugar", "Total Carbohydrate",
+    "Fat", "Total Fat", "Saturated Fat", "Trans Fat", "Cholesterol", "Sodium",
+    "Sugars", "Added Sugars", "Dietary Fiber", "Fiber",
+    "Monounsaturated fatty acids", "Polyunsaturated fatty acids"
+]
+
+# Alternative label spellings, reported under the key they stand for
+ALIASES = {
+    "Total Sugar": "Sugars",
+    "Saturates": "Saturated Fat",
+    "Dietary Fibre": "Dietary Fiber",
+    "Fibre": "Fiber",
+}
+
+# Where each model feature is read from, in order of preference
+FEATURE_KEYS = {
+    "sugar": ("Sugars", "Total Sugars", "Of which Sugar"),
+    "fat": ("Total Fat", "Fat"),
+    "sodium": ("Sodium",),
+}
+
+UNITS = r'kcal|g|mg|kJ|%'
+_WHITESPACE = re.compile(r'[\s]{2,}')
+_VALUE = re.compile(rf'(\d[\d.]*)\s*({UNITS})?', re.IGNORECASE)
+
+
+def clean_text(text):
+    """Collapse runs of whitespace the way the OCR handlers always have"""
+    return _WHITESPACE.sub(' ', text).strip()
+
+
+class NutritionParser:
+    """Compiled matcher for a fixed set of nutrient names and aliases"""
+
+    def __init__(self, keys=NUTRITION_KEYS, aliases=ALIASES):
+        self.keys = list(keys)
+        phrases = {key.lower(): key for key in self.keys}
+        for alias, key in aliases.items():
+            phrases.setdefault(alias.lower(), key)
+
+        # A phrase occurrence also stands for every other phrase that is a
+        # prefix of it, since only the longest phrase is reported per position.
+        self._hits = {}
+        for phrase in phrases:
+            keys_here = {phrases[other] for other in phrases if phrase.startswith(other)}
+            self._hits[phrase] = [k for k in self.keys if k in keys_here]
+
+        alternation = '|'.join(re.escape(p) for p in sorted(phrases, key=len, reverse=True))
+        self._names = re.compile(alternation)
+        self._names_ci = re.compile(alternation, re.IGNORECASE)
+
+    def find(self, text):
+        """Map each key to ``(value_str, unit)`` for the first number after its first mention"""
+        # Matching against a lower-cased copy lets the regex engine skip ahead
+        # on first characters; fall back to IGNORECASE if lowering shifted offsets.
+        folded = text.lower()
+        names = self._names
+        if len(folded) != len(text):
+            folded, names = text, self._names_ci
+
+        # Restarting one character past each hit finds overlapping mentions too
+        hits = self._hits
+        search = names.search
+        first = {}
+        wanted = len(self.keys)
+        m = search(folded)
+        while m is not None and len(first) < wanted:
+            end = m.end()
+            for key in hits[folded[m.start():end].lower()]:
+                if key not in first:
+                    first[key] = end
+            m = search(folded, m.start() + 1)
+
+        found = {}
+        value_at = {}
+        for key, end in first.items():
+            if end not in value_at:
+                value_at[end] = _VALUE.search(text, end)
+            m = value_at[end]
+            if m:
+                found[key] = (m.group(1), m.group(2) or '')
+        return {key: found[key] for key in self.keys if key in found}
+
+    def parse(self, text):
+        """Numeric nutrition data as ``{key: {'value': float, 'unit': str}}``"""
+        nutrition_data = {}
+        for key, (value_str, unit) in self.find(text).items():
+            try:
+                nutrition_data[key] = {'value': float(value_str), 'unit': unit.strip()}
+            except ValueError:
+                log.warning("Could not convert value '%s' for %s to float.", value_str, key)
+        return nutrition_data
+
+
+def nutrient_features(nutrition_data):
+    """Pull (sugar, fat, sodium) out of parsed nutrition data, defaulting to 0.0"""
+    values = []
+    for feature, keys in FEATURE_KEYS.items():
+        value = 0.0
+        for key in keys:
+            info = nutrition_data.get(key)
+            if info and 'value' in info:
+                value = info['value']
+                break
+        else:
+            if feature == "sodium":
+                for key, info in nutrition_data.items():
+                    if "sodium" in key.lower() and isinstance(info, dict) and 'value' in info:
+                        value = info['value']
+                        break
+        values.append(value)
+    return tuple(values)
+
+
+parser = NutritionParser()
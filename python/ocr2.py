@@ -1,232 +1,419 @@
-import os
-import pandas as pd
-import numpy as np
-import tensorflow as tf
-from tensorflow import keras
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import StandardScaler, OneHotEncoder
-import re
-from flask import Flask, request, jsonify
-from google.cloud import vision
-from flask_cors import CORS
-import joblib
-
-app = Flask(__name__)
-client = vision.ImageAnnotatorClient.from_service_account_file('acc.json')
-CORS(app)
-
-MODEL_PATH = 'food_classification_model.h5'
-SCALER_PATH = 'scaler.pkl'
-ENCODER_PATH = 'encoder.pkl'
-CSV_PATH = os.path.join(os.path.dirname(__file__), 'mixed_data.csv')
-
-nutrition_keys = [
-    "Energy", "Calories", "Protein", "Carbohydrate", "Of which Sugar", "Total Carbohydrate",
-    "Fat", "Total Fat", "Saturated Fat", "Trans Fat", "Cholesterol", "Sodium",
-    "Sugars", "Added Sugars", "Dietary Fiber", "Fiber",
-    "Monounsaturated fatty acids", "Polyunsaturated fatty acids"
-]
-
-safe_limits = {
-    "TOTAL SUGARS": 22.5,
-    "TOTAL FAT": 17,
-    "SODIUM(mg)": 600
-}
-
-def load_dataset():
-    df = pd.read_csv(CSV_PATH, encoding='ISO-8859-1')
-    return df
-
-def classify_food(row):
-    sugar = row["TOTAL SUGARS"]
-    fat = row["TOTAL FAT"]
-    sodium = row["SODIUM(mg)"]
-
-    sugar_exceed = (sugar - safe_limits["TOTAL SUGARS"]) / safe_limits["TOTAL SUGARS"] if sugar > safe_limits["TOTAL SUGARS"] else 0
-    fat_exceed = (fat - safe_limits["TOTAL FAT"]) / safe_limits["TOTAL FAT"] if fat > safe_limits["TOTAL FAT"] else 0
-    sodium_exceed = (sodium - safe_limits["SODIUM(mg)"]) / safe_limits["SODIUM(mg)"] if sodium > safe_limits["SODIUM(mg)"] else 0
-
-    exceedances = [sugar_exceed, fat_exceed, sodium_exceed]
-    exceed_count = sum(e > 0 for e in exceedances)
-    high_exceed_count = sum(e > 0.3 for e in exceedances)
-
-    if exceed_count == 0:
-        return "Safe", []
-    elif exceed_count == 1:
-        return "OK", []
-    elif exceed_count >= 2 and high_exceed_count < 2:
-        return "Harmful", []
-    elif exceed_count == 3 or high_exceed_count >= 2:
-        return "Very Harmful", []
-
-# Training logic
-if not os.path.exists(MODEL_PATH) or not os.path.exists(SCALER_PATH) or not os.path.exists(ENCODER_PATH):
-    data = load_dataset()
-    data = data.replace(np.nan, 0)
-
-    data["TOTAL SUGARS"] = data["TOTAL SUGARS"].astype(float)
-    data["TOTAL FAT"] = data["TOTAL FAT"].astype(float)
-    data["SODIUM(mg)"] = data["SODIUM(mg)"].astype(float)
-
-    data[["Category", "_"]] = data.apply(classify_food, axis=1, result_type="expand")
-
-    X = data[["TOTAL SUGARS", "TOTAL FAT", "SODIUM(mg)"]].values
-    y = data["Category"].values
-
-    encoder = OneHotEncoder(sparse_output=False)
-    y_encoded = encoder.fit_transform(y.reshape(-1, 1))
-    joblib.dump(encoder, ENCODER_PATH)
-
-    X_train, X_test, y_train, y_test = train_test_split(X, y_encoded, test_size=0.2, random_state=42)
-
-    scaler = StandardScaler()
-    X_train = scaler.fit_transform(X_train)
-    X_test = scaler.transform(X_test)
-    joblib.dump(scaler, SCALER_PATH)
-
-    model = keras.Sequential([
-        keras.layers.Dense(16, activation="relu", input_shape=(3,)),
-        keras.layers.Dropout(0.2),
-        keras.layers.Dense(12, activation="relu"),
-        keras.layers.Dense(8, activation="relu"),
-        keras.layers.Dense(4, activation="softmax")
-    ])
-
-    model.compile(optimizer="adam", loss="categorical_crossentropy", metrics=["accuracy"])
-    model.fit(X_train, y_train, epochs=50, batch_size=8, validation_data=(X_test, y_test), verbose=0)
-    model.save(MODEL_PATH)
-    print(f"Trained model saved to {MODEL_PATH}")
-else:
-    model = keras.models.load_model(MODEL_PATH)
-    scaler = joblib.load(SCALER_PATH)
-    encoder = joblib.load(ENCODER_PATH)
-    print(f"Loaded trained model from {MODEL_PATH}")
-
-@app.route("/ocr", methods=["POST"])
-def newFun():
-    print("Inside flask backend")
-    if 'image' not in request.files:
-        return jsonify({'error': 'No image file provided'}), 400
-
-    image_file = request.files['image']
-    if image_file.filename == '':
-        return jsonify({'error': 'No selected image file'}), 400
-
-    try:
-        image_bytes = image_file.read()
-        image = vision.Image(content=image_bytes)
-        response = client.document_text_detection(image=image)
-
-        if response.error.message:
-            return jsonify({'error': response.error.message}), 500
-
-        full_text = response.full_text_annotation.text
-        cleaned_text = re.sub(r'[\s]{2,}', ' ', full_text).strip()
-
-        nutrition_data = {}
-        for key in nutrition_keys:
-            pattern = rf'{key}[^\d]*([\d.]+)\s*(kcal|g|mg|kJ|%)?'
-            match = re.search(pattern, cleaned_text, re.IGNORECASE)
-            if match:
-                value_str = match.group(1)
-                try:
-                    value = float(value_str)
-                    unit = match.group(2) if match.group(2) else ''
-                    nutrition_data[key] = {'value': value, 'unit': unit.strip()}
-                except ValueError:
-                    print(f"Warning: Could not convert value '{value_str}' for {key} to float.")
-
-        print("Extracted Nutrition Data:", nutrition_data)
-
-        sugar_info = nutrition_data.get("Sugars") or nutrition_data.get("Total Sugars") or nutrition_data.get("Of which Sugar")
-        fat_info = nutrition_data.get("Total Fat") or nutrition_data.get("Fat")
-        sodium_value = 0.0
-        if "Sodium" in nutrition_data and isinstance(nutrition_data["Sodium"], dict) and 'value' in nutrition_data["Sodium"]:
-            sodium_value = nutrition_data["Sodium"]["value"]
-        elif any("sodium" in k.lower() for k in nutrition_data):
-            for key, value_dict in nutrition_data.items():
-                if "sodium" in key.lower() and isinstance(value_dict, dict) and 'value' in value_dict:
-                    sodium_value = value_dict['value']
-                    break
-
-        sugar_value = sugar_info['value'] if sugar_info and 'value' in sugar_info else 0.0
-        fat_value = fat_info['value'] if fat_info and 'value' in fat_info else 0.0
-
-        new_data = np.array([[sugar_value, fat_value, sodium_value]])
-        new_data_scaled = scaler.transform(new_data)
-        prediction = model.predict(new_data_scaled)
-        predicted_index = np.argmax(prediction)
-        predicted_label_encoded = np.zeros_like(prediction)
-        predicted_label_encoded[0][predicted_index] = 1
-        predicted_label = encoder.inverse_transform(predicted_label_encoded)[0][0]
-
-        # Load and prepare dataset
-        dataset = load_dataset()
-        dataset = dataset.dropna(subset=["TOTAL SUGARS", "TOTAL FAT", "SODIUM(mg)"]).copy()
-        dataset["TOTAL SUGARS"] = dataset["TOTAL SUGARS"].astype(float)
-        dataset["TOTAL FAT"] = dataset["TOTAL FAT"].astype(float)
-        dataset["SODIUM(mg)"] = dataset["SODIUM(mg)"].astype(float)
-
-        print("sugar",sugar_value)
-
-        print("fat",fat_value)
-
-        print("sodium",sodium_value)
-
-        # Filter items with lower sugar, fat, sodium
-        alternatives = []
-        if predicted_label != "Safe":
-            healthier_items = dataset[
-                (dataset["TOTAL SUGARS"] <= sugar_value) &
-                (dataset["TOTAL FAT"] <= fat_value) &
-                (dataset["SODIUM(mg)"] <= sodium_value)
-            ].copy()
-
-        
-
-            healthier_items["health_score"] = (
-                healthier_items["TOTAL SUGARS"] +
-                healthier_items["TOTAL FAT"] +
-                (healthier_items["SODIUM(mg)"] / 100)
-            )
-
-            print("healthier_items",healthier_items)
-
-            top_alternatives = healthier_items.sort_values(by="health_score").head(3)
-
-
-            for _, row in top_alternatives.iterrows():
-                temp_row = pd.Series({
-                    "TOTAL SUGARS": row.get("TOTAL SUGARS", 0.0),
-                    "TOTAL FAT": row.get("TOTAL FAT", 0.0),
-                    "SODIUM(mg)": row.get("SODIUM(mg)", 0.0)
-                })
-                category, _ = classify_food(temp_row)
-
-                alternatives.append({
-                    "Brand Name": row.get("Brand Name", "Unknown"),
-                    "ENERGY(kcal)": row.get("ENERGY(kcal)", "N/A"),
-                    "PROTEIN": row.get("PROTEIN", "N/A"),
-                    "CARBOHYDRATE": row.get("CARBOHYDRATE", "N/A"),
-                    "TOTAL SUGARS": row.get("TOTAL SUGARS", "N/A"),
-                    "TOTAL FAT": row.get("TOTAL FAT", "N/A"),
-                    "SODIUM(mg)": row.get("SODIUM(mg)", "N/A"),
-                    "Category": category,
-                    "img": row.get("img", None)
-                })
-
-        print("nutrition_data",nutrition_data)
-        print("alternatives",alternatives)
-
-        return jsonify({
-            "message": f"Model Prediction: {predicted_label}",
-            "nutrition_data": nutrition_data,
-            "alternatives": alternatives
-        }), 200
-
-    except Exception as e:
-        print(f"Error processing image: {e}")
-        return jsonify({'error': f'Failed to process image: {str(e)}'}), 500
-
-if __name__ == "__main__":
+import logging
+import math
+import os
+import numpy as np
+from flask import Flask, request, jsonify
+from flask_cors import CORS
+from artifacts import model_path
+from batch_ocr import MAX_BATCH_IMAGES, OcrError, reset_clients
+from catalog import NAME_COLUMN, CatalogStore
+from label_match import LabelMatcher, stored_nutrition
+from microbatch import MicroBatcher
+from lattice import load_for
+from logs import payload, restart as restart_logging, setup
+from metrics import REGISTRY, instrument_flask, span
+from numpy_model import NumpyModel
+from ocr_backends import ocr_backend
+from nutrition_parser import parser, clean_text, nutrient_features
+from ocr_cache import OcrCache
+from phash_cache import PerceptualCache, image_hash
+from preprocess import Preprocessor, requested
+from product_types import PRODUCT_TYPE_COLUMN, infer, infer_text
+from rules import EXCEEDANCE_LIMITS, EXCEEDANCE_RULES, FEATURES, RuleSet
+
+setup('ocr2')
+log = logging.getLogger('ocr2')
+
+app = Flask(__name__)
+CORS(app)
+instrument_flask(app, 'ocr2')
+
+CSV_PATH = os.path.join(os.path.dirname(__file__), 'mixed_data.csv')
+
+safe_limits = EXCEEDANCE_LIMITS
+
+food_rules = RuleSet(safe_limits, "exceedance", EXCEEDANCE_RULES)
+
+def classify_food(row):
+    return food_rules.classify(row)
+
+# Trained offline by train.py; serving never imports TensorFlow, sklearn or pandas
+MODEL_PATH = model_path('ocr2')
+model = NumpyModel.load(MODEL_PATH)
+model.check(FEATURES, safe_limits, 'ocr2')
+log.info("Loaded trained model from %s", MODEL_PATH)
+
+# With a lattice built by `python lattice.py`, classifying is an array lookup
+classifier = load_for(MODEL_PATH, model) or model
+if classifier is not model:
+    log.info("Classifying from the %.1f MiB prediction lattice", classifier.lattice.nbytes / 2**20)
+
+# Concurrent scans share batched forward passes instead of one 1x3 predict each
+predictor = MicroBatcher(classifier.predict).start()
+REGISTRY.register(predictor.batch_size)
+REGISTRY.register(predictor.queue_wait)
+
+# Parsed once here and refreshed in the background when the CSV changes
+catalog_store = CatalogStore(CSV_PATH).start()
+
+# Identical image bytes skip the Vision call entirely
+ocr_cache = OcrCache()
+
+# Re-photographed packs reuse the earlier nutrition_data and prediction (PHASH_CACHE=1)
+phash_cache = PerceptualCache()
+
+# Downscaled grayscale copies of uploads are what Vision actually receives
+preprocessor = Preprocessor()
+
+# Labels of products the catalog already has are answered from their stored rows
+fast_path = LabelMatcher()
+
+def after_fork():
+    """Per-worker setup when a pre-fork server (gunicorn --preload) forks this module's process.
+
+    Models, the lattice and the catalog mapping are inherited as they are;
+    threads aren't, and gRPC channels mustn't be, so those are recreated.
+    Metrics are shared with the other workers through
+    PROMETHEUS_MULTIPROC_DIR when it is set.
+    """
+    restart_logging()
+    reset_clients()
+    predictor.restart()
+    catalog_store.start()
+    REGISTRY.share()
+
+def find_alternatives(catalog, sugar_value, fat_value, sodium_value, product_type=None, positions=None):
+    # Filter items with lower sugar, fat, sodium, among products of the same type when it's known,
+    # unless they were worked out ahead of time (``positions``)
+    if positions is None:
+        positions = catalog.alternatives(sugar_value, fat_value, sodium_value, k=3, product_type=product_type)
+    rows = [catalog.record(i) for i in positions]
+    categories = food_rules.classify_many(rows)
+
+    alternatives = []
+    for row, category in zip(rows, categories):
+        alternatives.append({
+            "Brand Name": row.get("Brand Name", "Unknown"),
+            "ENERGY(kcal)": row.get("ENERGY(kcal)", "N/A"),
+            "PROTEIN": row.get("PROTEIN", "N/A"),
+            "CARBOHYDRATE": row.get("CARBOHYDRATE", "N/A"),
+            "TOTAL SUGARS": row.get("TOTAL SUGARS", "N/A"),
+            "TOTAL FAT": row.get("TOTAL FAT", "N/A"),
+            "SODIUM(mg)": row.get("SODIUM(mg)", "N/A"),
+            "Product Type": row.get(PRODUCT_TYPE_COLUMN),
+            "Category": category,
+            "img": row.get("img", None)
+        })
+    return alternatives
+
+def build_result(catalog, nutrition_data, predicted_label, product_type=None, matched_product=None, positions=None):
+    sugar_value, fat_value, sodium_value = nutrient_features(nutrition_data)
+    log.debug("sugar=%s fat=%s sodium=%s", sugar_value, fat_value, sodium_value)
+
+    # Products of an unknown type, or one the catalog doesn't carry, are compared against everything
+    shard = catalog.shard(product_type)
+    alternatives = []
+    if predicted_label != "Safe":
+        with span('alternatives', shard=shard):
+            alternatives = find_alternatives(catalog, sugar_value, fat_value, sodium_value, product_type, positions)
+
+    payload(log, "nutrition_data=%s alternatives=%s", nutrition_data, alternatives)
+
+    return {
+        "message": f"Model Prediction: {predicted_label}",
+        "nutrition_data": nutrition_data,
+        "product_type": shard if shard != 'all' else None,
+        "matched_product": matched_product,
+        "alternatives": alternatives
+    }
+
+def matched_result(catalog, row, product_type=None):
+    """``(label, result)`` for a scan of catalog row ``row``, built once per product from its stored values"""
+    def build():
+        record = catalog.record(row)
+        nutrition_data = stored_nutrition(record)
+        label = classifier.predict(np.array([nutrient_features(nutrition_data)], dtype=np.float64))[0]
+        own_type = record[PRODUCT_TYPE_COLUMN]
+        # Alternatives within the product's own shard are precomputed; any other shard is searched as usual
+        shard = catalog.shard(product_type or own_type)
+        positions = catalog.stored_alternatives(row) if shard == catalog.shard(own_type) else None
+        return label, build_result(catalog, nutrition_data, label, product_type or own_type,
+                                   matched_product=record[NAME_COLUMN], positions=positions)
+    return fast_path.result(catalog, (row, product_type), build)
+
+def product_type_hint(product_type=None, product_name=None):
+    """Product type the client gave (``product_type``) or implied (``product_name``), if any"""
+    if product_type:
+        return product_type
+    return infer(product_name, None) if product_name else None
+
+SEARCH_FIELDS = ["ENERGY(kcal)", "PROTEIN", "CARBOHYDRATE", "TOTAL SUGARS", "TOTAL FAT", "SODIUM(mg)"]
+MAX_SEARCH_RESULTS = 50
+
+def search_limit(value, default=10):
+    try:
+        return min(max(int(value), 1), MAX_SEARCH_RESULTS)
+    except (TypeError, ValueError):
+        return default
+
+def search_products(query, limit=10):
+    """Catalog products whose brand name fuzzily matches ``query``, best first"""
+    catalog = catalog_store.get()
+    index = catalog.names_index()
+    with span('name_search'):
+        matches = index.search(query, limit)
+    rows = [catalog.record(int(index.first_rows[j])) for j, _ in matches]
+    categories = food_rules.classify_many(rows)
+
+    results = []
+    for (j, score), row, category in zip(matches, rows, categories):
+        results.append({
+            "Brand Name": row[NAME_COLUMN],
+            "Product Type": row[PRODUCT_TYPE_COLUMN],
+            **{field: None if math.isnan(row[field]) else row[field] for field in SEARCH_FIELDS},
+            "Category": category,
+            "score": round(score, 3),
+            "products": int(index.row_counts[j])
+        })
+    return results
+
+def autocomplete(prefix, limit=10):
+    """Brand names with a word starting with ``prefix``; names starting with it come first"""
+    catalog = catalog_store.get()
+    index = catalog.names_index()
+    with span('autocomplete'):
+        matches = index.complete(prefix, limit)
+    return [{"Brand Name": catalog.names[int(index.first_rows[j])], "products": int(index.row_counts[j])}
+            for j, _ in matches]
+
+def wants_preprocessing():
+    """Per-request ``preprocess`` form/query flag, defaulting to OCR_PREPROCESS"""
+    return requested(request.values.get('preprocess'))
+
+def requested_product_type():
+    return product_type_hint(request.values.get('product_type'), request.values.get('product_name'))
+
+def requested_product_name():
+    return request.values.get('product_name')
+
+class Scan:
+    """One scan_images call split around the OCR round-trip.
+
+    The constructor answers what it can from phash_cache and the OCR text
+    cache and leaves the remaining image bytes in ``to_detect``; ``parse``
+    takes the texts detected for those and returns feature rows, and
+    ``complete`` takes their predicted labels and builds the results. The
+    async server awaits the OCR call and the prediction in between instead
+    of blocking a thread on them.
+
+    ``product_type`` (from the request) picks the catalog shard searched
+    for alternatives; without it each label's type is inferred from its
+    OCR text when that names exactly one.
+
+    Labels that fast_path matches to a catalog product, by their OCR text
+    or by the request's ``product_name`` (which then stands for every
+    image, and spares them OCR too), skip parsing and the model and are
+    answered with that product's stored result.
+    """
+
+    def __init__(self, images, shrink=False, product_type=None, product_name=None):
+        self.count = len(images)
+        self.product_type = product_type
+        # Alternatives always come from the catalog current when the scan started, even for cached scans
+        self.catalog = catalog_store.get()
+        self.matched = {}
+        if product_name:
+            with span('label_match'):
+                row = fast_path.match(self.catalog, product_name, 'name')
+            if row is not None:
+                self.matched = dict.fromkeys(range(self.count), row)
+        self.hashes = [None] * self.count
+        self.analyzed = [None] * self.count
+        if phash_cache.enabled:
+            with span('phash_lookup'):
+                self.hashes = [None if i in self.matched else image_hash(image_bytes) for i, image_bytes in enumerate(images)]
+                self.analyzed = [None if i in self.matched else phash_cache.lookup(h) for i, h in enumerate(self.hashes)]
+        self.pending = [i for i, hit in enumerate(self.analyzed) if hit is None and i not in self.matched]
+
+        # Cached by the upload's own bytes, so a re-upload hits before paying for a decode
+        pending_bytes = [images[i] for i in self.pending]
+        with span('ocr_cache_lookup'):
+            self.keys, self.texts = ocr_cache.lookup_many(pending_bytes)
+        self.missing = [j for j, text in enumerate(self.texts) if text is None]
+        self.to_detect = [pending_bytes[j] for j in self.missing]
+        if shrink and self.to_detect:
+            with span('preprocess'):
+                self.to_detect = preprocessor.preprocess_many(self.to_detect)
+
+    def parse(self, detected):
+        """Take the texts detected for ``to_detect``; returns the feature rows still to classify"""
+        for j, text in zip(self.missing, detected):
+            self.texts[j] = text
+        ocr_cache.store_many([self.keys[j] for j in self.missing], detected)
+
+        self.failed = {}
+        self.fresh = []
+        for i, text in zip(self.pending, self.texts):
+            if isinstance(text, Exception):
+                self.failed[i] = text
+            else:
+                with span('text_cleanup'):
+                    cleaned_text = clean_text(text)
+                with span('label_match'):
+                    row = fast_path.match(self.catalog, cleaned_text)
+                if row is not None:
+                    self.matched[i] = row
+                    continue
+                with span('nutrient_parse'):
+                    nutrition_data = parser.parse(cleaned_text)
+                payload(log, "Extracted Nutrition Data: %s", nutrition_data)
+                self.fresh.append((i, nutrition_data, infer_text(cleaned_text)))
+        return np.array([nutrient_features(d) for _, d, _ in self.fresh], dtype=np.float64).reshape(-1, 3)
+
+    def complete(self, predicted_labels):
+        """Result dict for each image, in order; an image whose OCR failed gets the exception"""
+        for (i, nutrition_data, product_type), predicted_label in zip(self.fresh, predicted_labels):
+            self.analyzed[i] = (nutrition_data, predicted_label, product_type)
+            phash_cache.add(self.hashes[i], self.analyzed[i])
+
+        results = []
+        for i in range(self.count):
+            if i in self.failed:
+                results.append(self.failed[i])
+                continue
+            if i in self.matched:
+                row = self.matched[i]
+                with span('fast_path'):
+                    predicted_label, result = matched_result(self.catalog, row, self.product_type)
+                # A re-photo of the same pack then skips OCR too
+                phash_cache.add(self.hashes[i], (result["nutrition_data"], predicted_label, self.catalog.product_type(row)))
+                results.append(result)
+                continue
+            nutrition_data, predicted_label, product_type = self.analyzed[i]
+            results.append(build_result(self.catalog, nutrition_data, predicted_label, self.product_type or product_type))
+        return results
+
+    def finish(self, detected):
+        features = self.parse(detected)
+        with span('predict'):
+            predicted_labels = predictor.predict(features)
+        return self.complete(predicted_labels)
+
+def scan_images(images, detect_many, shrink=False, product_type=None, product_name=None):
+    """Result dict for each uploaded image, in order; an image whose OCR failed gets the exception.
+
+    Near-duplicates of earlier photos are answered from phash_cache; the rest
+    go through the OCR text cache, the misses are shrunk for upload if
+    ``shrink`` is set, and their texts go through the parser and one batched
+    model call. Labels of catalog products
+    are answered from the catalog instead (see ``Scan``).
+    """
+    scan = Scan(images, shrink, product_type, product_name)
+    detected = []
+    if scan.to_detect:
+        with span('ocr'):
+            detected = detect_many(scan.to_detect)
+    return scan.finish(detected)
+
+@app.route("/ocr", methods=["POST"])
+def newFun():
+    log.debug("Inside flask backend")
+    if 'image' not in request.files:
+        return jsonify({'error': 'No image file provided'}), 400
+
+    image_file = request.files['image']
+    if image_file.filename == '':
+        return jsonify({'error': 'No selected image file'}), 400
+
+    try:
+        with span('upload_read'):
+            image_bytes = image_file.read()
+        result = scan_images([image_bytes], ocr_backend().detect_texts, shrink=wants_preprocessing(),
+                             product_type=requested_product_type(), product_name=requested_product_name())[0]
+        if isinstance(result, OcrError):
+            return jsonify({'error': str(result)}), 500
+        if isinstance(result, Exception):
+            raise result
+
+        with span('serialize'):
+            response = jsonify(result)
+        return response, 200
+
+    except Exception as e:
+        log.exception("Error processing image")
+        return jsonify({'error': f'Failed to process image: {str(e)}'}), 500
+
+@app.route("/ocr/batch", methods=["POST"])
+def batch_ocr():
+    """OCR many label images from one multipart request; results come back in upload order"""
+    image_files = [f for f in request.files.getlist('images') if f.filename != '']
+    if not image_files:
+        return jsonify({'error': 'No image files provided'}), 400
+    if len(image_files) > MAX_BATCH_IMAGES:
+        return jsonify({'error': f'At most {MAX_BATCH_IMAGES} images per batch'}), 400
+
+    try:
+        with span('upload_read'):
+            images = [f.read() for f in image_files]
+        scanned = scan_images(images, ocr_backend().detect_texts, shrink=wants_preprocessing(),
+                              product_type=requested_product_type(), product_name=requested_product_name())
+
+        results = []
+        for image_file, result in zip(image_files, scanned):
+            if isinstance(result, Exception):
+                log.warning("Error processing image %s: %s", image_file.filename, result)
+                result = {'error': str(result) if isinstance(result, OcrError) else f'Failed to process image: {result}'}
+            results.append({'filename': image_file.filename, **result})
+        with span('serialize'):
+            response = jsonify({'results': results})
+        return response, 200
+
+    except Exception as e:
+        log.exception("Error processing image batch")
+        return jsonify({'error': f'Failed to process images: {str(e)}'}), 500
+
+@app.route("/search", methods=["GET", "POST"])
+def search():
+    """Fuzzy brand-name search: ?q=... (or a JSON body {"query": ...}), typo-tolerant and ranked"""
+    body = request.get_json(silent=True) or {}
+    query = request.values.get('q') or body.get('query')
+    if not query or not query.strip():
+        return jsonify({'message': 'Search query is required'}), 400
+    results = search_products(query, search_limit(request.values.get('limit', body.get('limit'))))
+    return jsonify({'status': 'success', 'data': results}), 200
+
+@app.route("/search/autocomplete", methods=["GET"])
+def search_autocomplete():
+    results = autocomplete(request.values.get('q', ''), search_limit(request.values.get('limit')))
+    return jsonify({'status': 'success', 'data': results}), 200
+
+@app.route("/ocr/cache/stats", methods=["GET"])
+def ocr_cache_stats():
+    return jsonify(ocr_cache.stats()), 200
+
+@app.route("/model", methods=["GET"])
+def model_info():
+    return jsonify({'path': MODEL_PATH, **model.describe()}), 200
+
+@app.route("/model/batching/stats", methods=["GET"])
+def batching_stats():
+    return jsonify(predictor.stats()), 200
+
+@app.route("/ocr/preprocess/stats", methods=["GET"])
+def preprocess_stats():
+    return jsonify(preprocessor.stats()), 200
+
+@app.route("/catalog/partitions", methods=["GET"])
+def catalog_partitions():
+    return jsonify(catalog_store.get().shard_sizes()), 200
+
+@app.route("/ocr/phash/stats", methods=["GET"])
+def phash_cache_stats():
+    return jsonify(phash_cache.stats()), 200
+
+@app.route("/ocr/fastpath/stats", methods=["GET"])
+def fast_path_stats():
+    return jsonify(fast_path.stats()), 200
+
+if __name__ == "__main__":
     app.run(debug=True, port=5001)
\ No newline at end of file
@@ -0,0 +1,196 @@
+"""Asyncio serving mode for the ocr2 endpoints.
+
+Serves the same routes and JSON as ocr2.py from a Starlette (ASGI) app.
+Under Flask every /ocr request holds a worker thread for the whole OCR
+round-trip, so concurrency is capped by the thread count. Here the OCR call
+is awaited on the event loop through the backend's async client, so many
+scans in flight share one loop; the CPU-bound steps around it (hashing,
+preprocessing, parsing) run on a small executor and predictions are awaited
+from the shared micro-batcher. Models, caches and the catalog are the ones
+ocr2 builds at import.
+
+    uvicorn ocr2_async:app --port 5001
+"""
+import asyncio
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+import ocr2
+from batch_ocr import MAX_BATCH_IMAGES, OcrError
+from metrics import CONTENT_TYPE, REGISTRY, span
+from ocr_backends import ocr_backend
+from preprocess import requested
+
+CPU_WORKERS = int(os.environ.get('OCR_ASYNC_CPU_WORKERS', min(4, os.cpu_count() or 1)))
+log = logging.getLogger('ocr2')
+executor = ThreadPoolExecutor(max_workers=CPU_WORKERS, thread_name_prefix='ocr-cpu')
+
+
+async def scan_images(images, shrink=False, product_type=None, product_name=None):
+    """ocr2.scan_images with the OCR round-trip awaited instead of blocking a thread"""
+    loop = asyncio.get_running_loop()
+    scan = await loop.run_in_executor(executor, ocr2.Scan, images, shrink, product_type, product_name)
+    detected = []
+    if scan.to_detect:
+        with span('ocr'):
+            detected = await ocr_backend().detect_texts_async(scan.to_detect)
+    features = await loop.run_in_executor(executor, scan.parse, detected)
+    with span('predict'):
+        predicted_labels = await ocr2.predictor.predict_async(features)
+    return await loop.run_in_executor(executor, scan.complete, predicted_labels)
+
+
+def _wants_preprocessing(request, form):
+    return requested(form.get('preprocess', request.query_params.get('preprocess')))
+
+
+def _product_type(request, form):
+    value = lambda key: form.get(key, request.query_params.get(key))
+    return ocr2.product_type_hint(value('product_type'), value('product_name'))
+
+
+def _product_name(request, form):
+    return form.get('product_name', request.query_params.get('product_name'))
+
+
+async def ocr(request):
+    async with request.form() as form:
+        image_file = form.get('image')
+        if image_file is None or isinstance(image_file, str):
+            return JSONResponse({'error': 'No image file provided'}, 400)
+        if image_file.filename == '':
+            return JSONResponse({'error': 'No selected image file'}, 400)
+        with span('upload_read'):
+            image_bytes = await image_file.read()
+        shrink = _wants_preprocessing(request, form)
+        product_type = _product_type(request, form)
+        product_name = _product_name(request, form)
+
+    try:
+        result = (await scan_images([image_bytes], shrink, product_type, product_name))[0]
+        if isinstance(result, OcrError):
+            return JSONResponse({'error': str(result)}, 500)
+        if isinstance(result, Exception):
+            raise result
+        with span('serialize'):
+            response = JSONResponse(result, 200)
+        return response
+
+    except Exception as e:
+        log.exception("Error processing image")
+        return JSONResponse({'error': f'Failed to process image: {str(e)}'}, 500)
+
+
+async def batch_ocr(request):
+    """OCR many label images from one multipart request; results come back in upload order"""
+    async with request.form(max_files=MAX_BATCH_IMAGES + 1) as form:
+        image_files = [f for f in form.getlist('images') if not isinstance(f, str) and f.filename != '']
+        if not image_files:
+            return JSONResponse({'error': 'No image files provided'}, 400)
+        if len(image_files) > MAX_BATCH_IMAGES:
+            return JSONResponse({'error': f'At most {MAX_BATCH_IMAGES} images per batch'}, 400)
+        with span('upload_read'):
+            images = [await f.read() for f in image_files]
+        filenames = [f.filename for f in image_files]
+        shrink = _wants_preprocessing(request, form)
+        product_type = _product_type(request, form)
+        product_name = _product_name(request, form)
+
+    try:
+        scanned = await scan_images(images, shrink, product_type, product_name)
+
+        results = []
+        for filename, result in zip(filenames, scanned):
+            if isinstance(result, Exception):
+                log.warning("Error processing image %s: %s", filename, result)
+                result = {'error': str(result) if isinstance(result, OcrError) else f'Failed to process image: {result}'}
+            results.append({'filename': filename, **result})
+        with span('serialize'):
+            response = JSONResponse({'results': results}, 200)
+        return response
+
+    except Exception as e:
+        log.exception("Error processing image batch")
+        return JSONResponse({'error': f'Failed to process images: {str(e)}'}, 500)
+
+
+async def ocr_cache_stats(request):
+    return JSONResponse(ocr2.ocr_cache.stats())
+
+
+async def phash_cache_stats(request):
+    return JSONResponse(ocr2.phash_cache.stats())
+
+
+async def fast_path_stats(request):
+    return JSONResponse(ocr2.fast_path.stats())
+
+
+async def batching_stats(request):
+    return JSONResponse(ocr2.predictor.stats())
+
+
+async def preprocess_stats(request):
+    return JSONResponse(ocr2.preprocessor.stats())
+
+
+async def search(request):
+    body = {}
+    if request.method == 'POST':
+        try:
+            body = await request.json()
+        except ValueError:
+            pass
+    query = request.query_params.get('q') or body.get('query')
+    if not query or not query.strip():
+        return JSONResponse({'message': 'Search query is required'}, 400)
+    limit = ocr2.search_limit(request.query_params.get('limit', body.get('limit')))
+    return JSONResponse({'status': 'success', 'data': ocr2.search_products(query, limit)})
+
+
+async def search_autocomplete(request):
+    results = ocr2.autocomplete(request.query_params.get('q', ''), ocr2.search_limit(request.query_params.get('limit')))
+    return JSONResponse({'status': 'success', 'data': results})
+
+
+async def catalog_partitions(request):
+    return JSONResponse(ocr2.catalog_store.get().shard_sizes())
+
+
+async def metrics(request):
+    return Response(REGISTRY.exposition(), headers={'Content-Type': CONTENT_TYPE})
+
+
+async def model_info(request):
+    return JSONResponse({'path': ocr2.MODEL_PATH, **ocr2.model.describe()})
+
+
+app = Starlette(
+    routes=[
+        Route('/ocr', ocr, methods=['POST']),
+        Route('/ocr/batch', batch_ocr, methods=['POST']),
+        Route('/ocr/cache/stats', ocr_cache_stats, methods=['GET']),
+        Route('/ocr/phash/stats', phash_cache_stats, methods=['GET']),
+        Route('/ocr/fastpath/stats', fast_path_stats, methods=['GET']),
+        Route('/ocr/preprocess/stats', preprocess_stats, methods=['GET']),
+        Route('/model', model_info, methods=['GET']),
+        Route('/model/batching/stats', batching_stats, methods=['GET']),
+        Route('/search', search, methods=['GET', 'POST']),
+        Route('/search/autocomplete', search_autocomplete, methods=['GET']),
+        Route('/catalog/partitions', catalog_partitions, methods=['GET']),
+        Route('/metrics', metrics, methods=['GET']),
+    ],
+    middleware=[Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'])],
+)
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(app, port=5001)
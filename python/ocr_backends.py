@@ -0,0 +1,201 @@
+"""Interchangeable OCR engines behind one small interface.
+
+Every backend turns image bytes into label text: ``detect_text(image_bytes)``
+for one image (raising on failure) and ``detect_texts(images)`` for a batch
+(a failed image gets its exception in place of the text), plus the
+coroutine ``detect_texts_async`` for the asyncio server. Services pick one
+with OCR_BACKEND:
+
+``vision``     Google Cloud Vision document text detection (the default).
+``tesseract``  Local Tesseract through pytesseract; no credentials or network.
+``replay``     Deterministic replay of recorded texts from OCR_REPLAY_FILE with
+               OCR_REPLAY_LATENCY seconds of simulated latency per call, for
+               offline load tests of the whole /ocr pipeline.
+
+Setting OCR_RECORD_FILE on any backend appends every detected text to that
+file, which is where replay recordings come from.
+"""
+import asyncio
+import io
+import json
+import os
+import threading
+
+from batch_ocr import (
+    MAX_IN_FLIGHT, USE_BATCH_API, OcrError, detect_text, detect_texts, detect_texts_async, shared_pool,
+    vision_async_client, vision_client,
+)
+from ocr_cache import image_key
+
+BACKEND = os.environ.get('OCR_BACKEND', 'vision')
+RECORD_FILE = os.environ.get('OCR_RECORD_FILE')
+REPLAY_FILE = os.environ.get('OCR_REPLAY_FILE')
+REPLAY_LATENCY = float(os.environ.get('OCR_REPLAY_LATENCY', 0.0))
+REPLAY_DEFAULT_TEXT = os.environ.get('OCR_REPLAY_DEFAULT_TEXT', '')
+TESSERACT_LANG = os.environ.get('OCR_TESSERACT_LANG', 'eng')
+TESSERACT_CONFIG = os.environ.get('OCR_TESSERACT_CONFIG', '--psm 6')
+
+
+class OcrBackend:
+    """Base class; subclasses implement ``detect_text`` and may batch ``detect_texts``"""
+
+    name = 'base'
+
+    def detect_text(self, image_bytes):
+        raise NotImplementedError
+
+    def _detect_or_error(self, image_bytes):
+        try:
+            return self.detect_text(image_bytes)
+        except Exception as e:
+            return e
+
+    def detect_texts(self, images):
+        return [self._detect_or_error(image_bytes) for image_bytes in images]
+
+    async def detect_texts_async(self, images):
+        """Engines without an async API run the blocking call on a worker thread"""
+        return await asyncio.to_thread(self.detect_texts, images)
+
+
+class VisionBackend(OcrBackend):
+    """Google Cloud Vision; ``client`` defaults to the lazily created service-account client"""
+
+    name = 'vision'
+
+    def __init__(self, client=None, async_client=None, max_in_flight=MAX_IN_FLIGHT, use_batch_api=USE_BATCH_API):
+        self._client = client
+        self._async_client = async_client
+        self.max_in_flight = max_in_flight
+        self.use_batch_api = use_batch_api
+
+    @property
+    def client(self):
+        return self._client if self._client is not None else vision_client()
+
+    @property
+    def async_client(self):
+        return self._async_client if self._async_client is not None else vision_async_client()
+
+    def detect_text(self, image_bytes):
+        return detect_text(self.client, image_bytes)
+
+    def detect_texts(self, images):
+        return detect_texts(self.client, images, self.max_in_flight, self.use_batch_api)
+
+    async def detect_texts_async(self, images):
+        return await detect_texts_async(self.async_client, images, self.max_in_flight)
+
+
+class TesseractBackend(OcrBackend):
+    """Local Tesseract; images are read on the shared OCR thread pool since tesseract runs out of process"""
+
+    name = 'tesseract'
+
+    def __init__(self, lang=TESSERACT_LANG, config=TESSERACT_CONFIG, max_in_flight=os.cpu_count() or 2):
+        import pytesseract
+        from PIL import Image
+
+        self._pytesseract = pytesseract
+        self._image = Image
+        self.lang = lang
+        self.config = config
+        self.max_in_flight = max_in_flight
+
+    def detect_text(self, image_bytes):
+        try:
+            image = self._image.open(io.BytesIO(image_bytes))
+            return self._pytesseract.image_to_string(image, lang=self.lang, config=self.config)
+        except (OSError, self._pytesseract.TesseractError) as e:
+            raise OcrError(str(e))
+
+    def detect_texts(self, images):
+        if len(images) <= 1:
+            return super().detect_texts(images)
+        return list(shared_pool(self.max_in_flight).map(self._detect_or_error, images))
+
+
+def load_recordings(path):
+    """sha256 -> text from a recording file (one JSON object per line)"""
+    texts = {}
+    if not path:
+        return texts
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                texts[entry['sha256']] = entry['text']
+    return texts
+
+
+class ReplayBackend(VisionBackend):
+    """Recorded texts served through a fake Vision client, so batching and concurrency limits still apply"""
+
+    name = 'replay'
+
+    def __init__(self, path=REPLAY_FILE, latency=REPLAY_LATENCY, default_text=REPLAY_DEFAULT_TEXT, **kwargs):
+        from fake_vision import AsyncFakeVisionClient, FakeVisionClient
+
+        texts = load_recordings(path)
+        super().__init__(FakeVisionClient(texts, default_text, latency),
+                         AsyncFakeVisionClient(texts, default_text, latency), **kwargs)
+
+
+class RecordingBackend(OcrBackend):
+    """Wraps another backend and appends each successful detection to ``path``"""
+
+    def __init__(self, inner, path):
+        self.inner = inner
+        self.name = inner.name
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _record(self, images, texts):
+        lines = [
+            json.dumps({'sha256': image_key(image_bytes), 'text': text}) + '\n'
+            for image_bytes, text in zip(images, texts) if not isinstance(text, Exception)
+        ]
+        with self._lock, open(self.path, 'a', encoding='utf-8') as f:
+            f.writelines(lines)
+
+    def detect_text(self, image_bytes):
+        text = self.inner.detect_text(image_bytes)
+        self._record([image_bytes], [text])
+        return text
+
+    def detect_texts(self, images):
+        texts = self.inner.detect_texts(images)
+        self._record(images, texts)
+        return texts
+
+    async def detect_texts_async(self, images):
+        texts = await self.inner.detect_texts_async(images)
+        await asyncio.to_thread(self._record, images, texts)
+        return texts
+
+
+BACKENDS = {
+    'vision': VisionBackend,
+    'tesseract': TesseractBackend,
+    'replay': ReplayBackend,
+}
+
+
+def create_backend(name=BACKEND, record_file=RECORD_FILE):
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown OCR backend {name!r}; choose from {', '.join(BACKENDS)}")
+    backend = BACKENDS[name]()
+    return RecordingBackend(backend, record_file) if record_file else backend
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def ocr_backend():
+    """Process-wide backend chosen by OCR_BACKEND, created on the first call"""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = create_backend()
+    return _backend
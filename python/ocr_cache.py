@@ -0,0 +1,108 @@
+"""Content-addressed cache of OCR results.
+
+Entries are keyed by the SHA-256 of the uploaded image bytes, so a rescan of
+the same file returns the earlier full text without another Vision call.
+Lookups go to a size-bounded in-memory LRU first and then to an on-disk tier
+(one small text file per image hash) that survives restarts.
+"""
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+log = logging.getLogger(__name__)
+
+CACHE_DIR = os.environ.get('OCR_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ocr_cache'))
+CACHE_SIZE = int(os.environ.get('OCR_CACHE_SIZE', 1024))
+
+
+def image_key(image_bytes):
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+class OcrCache:
+    """Two-tier (memory LRU, then disk) map from image hash to OCR text"""
+
+    def __init__(self, max_entries=CACHE_SIZE, directory=CACHE_DIR):
+        self.max_entries = max_entries
+        self.directory = directory
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + '.txt')
+
+    def _remember(self, key, text):
+        with self._lock:
+            self._entries[key] = text
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, key):
+        """Cached text for ``key`` or None"""
+        with self._lock:
+            text = self._entries.get(key)
+            if text is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return text
+
+        if self.directory:
+            try:
+                with open(self._path(key), encoding='utf-8') as f:
+                    text = f.read()
+            except FileNotFoundError:
+                text = None
+            if text is not None:
+                self._remember(key, text)
+                with self._lock:
+                    self.disk_hits += 1
+                return text
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, text):
+        self._remember(key, text)
+        if not self.directory:
+            return
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write-then-rename so a crash never leaves a truncated entry behind
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(text)
+            os.replace(tmp, path)
+        except OSError as e:
+            log.warning("Could not persist OCR cache entry %s: %s", key, e)
+
+    def lookup_many(self, images):
+        """``(keys, texts)`` for a batch, with None in ``texts`` for each miss"""
+        keys = [image_key(image_bytes) for image_bytes in images]
+        return keys, [self.get(key) for key in keys]
+
+    def store_many(self, keys, texts):
+        """Cache each detected text; failed detections (exceptions) are skipped"""
+        for key, text in zip(keys, texts):
+            if not isinstance(text, Exception):
+                self.put(key, text)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+            }
@@ -0,0 +1,165 @@
+"""Near-duplicate lookup for label photos by perceptual hash.
+
+Two photos of the same pack are never byte-identical, but their
+1024-bit difference hashes (32x32 dHash) differ in only a few bits.
+``PerceptualCache`` keeps the hash of every label it has analysed in a
+BK-tree, so a new photo within ``max_distance`` bits of an earlier one
+reuses that photo's nutrition_data and predicted category instead of going
+back to Vision.
+
+Nothing re-checks a hit, so a hash that confuses two products serves one's
+nutrition_data for the other. Label photos are mostly background and text
+of the same size, and at 8x8 different packs hash identically; at 32x32
+re-photos of a pack stay within about 10 bits while different packs are
+well over 100 apart. Even so the cache is off unless PHASH_CACHE=1.
+
+Pillow is optional: without it ``image_hash`` returns None and every lookup
+is a miss.
+"""
+import io
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+ENABLED = os.environ.get('PHASH_CACHE', '0') == '1'
+MAX_DISTANCE = int(os.environ.get('PHASH_MAX_DISTANCE', 24))
+MAX_ENTRIES = int(os.environ.get('PHASH_MAX_ENTRIES', 10000))
+HASH_SIZE = 32
+
+
+def dhash(image, hash_size=HASH_SIZE):
+    """Difference hash of a PIL image as an int of hash_size**2 bits"""
+    small = image.convert('L').resize((hash_size + 1, hash_size), Image.LANCZOS)
+    pixels = np.asarray(small, dtype=np.int16)
+    return int.from_bytes(np.packbits(pixels[:, :-1] > pixels[:, 1:]).tobytes(), 'big')
+
+
+def image_hash(image_bytes):
+    """dHash of encoded image bytes, or None if Pillow is missing or the image won't decode"""
+    if Image is None:
+        return None
+    try:
+        image = Image.open(io.BytesIO(image_bytes))
+        # JPEG can decode straight to a fraction of full size, which is all a 33x32 hash needs
+        image.draft('L', (256, 256))
+        # Phone photos are often stored sideways with an EXIF rotation; hash them upright
+        return dhash(ImageOps.exif_transpose(image))
+    except Exception:
+        return None
+
+
+def hamming(a, b):
+    return (a ^ b).bit_count()
+
+
+class BKTree:
+    """Metric tree over integer hashes under Hamming distance"""
+
+    def __init__(self):
+        self.root = None
+        self.size = 0
+
+    def add(self, key, value):
+        node = [key, value, {}]
+        self.size += 1
+        if self.root is None:
+            self.root = node
+            return
+        current = self.root
+        while True:
+            d = hamming(key, current[0])
+            child = current[2].get(d)
+            if child is None:
+                current[2][d] = node
+                return
+            current = child
+
+    def nearest(self, key, max_distance):
+        """``(distance, value)`` of the closest key within max_distance, or None"""
+        if self.root is None:
+            return None
+        best = None
+        stack = [self.root]
+        while stack:
+            node_key, value, children = stack.pop()
+            d = hamming(key, node_key)
+            if d <= max_distance and (best is None or d < best[0]):
+                best = (d, value)
+                if d == 0:
+                    break
+            radius = best[0] if best is not None else max_distance
+            # Triangle inequality: only children at distance d +/- radius can hold a closer key
+            for edge, child in children.items():
+                if d - radius <= edge <= d + radius:
+                    stack.append(child)
+        return best
+
+
+class PerceptualCache:
+    """Analysis results of previously seen label photos, found by near-duplicate hash"""
+
+    def __init__(self, max_distance=MAX_DISTANCE, max_entries=MAX_ENTRIES, enabled=ENABLED):
+        self.enabled = enabled
+        self.max_distance = max_distance
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._tree = BKTree()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.unhashable = 0
+        self.hit_distances = [0] * (max_distance + 1)
+
+    def lookup(self, phash):
+        """Cached value for the nearest hash within max_distance, or None"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            if phash is None:
+                self.unhashable += 1
+                return None
+            found = self._tree.nearest(phash, self.max_distance)
+            if found is None:
+                self.misses += 1
+                return None
+            distance, value = found
+            self.hits += 1
+            self.hit_distances[distance] += 1
+            return value
+
+    def add(self, phash, value):
+        if phash is None or not self.enabled:
+            return
+        with self._lock:
+            if phash in self._entries:
+                return
+            self._entries[phash] = value
+            self._tree.add(phash, value)
+            if len(self._entries) > self.max_entries:
+                # BK-trees can't delete, so drop the oldest quarter and rebuild
+                for _ in range(len(self._entries) - self.max_entries * 3 // 4):
+                    self._entries.popitem(last=False)
+                self._tree = BKTree()
+                for key, kept in self._entries.items():
+                    self._tree.add(key, kept)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'hits': self.hits,
+                'misses': self.misses,
+                'unhashable': self.unhashable,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'hit_distances': list(self.hit_distances),
+                'entries': len(self._entries),
+                'max_distance': self.max_distance,
+            }
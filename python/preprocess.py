@@ -0,0 +1,98 @@
+"""Shrink label photos before they are sent for OCR.
+
+Phone photos arrive as 4-12 MB JPEGs at full sensor resolution, far more
+than text detection needs. ``preprocess`` decodes an upload, applies its
+EXIF orientation, downscales it so the longer side is at most ``max_side``
+pixels, converts it to grayscale and re-encodes it as a compact JPEG. An
+image that doesn't decode, or wouldn't get smaller, is passed through
+unchanged. ``preprocess_many`` runs a batch on a small worker pool; Pillow
+releases the GIL while decoding and resampling, so threads scale.
+
+The stage is off unless OCR_PREPROCESS=1 or a request asks for it
+(``preprocess=1``): the bytes it saves are measured, but not yet what it
+does to text detection. ``bench_preprocess.py --ocr`` compares the nutrient
+values recovered from raw and preprocessed photos; turn it on by default
+once that shows no loss on real labels.
+"""
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, ImageOps
+
+log = logging.getLogger(__name__)
+
+ENABLED_BY_DEFAULT = os.environ.get('OCR_PREPROCESS', '0') == '1'
+MAX_SIDE = int(os.environ.get('OCR_PREPROCESS_MAX_SIDE', 1600))
+JPEG_QUALITY = int(os.environ.get('OCR_PREPROCESS_QUALITY', 85))
+WORKERS = int(os.environ.get('OCR_PREPROCESS_WORKERS', os.cpu_count() or 2))
+
+
+def requested(flag):
+    """Whether a request's ``preprocess`` field asks for the stage; None means the default"""
+    if flag is None:
+        return ENABLED_BY_DEFAULT
+    return flag.lower() not in ('0', 'false', 'no', 'off')
+
+
+def preprocess(image_bytes, max_side=MAX_SIDE, quality=JPEG_QUALITY):
+    """Oriented, downscaled grayscale JPEG of ``image_bytes``, or the input if that isn't smaller"""
+    try:
+        image = Image.open(io.BytesIO(image_bytes))
+        # Let the JPEG decoder skip straight to (at least) the target size
+        image.draft('L', (max_side, max_side))
+        image = ImageOps.exif_transpose(image)
+        image = image.convert('L')
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+
+        out = io.BytesIO()
+        image.save(out, format='JPEG', quality=quality, optimize=True)
+    except Exception as e:
+        # Clients send whatever they like; one line per bad upload would flood the log
+        log.debug("Preprocessing skipped, image could not be decoded: %s", e)
+        return image_bytes
+
+    processed = out.getvalue()
+    return processed if len(processed) < len(image_bytes) else image_bytes
+
+
+class Preprocessor:
+    """Worker pool plus running totals of bytes in and out"""
+
+    def __init__(self, workers=WORKERS, max_side=MAX_SIDE, quality=JPEG_QUALITY):
+        self.max_side = max_side
+        self.quality = quality
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='preprocess')
+        self._lock = threading.Lock()
+        self.images = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def _one(self, image_bytes):
+        return preprocess(image_bytes, self.max_side, self.quality)
+
+    def preprocess_many(self, images):
+        """Preprocessed bytes for each image, in input order"""
+        if len(images) == 1:
+            # Nothing to overlap; skip the hand-off to the pool
+            processed = [self._one(images[0])]
+        else:
+            processed = list(self._pool.map(self._one, images))
+        with self._lock:
+            self.images += len(images)
+            self.bytes_in += sum(len(b) for b in images)
+            self.bytes_out += sum(len(b) for b in processed)
+        return processed
+
+    def stats(self):
+        with self._lock:
+            return {
+                'images': self.images,
+                'bytes_in': self.bytes_in,
+                'bytes_out': self.bytes_out,
+                'bytes_saved': self.bytes_in - self.bytes_out,
+                'ratio': self.bytes_out / self.bytes_in if self.bytes_in else 1.0,
+                'max_side': self.max_side,
+            }
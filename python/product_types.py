@@ -0,0 +1,70 @@
+"""Product types for partitioning the catalog, inferred from product names.
+
+A catalog CSV can give each row's type in a ``Product Type`` column; rows
+without one get ``infer(name)``. The rules are keyword matches on whole
+words, tried in order, so the more specific form wins: "Potato Crackers
+Cream n' Onion" is crackers, "Choco Chip Creme Sandwiches" cream biscuits,
+"Chocolate Chip Cookies" cookies. A word that names different products
+from different makers ("munch", "wafers", "bar") only counts with the
+words that pin it down ("nestle munch", "potato wafers"): a wrong type is
+worse than none, since it hides every alternative of the right one. An
+explicit column may also use types that aren't in ``RULES``.
+"""
+import re
+
+PRODUCT_TYPE_COLUMN = 'Product Type'
+OTHER = 'other'
+
+# (type, keywords) in priority order; a keyword may be several words
+RULES = [
+    ('chips', ('chips', 'crisps', 'nachos', 'potato wafers')),
+    ('namkeen', ('namkeen', 'bhujia', 'mixture', 'sev', 'chivda', 'chakli', 'moong dal', 'chana dal')),
+    ('chocolates', ('dairy milk', 'kitkat', 'five star', '5 star', 'nestle munch', 'chocolate bar', 'truffle')),
+    ('crackers', ('cracker', 'crackers', 'krackjack', 'monaco', 'cheeslings', 'snappers', '50 50')),
+    ('cream biscuits', ('cream', 'creme', 'sandwich', 'sandwiches', 'bourbon', 'oreo', 'fills')),
+    ('cookies', ('cookie', 'cookies', 'shortbread', 'chocochip')),
+    ('biscuits', ('biscuit', 'biscuits', 'marie', 'digestive', 'glucose', 'gluco', 'parle g', 'arrowroot')),
+]
+PRODUCT_TYPES = [t for t, _ in RULES] + [OTHER]
+# Keywords that turn up in ingredient lists, so say nothing about a label's product type
+INGREDIENT_KEYWORDS = {'cream', 'creme', 'glucose', 'gluco', 'mixture'}
+
+
+def _patterns(skip=()):
+    return [(t, re.compile(r'\b(?:' + '|'.join(re.escape(k).replace(r'\ ', ' ') for k in keywords if k not in skip) + r')\b'))
+            for t, keywords in RULES]
+
+
+_NAME_PATTERNS = _patterns()
+_TEXT_PATTERNS = _patterns(INGREDIENT_KEYWORDS)
+
+
+def _words(text):
+    return ' '.join(re.findall(r'[a-z0-9]+', text.lower()))
+
+
+def matches(text, patterns=_NAME_PATTERNS):
+    """Every type whose keywords occur in ``text``, in priority order"""
+    words = _words(text)
+    return [t for t, pattern in patterns if pattern.search(words)]
+
+
+def infer(name, default=OTHER):
+    """Product type of a product from its brand name; ``default`` when nothing matches"""
+    found = matches(name)
+    return found[0] if found else default
+
+
+def infer_text(text):
+    """Product type of a scanned label from its OCR text, or None unless exactly one type is mentioned.
+
+    Ingredient lists mention cream, glucose and so on, so those words are
+    ignored here, and a label naming several types doesn't pick one.
+    """
+    found = matches(text, _TEXT_PATTERNS)
+    return found[0] if len(found) == 1 else None
+
+
+def normalize(value):
+    """A client- or CSV-supplied type in the form the catalog keys shards by; None if blank"""
+    return ' '.join((value or '').lower().split()) or None
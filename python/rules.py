@@ -0,0 +1,146 @@
+"""Vectorised evaluation of the sugar/fat/sodium classification rules.
+
+A rule table is data: an ordered list of ``(category, threshold, min_count,
+summary)`` rows, read as "the first row where at least ``min_count``
+nutrients measure above ``threshold`` decides the category". The measure is
+either the plain ratio to the safe limit (ocr.py) or the exceedance over it
+(ocr2.py). ``RuleSet.evaluate`` applies a table to whole arrays at once and
+returns category codes plus a bitmask of the nutrients that triggered them.
+Per-request calls classify a handful of rows, where array setup costs more
+than the rules, so those take a plain-Python path giving the same answers.
+"""
+import numpy as np
+
+FEATURES = ("TOTAL SUGARS", "TOTAL FAT", "SODIUM(mg)")
+CATEGORIES = ("Safe", "OK", "Harmful", "Very Harmful")
+
+# Reason bits: one per feature in FEATURES order, plus a catch-all flag
+REASON_HIGH_SUGAR = 1
+REASON_HIGH_FAT = 2
+REASON_HIGH_SODIUM = 4
+REASON_EXCESSIVE = 8
+
+# Order and wording of the explanation ocr.py has always given
+REASON_TEXT = [
+    (REASON_HIGH_SODIUM, "high sodium"),
+    (REASON_HIGH_FAT, "high fat"),
+    (REASON_HIGH_SUGAR, "high sugar"),
+]
+EXCESSIVE_TEXT = "excessive amounts of sodium, fat, or sugar"
+
+# ocr.py: value / limit; anything over 3x is Very Harmful, 2x counts as high
+RATIO_RULES = [
+    ("Very Harmful", 3, 1, True),
+    ("Harmful", 2, 2, False),
+    ("OK", 2, 1, False),
+]
+
+# ocr2.py: (value - limit) / limit when over the limit; two nutrients more
+# than 30% over is Very Harmful, two over at all is Harmful, one is OK
+EXCEEDANCE_RULES = [
+    ("Very Harmful", 0.3, 2, False),
+    ("Harmful", 0, 2, False),
+    ("OK", 0, 1, False),
+]
+
+# Safe limits per 100g each service's rule table is measured against
+RATIO_LIMITS = {
+    "ENERGY(kcal)": 250,     # kcal
+    "PROTEIN": 5,           # g (below this is harmful)
+    "TOTAL SUGARS": 10,      # g
+    "TOTAL FAT": 17,         # g
+    "SODIUM(mg)": 600,       # mg
+}
+EXCEEDANCE_LIMITS = {
+    "TOTAL SUGARS": 22.5,
+    "TOTAL FAT": 17,
+    "SODIUM(mg)": 600
+}
+
+CHUNK_ROWS = 1 << 16
+# Batches up to this size are classified row by row; NumPy only pays off beyond it
+SCALAR_ROWS = 64
+
+
+def reasons(mask):
+    """Human-readable reasons for one reason bitmask"""
+    if mask & REASON_EXCESSIVE:
+        return [EXCESSIVE_TEXT]
+    return [text for bit, text in REASON_TEXT if mask & bit]
+
+
+class RuleSet:
+    """A rule table bound to a set of safe limits"""
+
+    def __init__(self, limits, measure, rules, default="Safe"):
+        if measure not in ("ratio", "exceedance"):
+            raise ValueError(f"Unknown measure: {measure}")
+        self.limits = np.array([float(limits[f]) for f in FEATURES])
+        self._limits = self.limits.tolist()
+        self.measure = measure
+        self.rules = [(CATEGORIES.index(c), float(t), int(n), bool(s)) for c, t, n, s in rules]
+        self.default = CATEGORIES.index(default)
+
+    def _measure(self, x, limit):
+        if self.measure == "ratio":
+            return x / limit
+        return np.where(x > limit, (x - limit) / limit, 0.0)
+
+    def evaluate(self, sugar, fat, sodium):
+        """Category codes (indices into CATEGORIES) and reason bitmasks, both uint8 arrays"""
+        columns = [np.asarray(v, dtype=np.float64).ravel() for v in (sugar, fat, sodium)]
+        n = len(columns[0])
+        codes = np.empty(n, dtype=np.uint8)
+        masks = np.empty(n, dtype=np.uint8)
+
+        for lo in range(0, n, CHUNK_ROWS):
+            hi = min(lo + CHUNK_ROWS, n)
+            with np.errstate(invalid='ignore'):
+                measured = [self._measure(col[lo:hi], limit) for col, limit in zip(columns, self.limits)]
+            code = np.full(hi - lo, self.default, dtype=np.uint8)
+            mask = np.zeros(hi - lo, dtype=np.uint8)
+            # Walk the table bottom-up so the first matching row is the one left standing
+            for rule_code, threshold, min_count, summary in reversed(self.rules):
+                above = [m > threshold for m in measured]
+                count = above[0].view(np.uint8) + above[1].view(np.uint8) + above[2].view(np.uint8)
+                hit = count >= min_count
+                code[hit] = rule_code
+                if summary:
+                    mask[hit] = REASON_EXCESSIVE
+                else:
+                    bits = above[0].view(np.uint8) | (above[1].view(np.uint8) << 1) | (above[2].view(np.uint8) << 2)
+                    mask[hit] = bits[hit]
+            codes[lo:hi] = code
+            masks[lo:hi] = mask
+        return codes, masks
+
+    def evaluate_one(self, sugar, fat, sodium):
+        """``evaluate`` for one row, as plain ints"""
+        (ls, lf, ln), ratio = self._limits, self.measure == "ratio"
+        sugar, fat, sodium = float(sugar), float(fat), float(sodium)
+        if ratio:
+            s, f, n = sugar / ls, fat / lf, sodium / ln
+        else:
+            s = (sugar - ls) / ls if sugar > ls else 0.0
+            f = (fat - lf) / lf if fat > lf else 0.0
+            n = (sodium - ln) / ln if sodium > ln else 0.0
+        for rule_code, threshold, min_count, summary in self.rules:
+            mask = (s > threshold) | (f > threshold) << 1 | (n > threshold) << 2
+            if (mask & 1) + (mask >> 1 & 1) + (mask >> 2) >= min_count:
+                return rule_code, REASON_EXCESSIVE if summary else mask
+        return self.default, 0
+
+    def labels(self, codes):
+        return np.asarray(CATEGORIES, dtype=object)[codes]
+
+    def classify(self, row):
+        """Single-row ``(category, reasons)``, the shape classify_food always returned"""
+        code, mask = self.evaluate_one(row[FEATURES[0]], row[FEATURES[1]], row[FEATURES[2]])
+        return CATEGORIES[code], reasons(mask)
+
+    def classify_many(self, rows):
+        """Category label for each row of a list of dict-like records"""
+        if len(rows) <= SCALAR_ROWS:
+            return [CATEGORIES[self.evaluate_one(r[FEATURES[0]], r[FEATURES[1]], r[FEATURES[2]])[0]] for r in rows]
+        codes, _ = self.evaluate(*([r[f] for r in rows] for f in FEATURES))
+        return [CATEGORIES[c] for c in codes]
@@ -0,0 +1,303 @@
+"""Synthetic product catalogs and label texts for scale testing.
+
+``CatalogModel.fit`` learns each numeric column's empirical distribution
+(quantiles, share of blanks, decimal places) and the rank correlations
+between columns from the real CSVs, i.e. a Gaussian copula: samples are
+drawn from a correlated normal, mapped to uniforms and then through each
+column's quantile function. Brand names recombine maker, range and flavour
+words from the real names. ``write`` streams any number of rows to a CSV
+in the catalog's own format, optionally with a JSONL file of matching OCR
+label texts, one chunk at a time.
+
+    python synth.py --rows 1000000 --out artifacts/synth/catalog_1m.csv \\
+        --labels artifacts/synth/labels_1m.jsonl --check
+"""
+import argparse
+import csv
+import json
+import math
+import os
+import time
+
+import numpy as np
+
+from catalog import CATALOG_ENCODING, FEATURE_COLUMNS, NAME_COLUMN
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SOURCES = [os.path.join(HERE, 'mixed_data.csv'), os.path.join(HERE, 'Biscuits_sample.csv')]
+CHUNK_ROWS = 100_000
+
+# Last words that name the kind of product rather than its flavour
+FORMS = {"Biscuit", "Biscuits", "Cookie", "Cookies", "Crackers", "Shortbread", "Sandwiches"}
+
+# Label layouts in the shape Vision returns them; fields without a value are left out
+LABEL_TEMPLATES = [
+    ("{name}\nNUTRITIONAL INFORMATION (Approx.)\nPer 100 g of product\n",
+     [("Energy", "ENERGY(kcal)", "kcal"), ("Protein", "PROTEIN", "g"), ("Carbohydrate", "CARBOHYDRATE", "g"),
+      ("Total Sugars", "TOTAL SUGARS", "g"), ("Added Sugars", "ADDED SUGARS", "g"), ("Total Fat", "TOTAL FAT", "g"),
+      ("Saturated Fat", "SATURATED FAT", "g"), ("Trans Fat", "TRANS FAT", "g"),
+      ("Cholesterol", "CHOLESTEROL(mg)", "mg"), ("Sodium", "SODIUM(mg)", "mg")],
+     " {value} {unit}\n"),
+    ("{name}  NET WT 75g\nNutritional Value per 100g: ",
+     [("Energy", "ENERGY(kcal)", "kcal"), ("Protein", "PROTEIN", "g"), ("Carbohydrate", "CARBOHYDRATE", "g"),
+      ("Total Sugar", "TOTAL SUGARS", "g"), ("Total Fat", "TOTAL FAT", "g"), ("Saturates", "SATURATED FAT", "g"),
+      ("Sodium", "SODIUM(mg)", "mg")],
+     " {value}{unit}, "),
+    ("INGREDIENTS: Refined Wheat Flour (Maida), Sugar, Edible Vegetable Oil (Palm), Iodised Salt.\n"
+     "{name}\nNutrition Facts (per 100g) ",
+     [("Calories", "ENERGY(kcal)", ""), ("Total Fat", "TOTAL FAT", "g"), ("Saturated Fat", "SATURATED FAT", "g"),
+      ("Trans Fat", "TRANS FAT", "g"), ("Cholesterol", "CHOLESTEROL(mg)", "mg"), ("Sodium", "SODIUM(mg)", "mg"),
+      ("Total Carbohydrate", "CARBOHYDRATE", "g"), ("Total Sugars", "TOTAL SUGARS", "g"), ("Protein", "PROTEIN", "g")],
+     " {value}{unit} "),
+]
+
+
+def _normal_cdf(z):
+    """Standard normal CDF via Abramowitz & Stegun 7.1.26 (|error| < 1.5e-7), vectorised"""
+    x = np.abs(z) / math.sqrt(2)
+    t = 1.0 / (1.0 + 0.3275911 * x)
+    poly = t * (0.254829592 + t * (-0.284496736 + t * (1.421413741 + t * (-1.453152027 + t * 1.061405429))))
+    erf = 1.0 - poly * np.exp(-x * x)
+    return 0.5 * (1.0 + np.sign(z) * erf)
+
+
+def _normal_scores(values):
+    """Map non-null values to normal quantiles of their mid-ranks; NaN stays NaN"""
+    scores = np.full(len(values), np.nan)
+    present = ~np.isnan(values)
+    ranks = values[present].argsort(kind='stable').argsort() + 0.5
+    # Ties get the mean of their ranks so equal values share a score
+    _, inverse = np.unique(values[present], return_inverse=True)
+    ranks = np.bincount(inverse, ranks) / np.bincount(inverse)
+    u = ranks[inverse] / present.sum()
+    # Inverse CDF by bisection on the approximation above; 40 halvings is float64 precision here
+    lo, hi = np.full(len(u), -8.0), np.full(len(u), 8.0)
+    for _ in range(40):
+        mid = (lo + hi) / 2
+        below = _normal_cdf(mid) < u
+        lo, hi = np.where(below, mid, lo), np.where(below, hi, mid)
+    scores[present] = (lo + hi) / 2
+    return scores
+
+
+def _rank_correlation(scores):
+    """Pairwise correlation of normal-score columns over the rows where both are present"""
+    k = scores.shape[1]
+    corr = np.eye(k)
+    for a in range(k):
+        for b in range(a + 1, k):
+            both = ~np.isnan(scores[:, a]) & ~np.isnan(scores[:, b])
+            if both.sum() >= 10 and scores[both, a].std() > 0 and scores[both, b].std() > 0:
+                corr[a, b] = corr[b, a] = np.corrcoef(scores[both, a], scores[both, b])[0, 1]
+    return corr
+
+
+def _decimals(values):
+    present = values[~np.isnan(values)]
+    for places in range(3):
+        if np.allclose(present, np.round(present, places)):
+            return places
+    return 3
+
+
+def _split_name(name):
+    words = name.split()
+    form = words[-1] if len(words) > 1 and words[-1] in FORMS else None
+    middle = words[1:-1] if form else words[1:]
+    return words[0], middle, form
+
+
+class CatalogModel:
+    """Fitted per-column marginals, their correlation and the brand-name vocabulary"""
+
+    def __init__(self, header, quantiles, null_rates, decimals, correlation, names):
+        self.header = header
+        self.columns = [c for c in header if c != NAME_COLUMN]
+        self.quantiles = quantiles
+        self.null_rates = null_rates
+        self.decimals = decimals
+        self.correlation = correlation
+        self._chol = np.linalg.cholesky(correlation)
+
+        parts = [_split_name(n) for n in names]
+        self.makers, counts = np.unique([p[0] for p in parts], return_counts=True)
+        self.maker_weights = counts / counts.sum()
+        self.by_maker = {m: [p for p in parts if p[0] == m] for m in self.makers}
+        self.parts = parts
+
+    @classmethod
+    def fit(cls, paths=SOURCES):
+        """Fit to the union of the given catalog CSVs; rows repeated across files count once"""
+        header = None
+        seen = set()
+        records = []
+        for path in paths:
+            with open(path, newline='', encoding=CATALOG_ENCODING) as f:
+                reader = csv.reader(f)
+                file_header = next(reader)
+                if header is None:
+                    header = file_header
+                elif file_header != header:
+                    raise ValueError(f"{path} has different columns from {paths[0]}")
+                for record in reader:
+                    record = tuple(cell.strip() for cell in record + [''] * (len(header) - len(record)))
+                    if any(record) and record not in seen:
+                        seen.add(record)
+                        records.append(record)
+
+        names = [r[header.index(NAME_COLUMN)] for r in records]
+        columns = [c for c in header if c != NAME_COLUMN]
+        data = np.array([[float(r[header.index(c)]) if r[header.index(c)] else np.nan for c in columns]
+                         for r in records])
+
+        quantiles, null_rates, decimals = {}, {}, {}
+        for j, col in enumerate(columns):
+            values = data[:, j]
+            null_rates[col] = float(np.isnan(values).mean())
+            quantiles[col] = np.sort(values[~np.isnan(values)])
+            decimals[col] = _decimals(values)
+
+        # Pairwise correlations needn't form a valid matrix together; clip to the nearest PSD one
+        corr = _rank_correlation(np.column_stack([_normal_scores(data[:, j]) for j in range(len(columns))]))
+        eigvals, eigvecs = np.linalg.eigh(corr)
+        corr = eigvecs @ np.diag(np.clip(eigvals, 1e-6, None)) @ eigvecs.T
+        d = np.sqrt(np.diag(corr))
+        corr = corr / np.outer(d, d)
+        return cls(header, quantiles, null_rates, decimals, corr, names)
+
+    def sample(self, n, rng):
+        """``(names, {column: float64 array})`` for ``n`` new rows"""
+        z = rng.standard_normal((n, len(self.columns))) @ self._chol.T
+        u = _normal_cdf(z)
+        values = {}
+        for j, col in enumerate(self.columns):
+            q = self.quantiles[col]
+            if len(q) == 0:
+                values[col] = np.full(n, np.nan)
+                continue
+            x = np.interp(u[:, j] * (len(q) - 1), np.arange(len(q)), q)
+            x = np.round(x, self.decimals[col])
+            x[rng.random(n) < self.null_rates[col]] = np.nan
+            values[col] = x
+        return self.names(n, rng), values
+
+    def names(self, n, rng):
+        """Brand names: a maker, a range from one of its products, a flavour from any product, a form"""
+        makers = rng.choice(len(self.makers), n, p=self.maker_weights)
+        out = []
+        for m, r1, r2, r3 in zip(makers.tolist(), rng.random(n).tolist(), rng.random(n).tolist(), rng.random(n).tolist()):
+            maker = self.makers[m]
+            products = self.by_maker[maker]
+            _, middle, form = products[int(r1 * len(products))]
+            _, donor, donor_form = self.parts[int(r2 * len(self.parts))]
+            keep = middle[:1 + int(r3 * len(middle))] if middle else []
+            flavour = [w for w in donor[-2:] if w not in keep and w not in FORMS]
+            words = [maker] + keep + flavour + [w for w in [form or donor_form] if w]
+            out.append(' '.join(words))
+        return out
+
+    def format_value(self, col, value):
+        if math.isnan(value):
+            return ''
+        # Written the way the source CSVs are: 454, 6.9, 0
+        return f"{value:.{self.decimals[col]}f}".rstrip('0').rstrip('.') if self.decimals[col] else str(int(value))
+
+
+def label_text(model, name, row, rng):
+    """An OCR-style transcription of one product's nutrition panel"""
+    head, fields, field_format = LABEL_TEMPLATES[int(rng.integers(len(LABEL_TEMPLATES)))]
+    parts = [head.format(name=name)]
+    for label, col, unit in fields:
+        text = model.format_value(col, row[col])
+        if text:
+            parts.append(label + field_format.format(value=text, unit=unit))
+    return ''.join(parts).strip()
+
+
+def write(model, rows, out, labels=None, seed=0, chunk_rows=CHUNK_ROWS):
+    """Stream ``rows`` synthetic products to ``out`` (and label texts to ``labels``), ``chunk_rows`` at a time"""
+    rng = np.random.default_rng(seed)
+    for path in (out, labels):
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    label_file = open(labels, 'w', encoding='utf-8') if labels else None
+    try:
+        with open(out, 'w', newline='', encoding=CATALOG_ENCODING, errors='replace') as f:
+            writer = csv.writer(f)
+            writer.writerow(model.header)
+            written = 0
+            while written < rows:
+                n = min(chunk_rows, rows - written)
+                names, values = model.sample(n, rng)
+                cells = {col: [model.format_value(col, v) for v in values[col].tolist()] for col in model.columns}
+                writer.writerows(
+                    [names[i] if col == NAME_COLUMN else cells[col][i] for col in model.header] for i in range(n)
+                )
+                if label_file:
+                    for i in range(n):
+                        row = {col: values[col][i] for col in model.columns}
+                        expected = [None if math.isnan(row[c]) else row[c] for c in FEATURE_COLUMNS]
+                        label_file.write(json.dumps({
+                            'id': written + i, 'name': names[i], 'text': label_text(model, names[i], row, rng),
+                            'expected': dict(zip(('sugar', 'fat', 'sodium'), expected)),
+                        }) + '\n')
+                written += n
+    finally:
+        if label_file:
+            label_file.close()
+
+
+def check(model, out, labels=None, sample=100_000):
+    """Compare the generated catalog with the fitted sources and, if written, parse the label texts back"""
+    from catalog import Catalog
+    from nutrition_parser import clean_text, nutrient_features, parser
+
+    start = time.perf_counter()
+    catalog = Catalog.from_csv(out)
+    print(f"Loaded {len(catalog)} rows back in {time.perf_counter() - start:.1f}s")
+    print(f"{'column':>30} {'source mean':>12} {'synth mean':>12} {'source null':>12} {'synth null':>11}")
+    for col in model.columns:
+        q, synth = model.quantiles[col], catalog.columns[col]
+        source_mean = q.mean() if len(q) else float('nan')
+        print(f"{col:>30} {source_mean:>12.2f} {np.nanmean(synth) if (~np.isnan(synth)).any() else float('nan'):>12.2f}"
+              f" {model.null_rates[col]:>12.1%} {np.isnan(synth).mean():>11.1%}")
+
+    features = [model.columns.index(c) for c in FEATURE_COLUMNS]
+    synth_corr = _rank_correlation(np.column_stack([_normal_scores(catalog.columns[c][:sample]) for c in FEATURE_COLUMNS]))
+    print(f"max |rank corr difference| over sugar/fat/sodium: "
+          f"{np.abs(synth_corr - model.correlation[np.ix_(features, features)]).max():.3f}")
+    print(f"{len(set(catalog.names[:sample]))} distinct names in the first {min(sample, len(catalog))} rows")
+
+    if labels:
+        matched = total = 0
+        with open(labels, encoding='utf-8') as f:
+            for line, _ in zip(f, range(sample)):
+                entry = json.loads(line)
+                got = nutrient_features(parser.parse(clean_text(entry['text'])))
+                expected = [v or 0.0 for v in entry['expected'].values()]
+                matched += np.allclose(got, expected)
+                total += 1
+        print(f"parser recovers sugar/fat/sodium from {matched / total:.2%} of {total} label texts")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--out', default=os.path.join(HERE, 'artifacts', 'synth', 'catalog.csv'))
+    parser.add_argument('--labels', default=None, help="also write matching label texts to this JSONL file")
+    parser.add_argument('--sources', nargs='+', default=SOURCES)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+    parser.add_argument('--check', action='store_true', help="load the output back and compare it with the sources")
+    args = parser.parse_args()
+
+    model = CatalogModel.fit(args.sources)
+    start = time.perf_counter()
+    write(model, args.rows, args.out, args.labels, args.seed, args.chunk_rows)
+    print(f"Wrote {args.rows} rows to {args.out} in {time.perf_counter() - start:.1f}s")
+    if args.check:
+        check(model, args.out, args.labels)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""Stored alternatives must be what a live search of the product's shard returns.
+
+    python -m pytest test_alternatives_table.py
+"""
+import numpy as np
+import pytest
+
+import alternatives_table
+from catalog import CATALOG_ENCODING, Catalog
+from product_types import OTHER
+
+CSV = 'mixed_data.csv'
+
+
+@pytest.fixture(scope='module')
+def catalog():
+    return Catalog.from_csv(CSV)
+
+
+def live(catalog, row):
+    """A live search on the row's own values, less the row itself"""
+    features = catalog.features[np.searchsorted(catalog.rows, row)]
+    found = catalog.alternatives(*features, k=alternatives_table.K + 1, product_type=catalog.product_type(row))
+    return [r for r in found if r != row][:alternatives_table.K]
+
+
+def test_stored_matches_live_search(catalog):
+    for row in catalog.rows.tolist():
+        assert catalog.stored_alternatives(row) == live(catalog, row)
+
+
+def test_product_is_not_its_own_alternative(catalog):
+    table = catalog.top_alternatives()
+    assert not (table == np.arange(len(catalog))[:, None]).any()
+    # A search on its own values finds the product among the best three of its type
+    row = catalog.names.index('Parle Monaco Biscuits - Jeffs Jeera')
+    features = catalog.features[np.searchsorted(catalog.rows, row)]
+    found = catalog.alternatives(*features, k=3, product_type=catalog.product_type(row))
+    assert row in found
+    assert catalog.stored_alternatives(row) == [r for r in found if r != row]
+
+
+def test_other_products_search_whole_catalog(catalog):
+    row = catalog.names.index('Parle 20-20 Nice')
+    assert catalog.product_type(row) == OTHER
+    assert catalog.shard(OTHER) == 'all'
+    stored = catalog.stored_alternatives(row)
+    assert stored and any(catalog.product_type(r) != OTHER for r in stored)
+
+
+def test_update_matches_build(catalog, tmp_path):
+    with open(CSV, encoding=CATALOG_ENCODING) as f:
+        lines = f.readlines()
+    before = tmp_path / 'before.csv'
+    before.write_text(''.join(lines[:-150]), encoding=CATALOG_ENCODING)
+    previous = Catalog.from_csv(str(before))
+    updated = alternatives_table.update(catalog, previous, alternatives_table.build(previous))
+    assert updated is not None
+    assert np.array_equal(updated, alternatives_table.build(catalog))
@@ -0,0 +1,32 @@
+"""Text detection against the fake Vision clients, which expose only the real clients' methods.
+
+    python -m pytest test_batch_ocr.py
+"""
+import asyncio
+import hashlib
+
+import batch_ocr
+from fake_vision import AsyncFakeVisionClient, FakeVisionClient
+
+IMAGES = [b'label-%d' % i for i in range(12)]
+TEXTS = {hashlib.sha256(image).hexdigest(): 'Sugars %dg' % i for i, image in enumerate(IMAGES)}
+
+
+def test_async_client_has_no_single_image_helper():
+    # ImageAnnotatorAsyncClient only offers batch_annotate_images
+    assert not hasattr(AsyncFakeVisionClient(), 'document_text_detection')
+
+
+def test_detect_texts_async():
+    client = AsyncFakeVisionClient(TEXTS, latency=0.01)
+    results = asyncio.run(batch_ocr.detect_texts_async(client, IMAGES, max_in_flight=3))
+    assert results == ['Sugars %dg' % i for i in range(len(IMAGES))]
+    assert client.calls == len(IMAGES)
+    assert client.max_in_flight <= 3
+
+
+def test_detect_texts_matches_batch_api():
+    client = FakeVisionClient(TEXTS)
+    expected = ['Sugars %dg' % i for i in range(len(IMAGES))]
+    assert batch_ocr.detect_texts(client, IMAGES, max_in_flight=4) == expected
+    assert batch_ocr.detect_texts(client, IMAGES, use_batch_api=True) == expected
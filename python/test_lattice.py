@@ -0,0 +1,46 @@
+"""The lattice must give the model's own label, at grid points and between them.
+
+    python -m pytest test_lattice.py
+"""
+import numpy as np
+import pytest
+
+import artifacts
+from lattice import Lattice, LatticeModel
+from numpy_model import NumpyModel
+
+# Much coarser than DEFAULT_AXES, so far more rows land in cells a decision boundary crosses
+COARSE_AXES = ((0.0, 5.0, 21), (0.0, 5.0, 21), (0.0, 50.0, 81))
+
+
+@pytest.fixture(scope='module')
+def model():
+    return NumpyModel.load(artifacts.model_path('ocr2'))
+
+
+@pytest.fixture(scope='module')
+def fast(model):
+    return LatticeModel(model, Lattice.build(model, COARSE_AXES))
+
+
+def test_agrees_with_model_off_grid(model, fast):
+    rng = np.random.default_rng(0)
+    X = rng.uniform([0, 0, 0], [100, 100, 4000], (20000, 3))
+    expected = np.argmax(model.predict_proba(X), axis=1)
+    assert (fast.predict_codes(X) == expected).all()
+    assert [fast.predict(x)[0] for x in X[:2000]] == [model.classes[i] for i in expected[:2000]]
+
+
+def test_agrees_with_model_near_boundaries(model, fast):
+    # Rows the coarse grid can't decide are exactly the ones snapping would get wrong
+    X = np.array([[22.1, 21, 365], [22.6, 17.1, 599], [0.2, 17.4, 601], [99.9, 99.9, 3999], [100, 100, 4000]])
+    assert fast.predict_codes(X).tolist() == np.argmax(model.predict_proba(X), axis=1).tolist()
+    for x in X:
+        assert fast.predict([x]) == model.predict([x])
+
+
+def test_off_grid_rows_use_model(model, fast):
+    X = np.array([[-1, 5, 100], [5, 5, 5000], [np.nan, 5, 100]])
+    _, known = fast.lattice.lookup(X)
+    assert not known.any()
+    assert fast.predict_codes(X).tolist() == np.argmax(model.predict_proba(X), axis=1).tolist()
@@ -0,0 +1,36 @@
+"""Product type inference, including names that must stay unassigned.
+
+    python -m pytest test_product_types.py
+"""
+import pytest
+
+from bench_parser import LABEL_TEXTS
+from product_types import OTHER, infer, infer_text
+
+
+@pytest.mark.parametrize('name, expected', [
+    ("Potato Crackers Cream n' Onion", 'crackers'),
+    ('Choco Chip Creme Sandwiches', 'cream biscuits'),
+    ('Chocolate Chip Cookies', 'cookies'),
+    ('Nestle Munch', 'chocolates'),
+    ('Cadbury Dairy Milk Chocolate Bar', 'chocolates'),
+    ('Lays Potato Wafers Classic Salted', 'chips'),
+    ('Haldiram Aloo Bhujia', 'namkeen'),
+])
+def test_infer(name, expected):
+    assert infer(name) == expected
+
+
+@pytest.mark.parametrize('name', [
+    'Kurkure Masala Munch',
+    'Britannia Wafers Vanilla',
+    'Cereal Bar Almond',
+])
+def test_ambiguous_words_pick_no_type(name):
+    assert infer(name) == OTHER
+
+
+def test_label_texts_pick_no_wrong_type():
+    # LABEL_TEXTS[3] is a "MASALA MUNCH" namkeen pack, not a chocolate
+    assert infer_text(LABEL_TEXTS[3]) is None
+    assert infer_text("INGREDIENTS: sugar, cocoa butter, milk solids. Energy bar of the day") is None
@@ -0,0 +1,161 @@
+"""Train the food classification model and publish it as a new artifact version.
+
+Training used to run inline when ocr.py or ocr2.py found a model file
+missing, which kept Flask from binding for tens of seconds. It now lives
+here: the rule table labels the dataset, a small Keras network learns it,
+and the result is exported as a model bundle (weights plus a manifest of
+feature order, classes, rule thresholds, dataset hash and metrics) in
+``artifacts/<version>/`` before the profile's ``CURRENT-<profile>`` is
+switched to that version; the other profile's service is left alone.
+
+    python train.py --profile ocr2
+    python train.py --profile ocr --no-activate
+"""
+import argparse
+import datetime
+import os
+import shutil
+import tempfile
+
+import artifacts
+from bundle import file_sha256
+from numpy_model import export_bundle
+from rules import EXCEEDANCE_LIMITS, EXCEEDANCE_RULES, FEATURES, RATIO_LIMITS, RATIO_RULES, RuleSet
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Dataset, labelling rules and network each service was trained with inline
+PROFILES = {
+    'ocr2': {
+        'csv': 'mixed_data.csv',
+        'encoding': 'ISO-8859-1',
+        'limits': EXCEEDANCE_LIMITS,
+        'measure': "exceedance",
+        'rules': EXCEEDANCE_RULES,
+        'hidden': (16, 12, 8),
+        'dropout': 0.2,
+        'epochs': 50,
+        'batch_size': 8,
+    },
+    'ocr': {
+        'csv': 'Biscuits_sample.csv',
+        'encoding': None,
+        'limits': RATIO_LIMITS,
+        'measure': "ratio",
+        'rules': RATIO_RULES,
+        'hidden': (8, 4),
+        'dropout': 0.0,
+        'epochs': 30,
+        'batch_size': 4,
+    },
+}
+
+
+def train(profile, out_dir, seed=42):
+    """Fit ``profile``, save model.h5, scaler.pkl and encoder.pkl to out_dir, return (test metrics, dataset rows)"""
+    import joblib
+    import numpy as np
+    import pandas as pd
+    from sklearn.model_selection import train_test_split
+    from sklearn.preprocessing import StandardScaler, OneHotEncoder
+    from tensorflow import keras
+
+    keras.utils.set_random_seed(seed)
+    data = pd.read_csv(os.path.join(HERE, profile['csv']), encoding=profile['encoding'])
+    rows = len(data)
+    data = data.replace(np.nan, 0)
+    for feature in FEATURES:
+        data[feature] = data[feature].astype(float)
+
+    rules = RuleSet(profile['limits'], profile['measure'], profile['rules'])
+    codes, _ = rules.evaluate(data["TOTAL SUGARS"], data["TOTAL FAT"], data["SODIUM(mg)"])
+    data["Category"] = rules.labels(codes)
+
+    X = data[list(FEATURES)].values
+    y = data["Category"].values
+
+    encoder = OneHotEncoder(sparse_output=False)
+    y_encoded = encoder.fit_transform(y.reshape(-1, 1))
+
+    X_train, X_test, y_train, y_test = train_test_split(X, y_encoded, test_size=0.2, random_state=seed)
+
+    scaler = StandardScaler()
+    X_train = scaler.fit_transform(X_train)
+    X_test = scaler.transform(X_test)
+
+    layers = [keras.Input(shape=(len(FEATURES),))]
+    for i, units in enumerate(profile['hidden']):
+        layers.append(keras.layers.Dense(units, activation="relu"))
+        if i == 0 and profile['dropout']:
+            layers.append(keras.layers.Dropout(profile['dropout']))
+    layers.append(keras.layers.Dense(y_encoded.shape[1], activation="softmax"))
+    model = keras.Sequential(layers)
+
+    model.compile(optimizer="adam", loss="categorical_crossentropy", metrics=["accuracy"])
+    model.fit(X_train, y_train, epochs=profile['epochs'], batch_size=profile['batch_size'],
+              validation_data=(X_test, y_test), verbose=0)
+    loss, accuracy = model.evaluate(X_test, y_test, verbose=0)
+    print(f"Test Accuracy (Training): {accuracy:.2f}")
+
+    model.save(os.path.join(out_dir, 'model.h5'))
+    joblib.dump(scaler, os.path.join(out_dir, 'scaler.pkl'))
+    joblib.dump(encoder, os.path.join(out_dir, 'encoder.pkl'))
+    return {'loss': float(loss), 'accuracy': float(accuracy), 'train_rows': len(X_train), 'test_rows': len(X_test)}, rows
+
+
+def build_bundle(profile_name, version, out_dir, seed=42):
+    """Train ``profile_name`` and export it with its manifest as a bundle in out_dir"""
+    profile = PROFILES[profile_name]
+    csv_path = os.path.join(HERE, profile['csv'])
+    with tempfile.TemporaryDirectory() as scratch:
+        metrics, rows = train(profile, scratch, seed=seed)
+        manifest = {
+            'version': version,
+            'profile': profile_name,
+            'created': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+            'features': list(FEATURES),
+            'rules': {
+                'measure': profile['measure'],
+                'limits': {f: profile['limits'][f] for f in FEATURES},
+                'table': [list(rule) for rule in profile['rules']],
+            },
+            'dataset': {'path': profile['csv'], 'sha256': file_sha256(csv_path), 'rows': rows},
+            'training': {k: profile[k] for k in ('hidden', 'dropout', 'epochs', 'batch_size')} | {'seed': seed},
+            'metrics': metrics,
+        }
+        return export_bundle(os.path.join(scratch, 'model.h5'), os.path.join(scratch, 'scaler.pkl'),
+                             os.path.join(scratch, 'encoder.pkl'), out_dir, manifest)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--profile', choices=sorted(PROFILES), default='ocr2')
+    parser.add_argument('--artifacts', default=artifacts.ARTIFACTS_DIR)
+    parser.add_argument('--version', default=None, help="defaults to the current UTC timestamp")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--no-activate', action='store_true', help="write the version without pointing CURRENT-<profile> at it")
+    args = parser.parse_args()
+
+    version = args.version or artifacts.new_version()
+    final_dir = os.path.join(args.artifacts, version)
+    if os.path.exists(final_dir):
+        parser.error(f"{final_dir} already exists")
+
+    # Build in a scratch directory and rename, so a version directory is always complete
+    work_dir = os.path.join(args.artifacts, f'.{version}.tmp')
+    os.makedirs(work_dir, exist_ok=True)
+    try:
+        build_bundle(args.profile, version, work_dir, seed=args.seed)
+        os.rename(work_dir, final_dir)
+    except BaseException:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        raise
+    print(f"Wrote artifact version {version} to {final_dir}")
+
+    if not args.no_activate:
+        artifacts.set_current(version, args.profile, args.artifacts)
+        print(f"{artifacts.current_file(args.profile)} -> {version}")
+
+
+if __name__ == '__main__':
+    main()